@@ -1,11 +1,18 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, g, url_for
+from werkzeug.utils import secure_filename
 import os
+import shutil
+import threading
+import time
 from utils import *
-from speech.stt import transcribe_audio
-from speech.tts import synthesize_text_to_speech
-from translate.translate import translate_text
-from rag.data_processor import run_chat_session
-from rag.rag_with_openai import get_irembo_assistant_response
+from speech.stt import transcribe_audio, transcribe_and_detect
+from speech.tts import synthesize_text_to_speech, negotiate_audio_format, audio_format_of, AUDIO_FORMATS, DEFAULT_AUDIO_FORMAT
+from translate.translate import translate_text, translate_texts
+from translate.language_id import input_language
+# rag.data_processor (run_chat_session) pulls in Chroma; import it where it is used
+from rag.rag_with_openai import get_irembo_assistant_response, get_irembo_assistant_responses
+from rag.model_router import get_router_stats
+from rag.faq_store import find_answer, find_answers
 from dotenv import load_dotenv
 from flask_cors import CORS
 import uuid
@@ -13,6 +20,12 @@ import cloudinary
 import cloudinary.uploader
 from cloudinary.utils import cloudinary_url
 from ocr.ocr import *
+from warmup import warm_up
+from jobs import JobQueue, QueueFull, validate_callback_url
+from limits import Limiter, Overloaded, get_limit_stats
+from singleflight import coalesced, normalize_text
+from deadline import deadline, remaining, has_budget, call_timeout, DeadlineExceeded, REQUEST_BUDGET, FORM_BUDGET, JOB_BUDGET, BATCH_BUDGET
+from tracing import stage, provider_call, start_request, observe_request, metrics_payload, record_translation_saved
 import json
 
 app = Flask(__name__)
@@ -30,6 +43,23 @@ cloudinary_key = os.getenv("CLOUDINARY_SECRET")
 UPLOAD_FOLDER = 'uploads'
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
+# Longest a Cloudinary upload may take, in seconds
+UPLOAD_TIMEOUT = float(os.getenv("UPLOAD_TIMEOUT", "30"))
+# Skip TTS and answer with text when less than this is left of the request budget
+TTS_MIN_BUDGET = float(os.getenv("TTS_MIN_BUDGET", "4"))
+# Most questions accepted in one /process/batch request
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "50"))
+# Audio URLs of spoken FAQ answers, by (article, language, format); at most one per stored answer and format
+faq_audio_urls = {}
+
+# SDKs and clients load on first use; WARM_UP=1 loads them at startup instead,
+# WARM_UP=background does so without delaying startup
+WARM_UP = os.getenv("WARM_UP", "0")
+DATA_FILE_PATH = os.path.join(current_dir, 'rag', 'data', 'web_scrape_output_with_content.json')
+
+# Files for async jobs are kept here until a worker has processed them
+JOBS_SPOOL_FOLDER = os.path.abspath(os.getenv("JOBS_SPOOL_FOLDER", os.path.join(current_dir, "spool")))
+
 # Ensure upload folder exists
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
@@ -43,39 +73,174 @@ cloudinary.config(
     secure=True
 )
 
+# Requests to these endpoints fan out to providers and are admitted through a shared limiter
+ADMITTED_ENDPOINTS = {'process_input', 'process_batch', 'submit_form'}
+request_limiter = Limiter("requests",
+    concurrency=int(os.getenv("MAX_CONCURRENT_REQUESTS", "32")),
+    max_queue=int(os.getenv("MAX_QUEUED_REQUESTS", "64")),
+    max_wait=float(os.getenv("MAX_REQUEST_QUEUE_WAIT", "10")))
+
+@app.before_request
+def begin_trace():
+    g.request_start = time.perf_counter()
+    g.request_id = start_request(request.headers.get('X-Request-ID'))
+    g.admitted = False
+    if request.endpoint in ADMITTED_ENDPOINTS:
+        request_limiter.acquire()
+        g.admitted = True
+
+@app.after_request
+def end_trace(response):
+    if request.url_rule is not None and request.endpoint != 'metrics':
+        observe_request(request.url_rule.rule, response.status_code, time.perf_counter() - g.request_start)
+    response.headers['X-Request-ID'] = g.request_id
+    return response
+
+@app.teardown_request
+def release_admission(error=None):
+    if g.get('admitted'):
+        request_limiter.release()
+        g.admitted = False
+
+@app.errorhandler(DeadlineExceeded)
+def deadline_exceeded(e):
+    return jsonify({"error": "The request could not be completed in time, please retry"}), 504
+
+@app.errorhandler(Overloaded)
+def overloaded(e):
+    response = jsonify({"error": "The service is busy, please retry later", "provider": e.provider})
+    response.headers['Retry-After'] = str(int(e.retry_after))
+    return response, 503
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    body, content_type = metrics_payload()
+    return Response(body, content_type=content_type)
+
 @app.route('/test', methods=['GET'])
 def test():
     return jsonify({"message": "Test successful"}), 200
 
+@app.route('/router-stats', methods=['GET'])
+def router_stats():
+    return jsonify(get_router_stats()), 200
+
+@app.route('/limits', methods=['GET'])
+def limits():
+    return jsonify({"requests": request_limiter.snapshot(), **get_limit_stats()}), 200
+
+def process_form(lang, image_path=None, image_name=None):
+    """Runs OCR on the submitted image and uploads it. The caller removes the image file."""
+    result = {
+        "image": None,
+        "audios": []
+    }
+    if image_path:
+        with stage("ocr"):
+            ocr_results = extract_fields_from_image(image_path)
+        with stage("upload"), provider_call("cloudinary", "upload"):
+            upload_result = cloudinary.uploader.upload(image_path,
+                resource_type="auto",
+                public_id=f"images/{image_name}",
+                timeout=call_timeout(UPLOAD_TIMEOUT))
+        result["image"] = {
+            "url": upload_result['secure_url'],
+            "ocr_results": json.loads(ocr_results)
+        }
+    return result
+
+def run_form_job(payload):
+    with deadline(JOB_BUDGET):
+        return process_form(payload['lang'], payload.get('image_path'), payload.get('image_name'))
+
+def remove_form_spool(payload):
+    """Deletes a form job's files once it has succeeded or finally failed; a requeued job still needs them."""
+    shutil.rmtree(os.path.join(JOBS_SPOOL_FOLDER, payload['job_id']), ignore_errors=True)
+
+if WARM_UP == "1":
+    warm_up(DATA_FILE_PATH)
+elif WARM_UP == "background":
+    threading.Thread(target=warm_up, args=(DATA_FILE_PATH,), name="warm-up", daemon=True).start()
+
+# Workers are started with the server (see start_job_workers), not when app is imported
+job_queue = JobQueue()
+job_queue.register("submit-form", run_form_job, cleanup=remove_form_spool)
+
+@app.before_request
+def start_job_workers():
+    # `flask run` and WSGI servers never run __main__, so the first request starts them
+    job_queue.start()
+
+def wants_async():
+    """Async mode is opt-in with ?async=true or a 'Prefer: respond-async' header."""
+    if request.args.get('async', '').lower() in ('1', 'true', 'yes'):
+        return True
+    return 'respond-async' in request.headers.get('Prefer', '')
+
+def enqueue_form(lang, ocr_image):
+    callback_url = request.form.get('callback_url')
+    if callback_url:
+        try:
+            validate_callback_url(callback_url)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    job_id = uuid.uuid4().hex
+    job_dir = os.path.join(JOBS_SPOOL_FOLDER, job_id)
+    os.makedirs(job_dir, exist_ok=True)
+    payload = {"job_id": job_id, "lang": lang}
+    if ocr_image:
+        image_path = os.path.join(job_dir, secure_filename(ocr_image.filename) or "image")
+        with stage("upload_save"):
+            ocr_image.save(image_path)
+        payload.update(image_path=image_path, image_name=ocr_image.filename)
+    try:
+        job_queue.submit("submit-form", payload, callback_url=callback_url, job_id=job_id)
+    except QueueFull:
+        shutil.rmtree(job_dir, ignore_errors=True)
+        response = jsonify({"error": "Too many pending jobs, please retry later"})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+
+    status_url = url_for('job_status', job_id=job_id)
+    response = jsonify({"job_id": job_id, "status": "queued", "status_url": status_url})
+    response.headers['Location'] = status_url
+    return response, 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job), 200
+
 @app.route('/submit-form', methods=['POST'])
 def submit_form():
     try:
-        result = {
-            "image": None,
-            "audios": []
-        }
         print("Processing form submission")
 
         # Get the language for all audios
         lang = request.form.get('lang', 'en')
         print("Lang:", lang)
         
-        # Process OCR image
         ocr_image = request.files.get('image')
+        if wants_async():
+            return enqueue_form(lang, ocr_image)
+
+        # Process OCR image
+        file_path = None
+        filename = None
         if ocr_image:
             filename = ocr_image.filename
             file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            ocr_image.save(file_path)
-
-            ocr_results = extract_fields_from_image(file_path)
-            upload_result = cloudinary.uploader.upload(file_path,
-                resource_type="auto",
-                public_id=f"images/{filename}")
-            result["image"] = {
-                "url": upload_result['secure_url'],
-                "ocr_results": json.loads(ocr_results)
-            }
-            os.remove(file_path)
+            with stage("upload_save"):
+                ocr_image.save(file_path)
+        try:
+            with deadline(FORM_BUDGET):
+                result = process_form(lang, file_path, filename)
+        finally:
+            if file_path and os.path.exists(file_path):
+                os.remove(file_path)
 
         # # Process audios
         # print("Processing audios")
@@ -116,6 +281,8 @@ def submit_form():
 
         return jsonify(result), 200
 
+    except (Overloaded, DeadlineExceeded):
+        raise
     except Exception as e:
         print(f"Error: {str(e)}")
         import traceback
@@ -127,53 +294,273 @@ def process_input():
     try:
         lang = request.args.get('lang', 'en')
         
-        if 'file' in request.files:
-            return handle_audio_input(request.files['file'], lang)
-        elif request.is_json:
-            return handle_text_input(request.get_json(), lang)
-        else:
-            return jsonify({"error": "Invalid input. Please send either an audio file or JSON data."}), 400
+        with deadline(REQUEST_BUDGET):
+            if 'file' in request.files:
+                return handle_audio_input(request.files['file'], lang)
+            elif request.is_json:
+                return handle_text_input(request.get_json(), lang)
+            else:
+                return jsonify({"error": "Invalid input. Please send either an audio file or JSON data."}), 400
+    except (Overloaded, DeadlineExceeded):
+        raise
     except Exception as e:
         return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
 
+@app.route('/process/batch', methods=['POST'])
+def process_batch():
+    """
+    Answers a list of text questions, {"items": [{"text": ..., "lang": ...}, ...]},
+    with one result per item in the same order. Each result has the fields a
+    text /process response would have, plus its HTTP status.
+    """
+    data = request.get_json(silent=True)
+    items = data.get('items') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Send a JSON list of {text, lang} items"}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({"error": f"At most {BATCH_MAX_ITEMS} items can be sent in one batch"}), 413
+    lang = request.args.get('lang', 'en')
+    try:
+        with deadline(BATCH_BUDGET):
+            return jsonify({"results": answer_batch(items, lang)}), 200
+    except (Overloaded, DeadlineExceeded):
+        raise
+    except Exception as e:
+        return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
+
+def shared_stage(name, count, fn, *args, **kwargs):
+    """
+    Runs a batch stage shared by `count` items. Any failure other than shedding
+    or the deadline is returned as the result of every item, so the batch still
+    gets one entry per item.
+    """
+    try:
+        return fn(*args, **kwargs)
+    except (Overloaded, DeadlineExceeded):
+        raise
+    except Exception as e:
+        print(f"Batch {name} failed: {str(e)}")
+        return [e] * count
+
+def answer_batch(items, default_lang):
+    """
+    The batch form of handle_text_input. Provider calls are shared across items:
+    one FAQ embedding request, one translation call per language and direction,
+    one embeddings request and index search for retrieval, and concurrent LLM calls.
+    """
+    results = [None] * len(items)
+    questions = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not str(item.get('text') or '').strip():
+            results[index] = {"error": "No text field in item", "status": 400}
+            continue
+        lang = item.get('lang') or default_lang
+        with stage("langid"):
+            text_lang = input_language(item['text'], lang)
+        questions.append((index, item['text'], text_lang, lang))
+
+    pending = []
+    # Question embeddings made for FAQ misses are reused for retrieval
+    embedded = {}
+    faq_matches = shared_stage("faq", len(questions), find_answers,
+                               [(text, text_lang) for _index, text, text_lang, _lang in questions], embedded,
+                               answer_langs=[lang for _index, _text, _text_lang, lang in questions])
+    for question, faq_match in zip(questions, faq_matches):
+        # The assistant still answers when the FAQ lookup failed
+        if faq_match is not None and not isinstance(faq_match, Exception):
+            results[question[0]] = faq_match.answer
+        else:
+            pending.append(question)
+
+    for _index, _text, text_lang, lang in pending:
+        if text_lang == 'en' and lang != 'en':
+            record_translation_saved("in")
+    texts_for_llm = shared_stage("translate_in", len(pending), translate_grouped,
+                                 [text for _index, text, _text_lang, _lang in pending],
+                                 [text_lang for _index, _text, text_lang, _lang in pending], to_english=True)
+    asked = []
+    for question, text_for_llm in zip(pending, texts_for_llm):
+        if text_for_llm is None:
+            results[question[0]] = {"error": "Error processing text: translation failed", "status": 500}
+        elif isinstance(text_for_llm, Exception):
+            results[question[0]] = text_for_llm
+        else:
+            asked.append((question, text_for_llm))
+    llm_responses = shared_stage("assistant", len(asked), get_irembo_assistant_responses,
+                                 [text for _question, text in asked], data_file_path=DATA_FILE_PATH,
+                                 query_vectors=[embedded.get(text) for _question, text in asked])
+
+    chats = []
+    for ((index, _text, _text_lang, lang), _text_for_llm), llm_response in zip(asked, llm_responses):
+        results[index] = llm_response
+        # Answers are given in the language the user selected
+        if isinstance(llm_response, dict) and llm_response.get('op_type') == 'chat':
+            chats.append((index, lang))
+    answers = shared_stage("translate_out", len(chats), translate_grouped,
+                           [results[index]['data'] for index, _lang in chats],
+                           [lang for _index, lang in chats], to_english=False)
+    for (index, _lang), answer in zip(chats, answers):
+        # An answer that could not be translated back is still given, in English
+        if answer is not None and not isinstance(answer, Exception):
+            results[index] = {**results[index], 'data': answer}
+
+    return [batch_result(result) for result in results]
+
+def batch_result(result):
+    """Turns an item's answer, or the exception raised for it, into its entry in the batch response."""
+    if isinstance(result, Overloaded):
+        return {"error": "The service is busy, please retry later", "provider": result.provider, "status": 503}
+    if isinstance(result, DeadlineExceeded):
+        return {"error": "The request could not be completed in time, please retry", "status": 504}
+    if isinstance(result, Exception):
+        return {"error": f"Error processing text: {str(result)}", "status": 500}
+    if 'error' in result:
+        return result
+    if result['op_type'] in ['new', 'renew']:
+        return {"redir_url": result['redir_url'], "status": 200}
+    if result['op_type'] == 'chat':
+        return {"response": result['data'], "status": 200}
+    return {"error": "Invalid operation type from LLM", "status": 500}
+
+def translate_grouped(texts, text_langs, to_english):
+    """
+    Translates each text between English and its own language, with one
+    translate_texts call per language. English texts are returned as they are.
+    """
+    translations = list(texts)
+    by_lang = {}
+    for index, text_lang in enumerate(text_langs):
+        if text_lang != 'en':
+            by_lang.setdefault(text_lang, []).append(index)
+    for text_lang, indices in by_lang.items():
+        source_lang, target_lang = (text_lang, 'en') if to_english else ('en', text_lang)
+        with stage("translate_in" if to_english else "translate_out", lang=text_lang, texts=len(indices)):
+            translated = translate_texts([texts[index] for index in indices],
+                                         source_lang=source_lang, target_lang=target_lang, service='amazon')
+        for index, translation in zip(indices, translated):
+            translations[index] = translation
+    return translations
+
+def translate_for_llm(text, text_lang, lang):
+    """Translates the user's text to English for the LLM, skipping the call when it is already English."""
+    if text_lang == 'en':
+        if lang != 'en':
+            record_translation_saved("in")
+        return text
+    with stage("translate_in", lang=text_lang):
+        return translate_text(text, source_lang=text_lang, target_lang='en', service='amazon')
+
+def translate_for_user(text, lang):
+    """Translates the English LLM answer into the language the user selected."""
+    if lang == 'en':
+        return text
+    with stage("translate_out", lang=lang):
+        return translate_text(text, source_lang='en', target_lang=lang, service='amazon')
+
+def answer_query(text, text_lang, lang):
+    """
+    Answers the user's question, read as `text_lang`, with `data` in the language
+    they selected. A confident match in the FAQ store is answered directly;
+    anything else is translated for the assistant and its answer translated back.
+
+    Returns:
+        tuple: (answer dict, FAQMatch or None)
+    """
+    # The FAQ lookup's embedding of the question is reused for retrieval when it is asked as is
+    embedded = {}
+    faq_match = find_answer(text, text_lang, embedded, answer_lang=lang)
+    if faq_match is not None:
+        return faq_match.answer, faq_match
+    text_for_llm = translate_for_llm(text, text_lang, lang)
+    llm_response = get_irembo_assistant_response(text_for_llm, data_file_path=DATA_FILE_PATH,
+                                                 query_vector=embedded.get(text_for_llm))
+    if llm_response['op_type'] == 'chat':
+        llm_response = {**llm_response, 'data': translate_for_user(llm_response['data'], lang)}
+    return llm_response, None
+
+def audio_response(audio_url, audio_format):
+    return jsonify({"audio": audio_url, "audio_format": audio_format,
+                    "mime_type": AUDIO_FORMATS[audio_format]["mime_type"]})
+
+def speak_faq_answer(faq_match, lang, audio_format):
+    """Speaks a stored answer, synthesizing it only the first time it is asked for in this process."""
+    key = (faq_match.article, lang, audio_format)
+    if key in faq_audio_urls:
+        return audio_response(faq_audio_urls[key], audio_format)
+    response = speak_answer(faq_match.answer['data'], lang, audio_format)
+    audio_url = response.get_json().get("audio")
+    if audio_url:
+        faq_audio_urls[key] = audio_url
+    return response
+
+def speak_answer(text, lang, audio_format=DEFAULT_AUDIO_FORMAT):
+    """
+    Synthesizes and uploads the spoken answer. If that cannot fit in the request's
+    remaining budget, or TTS fails, the answer is returned as text instead.
+    """
+    if not has_budget(TTS_MIN_BUDGET):
+        print(f"Skipping TTS, only {remaining():.1f}s left in the budget")
+        return jsonify({"response": text, "degraded": "tts_skipped"})
+    try:
+        audio_url = synthesize_and_upload(text, lang, audio_format)
+    except DeadlineExceeded as e:
+        print(f"Returning text instead of audio: {e}")
+        return jsonify({"response": text, "degraded": "tts_skipped"})
+    if audio_url is None:
+        return jsonify({"response": text, "degraded": "tts_failed"})
+    return audio_response(audio_url, audio_format)
+
+# Requests answering with the same text at the same time share one synthesis and upload
+@coalesced("tts", key=lambda args: (normalize_text(args["text"]), args["lang"], args["audio_format"]))
+def synthesize_and_upload(text, lang, audio_format=DEFAULT_AUDIO_FORMAT):
+    """Synthesizes the answer and uploads the audio; returns its URL, or None if TTS failed."""
+    with stage("tts", lang=lang, format=audio_format):
+        tts_response = synthesize_text_to_speech(text, language=lang, audio_format=audio_format)
+    if tts_response is None:
+        return None
+    # Upload audio. Cloudinary converts it when the TTS provider returned another format (Pindo).
+    source_format = audio_format_of(tts_response)
+    with stage("upload", format=audio_format, transcode=source_format != audio_format), \
+            provider_call("cloudinary", "upload", bytes=os.path.getsize(tts_response)):
+        upload_result = cloudinary.uploader.upload(tts_response,
+        resource_type="auto",
+        public_id=f"audios/{os.path.splitext(os.path.basename(tts_response))[0]}",
+        format=AUDIO_FORMATS[audio_format]["extension"],
+        timeout=call_timeout(UPLOAD_TIMEOUT))
+    return upload_result["secure_url"]
+
 def handle_audio_input(file, lang):
     if not file:
         return jsonify( {"error": "No file content"}), 400
     
+    try:
+        audio_format = negotiate_audio_format(request.args.get('audio_format'), request.accept_mimetypes)
+    except ValueError as e:
+        return jsonify({"error": str(e), "supported": list(AUDIO_FORMATS)}), 400
+
     filename = file.filename
     filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
     try:
-        file.save(filepath)
-        transcription = transcribe_audio(filepath, lang)
-        if lang != 'en':
-            translation = translate_text(transcription, source_lang=lang, target_lang='en', service='amazon')
-            text_for_llm = translation
-        else:
-            text_for_llm = transcription
+        with stage("upload_save"):
+            file.save(filepath)
+        with stage("stt", lang=lang):
+            transcription, spoken_lang = transcribe_and_detect(filepath, lang)
+        if transcription is None:
+            return jsonify({"error": "Error processing audio: transcription failed"}), 500
         # llm_response = run_chat_session(text_for_llm)
-        json_file_path = os.path.join(current_dir, 'rag', 'data', 'web_scrape_output_with_content.json')
-        print(json_file_path)
-        llm_response = get_irembo_assistant_response(text_for_llm, data_file_path=json_file_path)
+        llm_response, faq_match = answer_query(transcription, spoken_lang, lang)
         # llm_response = get_irembo_assistant_response(text_for_llm, data_file_path="/Users/teddy/dev/Conversational-customer-support-agent/backend/rag/data/web_scrape_output_with_content.json")
         
         if llm_response['op_type'] in ['new', 'renew']:
             return jsonify({"redir_url": llm_response['redir_url']})
         elif llm_response['op_type'] == 'chat':
-            if lang != 'en':
-                translation = translate_text(llm_response['data'], source_lang='en', target_lang=lang,service='amazon')        
-                text_for_tts = translation
-            else:
-                text_for_tts = llm_response['data']
-            tts_response = synthesize_text_to_speech(text_for_tts, language=lang)
-            unique_filename = f"{filename}_{uuid.uuid4().hex[:8]}.wav"
-            # Upload audio
-            upload_result = cloudinary.uploader.upload(tts_response,
-            resource_type="auto",
-            public_id=f"audios/{tts_response}",
-            format="wav")
-            return jsonify({"audio": upload_result["secure_url"]})
+            if faq_match is not None:
+                return speak_faq_answer(faq_match, lang, audio_format)
+            return speak_answer(llm_response['data'], lang, audio_format)
         else:
             return jsonify({"error": "Invalid operation type from LLM"}), 500
+    except (Overloaded, DeadlineExceeded):
+        raise
     except Exception as e:
         return jsonify({"error": f"Error processing audio: {str(e)}"}), 500
     finally:
@@ -187,30 +574,24 @@ def handle_text_input(data, lang):
             return jsonify({"error": "No text field in JSON data"}), 400
         
         text = data['text']
-        if lang != 'en':
-            translation = translate_text(text, source_lang=lang, target_lang='en', service='amazon')
-            text_for_llm = translation
-        else:
-            text_for_llm = text
+        with stage("langid"):
+            text_lang = input_language(text, lang)
         # llm_response = get_irembo_assistant_response(text_for_llm, data_file_path="/Users/teddy/dev/Conversational-customer-support-agent/backend/rag/data/web_scrape_output_with_content.json")
-        json_file_path = os.path.join(current_dir, 'rag', 'data', 'web_scrape_output_with_content.json')
-        llm_response = get_irembo_assistant_response(text_for_llm, data_file_path=json_file_path)
+        llm_response, _faq_match = answer_query(text, text_lang, lang)
         # llm_response = run_chat_session(text_for_llm)
         
         if llm_response['op_type'] in ['new', 'renew']:
             return jsonify({"redir_url": llm_response['redir_url']})
         elif llm_response['op_type'] == 'chat':
-            if lang != 'en':
-                translation = translate_text(llm_response['data'], source_lang='en', target_lang=lang, service='amazon')
-                response_text = translation
-            else:
-                response_text = llm_response['data']
-            return jsonify({"response": response_text})
+            return jsonify({"response": llm_response['data']})
         else:
             return jsonify({"error": "Invalid operation type from LLM"}), 500
+    except (Overloaded, DeadlineExceeded):
+        raise
     except Exception as e:
         return jsonify({"error": f"Error processing text: {str(e)}"}), 500
 
 
 if __name__ == '__main__':
+    job_queue.start()
     app.run(debug=True)
\ No newline at end of file
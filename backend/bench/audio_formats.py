@@ -0,0 +1,122 @@
+# audio_formats.py
+# Compares the spoken-answer audio formats: synthesizes the same answers in each
+# format and reports payload size, synthesis time and the estimated time until
+# playback can start on typical mobile networks (synthesis + one round trip +
+# download of the whole file, since the client plays the uploaded file by URL).
+#
+# By default speech comes from the fake providers, whose payloads are sized
+# from each codec's nominal bitrate, so sizes and times are estimates and are
+# reported as such; pass --live to measure the real providers with the
+# credentials in .env. Pindo (rw) output is converted by Cloudinary on
+# upload, so only OpenAI languages give per-format sizes here.
+#
+# Usage (from backend/):
+#   python -m bench.audio_formats --runs 5
+#   python -m bench.audio_formats --live --langs en,fr --json formats.json
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from bench.fake_providers import build_providers, provider_environment
+from bench.load_test import percentile
+
+ANSWERS = [
+    "A marriage certificate costs 1,000 RWF and is issued by the civil registration office of your sector.",
+    "To renew a student permit, apply on Irembo at least thirty days before it expires and pay the fee "
+    "with mobile money. You will be notified by SMS when the new permit is ready for collection.",
+]
+# (round trip seconds, downlink kbit/s) of the networks users answer from
+NETWORKS = {
+    "2g": (0.65, 100),
+    "3g": (0.3, 750),
+    "4g": (0.08, 9000),
+}
+
+
+def time_to_play(synthesis_seconds: float, size: int, network: str) -> float:
+    rtt, kbps = NETWORKS[network]
+    return synthesis_seconds + rtt + size * 8 / (kbps * 1000)
+
+
+def measure(formats: list, langs: list, runs: int) -> dict:
+    """Synthesizes every answer `runs` times per language and format; returns results by format."""
+    from speech.tts import synthesize_text_to_speech
+
+    results = {}
+    for audio_format in formats:
+        timings, sizes = [], []
+        for lang in langs:
+            for _ in range(runs):
+                for text in ANSWERS:
+                    start = time.perf_counter()
+                    path = synthesize_text_to_speech(text, lang, audio_format)
+                    timings.append(time.perf_counter() - start)
+                    if path is None:
+                        raise RuntimeError(f"Synthesis failed for {audio_format} ({lang})")
+                    sizes.append(os.path.getsize(path))
+                    os.remove(path)
+        size = sorted(sizes)[len(sizes) // 2]
+        synthesis = percentile(timings, 50)
+        results[audio_format] = {
+            "bytes": size,
+            "synthesis_p50": synthesis,
+            "time_to_play": {network: time_to_play(synthesis, size, network) for network in NETWORKS},
+        }
+    return results
+
+
+def print_report(results: dict, live: bool):
+    if live:
+        print("Measured against the live providers")
+    else:
+        print("ESTIMATE: sizes follow the fake providers' nominal codec bitrates, not real encoder output; "
+              "use --live to measure")
+    print(f"{'format':<8}{'bytes':>10}{'synth p50':>11}" + "".join(f"{'play ' + network:>10}" for network in NETWORKS))
+    for audio_format, result in results.items():
+        print(f"{audio_format:<8}{result['bytes']:>10}{result['synthesis_p50'] * 1000:>9.0f}ms"
+              + "".join(f"{result['time_to_play'][network]:>9.2f}s" for network in NETWORKS))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Payload size and time-to-play of each TTS output format.")
+    parser.add_argument("--formats", default="opus,aac,mp3,wav", help="comma separated formats to compare")
+    parser.add_argument("--langs", default="en", help="comma separated languages to synthesize")
+    parser.add_argument("--runs", type=int, default=3, help="syntheses per answer, language and format")
+    parser.add_argument("--live", action="store_true", help="call the real providers instead of the fakes")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args(argv)
+
+    json_path = os.path.abspath(args.json) if args.json else None
+    providers = {}
+    if not args.live:
+        providers = build_providers()
+        for provider in providers.values():
+            provider.start()
+        os.environ.update(provider_environment(providers))
+    # Synthesized files are written to ./uploads
+    os.chdir(tempfile.mkdtemp(prefix="bench-"))
+    os.makedirs("uploads")
+
+    try:
+        results = measure(args.formats.split(","), args.langs.split(","), args.runs)
+    finally:
+        for provider in providers.values():
+            provider.stop()
+    print_report(results, args.live)
+
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump({"source": "live" if args.live else "estimate", "formats": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
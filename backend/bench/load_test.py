@@ -0,0 +1,258 @@
+# load_test.py
+# Offline load test for the backend: starts the fake providers, serves app.py
+# against them and drives /process (text and audio) and /submit-form at a
+# configurable concurrency, then reports throughput and latency percentiles per
+# endpoint scenario and per provider stage.
+#
+# Usage (from backend/):
+#   python -m bench.load_test --requests 200 --concurrency 8
+#   python -m bench.load_test --profile slow_openai.json --json report.json --baseline last_report.json
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from bench.fake_providers import build_providers, provider_environment, make_wav
+
+QUESTIONS = {
+    "en": ["How much is a marriage certificate?", "How do I renew my student permit?",
+           "How can I replace a lost national ID?", "How do I pay a traffic fine?"],
+    "fr": ["Combien coûte un certificat de mariage ?", "Comment renouveler mon permis d'étudiant ?"],
+    "rw": ["Icyemezo cy'ishyingirwa kigura angahe?", "Nasaba nte indangamuntu nshya?"],
+    "sw": ["Cheti cha ndoa kinagharimu kiasi gani?", "Ninawezaje kulipa faini ya barabarani?"],
+}
+
+
+def percentile(values: list, p: float):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, int(round(p / 100 * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+def summarize(latencies: list, errors: int = 0) -> dict:
+    return {
+        "count": len(latencies),
+        "errors": errors,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+    }
+
+
+def start_app_server():
+    """Imports app.py in a scratch working directory and serves it on a free port."""
+    from werkzeug.serving import make_server
+
+    os.chdir(tempfile.mkdtemp(prefix="bench-"))
+    # Keep benchmark jobs out of the real job database and spool
+    os.environ.setdefault("JOBS_DB_PATH", os.path.abspath("jobs.sqlite3"))
+    os.environ.setdefault("JOBS_SPOOL_FOLDER", os.path.abspath("spool"))
+    import app as backend_app
+    server = make_server("127.0.0.1", 0, backend_app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="bench-app", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+class Scenarios:
+    """The request types the load test can send, each returning the HTTP status."""
+
+    def __init__(self, base_url: str, langs: list, audio_seconds: float, image_bytes: int, batch_size: int = 8):
+        self.base_url = base_url
+        self.langs = langs
+        self.batch_size = batch_size
+        self.audio_bytes = make_wav(audio_seconds)
+        self.image_bytes = image_bytes
+        self.local = threading.local()
+
+    def session(self):
+        if not hasattr(self.local, "session"):
+            self.local.session = requests.Session()
+        return self.local.session
+
+    def text(self, rng):
+        lang = rng.choice(self.langs)
+        payload = {"text": rng.choice(QUESTIONS.get(lang, QUESTIONS["en"]))}
+        return self.session().post(f"{self.base_url}/process?lang={lang}", json=payload, timeout=120).status_code
+
+    def batch(self, rng):
+        items = []
+        for _ in range(self.batch_size):
+            lang = rng.choice(self.langs)
+            items.append({"text": rng.choice(QUESTIONS.get(lang, QUESTIONS["en"])), "lang": lang})
+        return self.session().post(f"{self.base_url}/process/batch", json={"items": items}, timeout=120).status_code
+
+    def audio(self, rng):
+        lang = rng.choice(self.langs)
+        files = {"file": (f"voice_{rng.getrandbits(32):08x}.wav", self.audio_bytes, "audio/wav")}
+        return self.session().post(f"{self.base_url}/process?lang={lang}", files=files, timeout=120).status_code
+
+    def form(self, rng):
+        # Every form is a new document, so OCR is measured rather than answered from its cache
+        image = rng.randbytes(self.image_bytes)
+        files = {"image": (f"passport_{rng.getrandbits(32):08x}.jpg", image, "image/jpeg")}
+        data = {"lang": rng.choice(self.langs)}
+        return self.session().post(f"{self.base_url}/submit-form", files=files, data=data, timeout=120).status_code
+
+
+def parse_mix(mix: str) -> list:
+    weights = []
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights.append((name.strip(), float(weight or 1)))
+    return weights
+
+
+def run_load(scenarios: Scenarios, mix: list, total: int, concurrency: int, seed: int = 0):
+    names = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    plan = random.Random(seed).choices(names, weights=weights, k=total)
+    results = {name: {"latencies": [], "errors": 0} for name in names}
+    lock = threading.Lock()
+
+    def one(index, name):
+        rng = random.Random(seed * 100003 + index)
+        start_time = time.time()
+        try:
+            ok = getattr(scenarios, name)(rng) < 400
+        except requests.RequestException:
+            ok = False
+        elapsed = time.time() - start_time
+        with lock:
+            results[name]["latencies"].append(elapsed)
+            if not ok:
+                results[name]["errors"] += 1
+
+    start_time = time.time()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda item: one(*item), enumerate(plan)))
+    return results, time.time() - start_time
+
+
+def build_report(results: dict, wall_time: float, providers: dict) -> dict:
+    total = sum(len(result["latencies"]) for result in results.values())
+    report = {
+        "requests": total,
+        "wall_time": wall_time,
+        "throughput_rps": total / wall_time if wall_time else 0.0,
+        "scenarios": {name: summarize(r["latencies"], r["errors"]) for name, r in results.items()},
+        "stages": {},
+    }
+    for name, provider in providers.items():
+        timings, errors = provider.stats()
+        if timings:
+            report["stages"][name] = summarize(timings, errors)
+    return report
+
+
+def print_report(report: dict):
+    def fmt(value):
+        return "-" if value is None else f"{value * 1000:8.0f}"
+
+    print(f"\n{report['requests']} requests in {report['wall_time']:.1f}s "
+          f"({report['throughput_rps']:.2f} req/s)\n")
+    for section in ("scenarios", "stages"):
+        print(f"{section:<18}{'count':>7}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+        for name, row in report[section].items():
+            print(f"{name:<18}{row['count']:>7}{row['errors']:>8}{fmt(row['p50'])}{fmt(row['p95'])}{fmt(row['p99'])}")
+        print()
+
+
+def compare_to_baseline(report: dict, baseline: dict, max_regression: float) -> list:
+    """Returns a description of every scenario or stage whose p95 regressed more than max_regression."""
+    regressions = []
+    for section in ("scenarios", "stages"):
+        for name, row in report[section].items():
+            previous = baseline.get(section, {}).get(name)
+            if not previous or not previous.get("p95") or row["p95"] is None:
+                continue
+            change = row["p95"] / previous["p95"] - 1
+            if change > max_regression:
+                regressions.append(f"{section}/{name}: p95 {previous['p95']:.3f}s -> {row['p95']:.3f}s (+{change:.0%})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline load test against local provider stand-ins.")
+    parser.add_argument("--requests", type=int, default=100, help="total number of requests to send")
+    parser.add_argument("--concurrency", type=int, default=8, help="number of concurrent clients")
+    parser.add_argument("--mix", default="text=6,audio=3,form=1",
+                        help="scenario weights, e.g. text=6,audio=3,form=1 (also: batch)")
+    parser.add_argument("--langs", default="en,fr,rw,sw", help="comma separated languages to sample from")
+    parser.add_argument("--profile", help="JSON file overriding provider latency/error settings")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiply every provider latency")
+    parser.add_argument("--error-rate", type=float, help="override the error rate of every provider")
+    parser.add_argument("--audio-seconds", type=float, default=5.0, help="length of the generated voice note")
+    parser.add_argument("--image-bytes", type=int, default=2_000_000, help="size of the generated form image")
+    parser.add_argument("--batch-size", type=int, default=8, help="questions per /process/batch request")
+    parser.add_argument("--target", help="benchmark an already running server instead of starting app.py; "
+                                         "per-stage timings are then only reported by the fake providers process")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--baseline", help="previous --json report to compare p95 latencies against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed relative p95 increase")
+    args = parser.parse_args(argv)
+
+    # app.py is served from a scratch directory, so resolve output paths first
+    json_path = os.path.abspath(args.json) if args.json else None
+    profile = {}
+    if args.profile:
+        with open(args.profile) as f:
+            profile = json.load(f)
+    if args.target:
+        # The target server is expected to be pointed at `python -m bench.fake_providers`
+        providers = {}
+        base_url = args.target.rstrip("/")
+    else:
+        providers = build_providers(profile, seed=args.seed)
+        for provider in providers.values():
+            provider.distribution.median *= args.latency_scale
+            provider.distribution.p95 *= args.latency_scale
+            if args.error_rate is not None:
+                provider.distribution.error_rate = args.error_rate
+            provider.start()
+        os.environ.update(provider_environment(providers))
+        _, base_url = start_app_server()
+
+    scenarios = Scenarios(base_url, args.langs.split(","), args.audio_seconds, args.image_bytes, args.batch_size)
+    mix = parse_mix(args.mix)
+
+    # One request per scenario first so vector store loading is not counted
+    for name, _ in mix:
+        getattr(scenarios, name)(random.Random(args.seed))
+    for provider in providers.values():
+        provider.reset_stats()
+
+    results, wall_time = run_load(scenarios, mix, args.requests, args.concurrency, seed=args.seed)
+    report = build_report(results, wall_time, providers)
+    print_report(report)
+
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(report, json.load(f), args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,374 @@
+# retrieval_eval.py
+# Retrieval quality and latency evaluation for the RAG layer. Runs the golden
+# questions in rag/data/retrieval_golden.json (en/fr/sw/rw, each labelled with
+# the articles that answer it) through the pipeline's vector search against the
+# FAISS index under several retrieval configs (k, relevance threshold, index type),
+# and reports recall@k, MRR, search latency and documents searched per query for
+# each config and language.
+#
+# Query and category embeddings (and, with --translate, translations) are cached
+# in rag/data/eval_cache. The cache is not committed, so the first run in a
+# checkout must be online with --embed (and --translate --embed for translated
+# runs); after that the evaluation runs fully offline. Index variants, including
+# the category shards of rag/sharded_index.py, are rebuilt from the vectors
+# already stored in the FAISS index.
+#
+# Usage (from backend/):
+#   python -m bench.retrieval_eval --embed            # first run, needs OPENAI_API_KEY
+#   python -m bench.retrieval_eval --from-titles
+#   python -m bench.retrieval_eval --configs configs.json --json report.json --baseline last_report.json
+
+import os
+import sys
+import copy
+import json
+import time
+import hashlib
+import argparse
+import tempfile
+import numpy as np
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from bench.load_test import percentile
+
+DATA_FILE_PATH = os.path.join(backend_dir, "rag", "data", "web_scrape_output_with_content.json")
+GOLDEN_PATH = os.path.join(backend_dir, "rag", "data", "retrieval_golden.json")
+VECTOR_STORE_PATH = os.path.join(backend_dir, "rag", "faiss")
+CACHE_DIR = os.path.join(backend_dir, "rag", "data", "eval_cache")
+# The model the FAISS index was built with; cached query vectors are keyed by it
+EMBEDDING_MODEL = os.getenv("EVAL_EMBEDDING_MODEL", "text-embedding-ada-002")
+
+LANGS = ["en", "fr", "sw", "rw"]
+
+# The first two mirror query_chroma_and_generate_response (k=2, 0.7 threshold)
+# and the live pipeline (RETRIEVAL_K=4); the rest trade exactness for speed
+DEFAULT_CONFIGS = [
+    {"name": "flat-k2-t0.7", "index": "flat", "k": 2, "threshold": 0.7},
+    {"name": "flat-k4", "index": "flat", "k": 4},
+    {"name": "flat-k8", "index": "flat", "k": 8},
+    {"name": "hnsw-k4", "index": "hnsw", "k": 4, "hnsw_m": 32, "ef_search": 64},
+    {"name": "ivf-k4", "index": "ivf", "k": 4, "nlist": 6, "nprobe": 2},
+    {"name": "sharded-k4", "index": "sharded", "k": 4, "categories": 2, "probe": 3},
+    {"name": "sharded-k4-wide", "index": "sharded", "k": 4, "categories": 3, "probe": 6},
+]
+
+
+class EvalCache:
+    """Query embeddings (embeddings.npz) and translations (translations.json) kept between runs."""
+
+    def __init__(self, cache_dir: str, model: str):
+        self.cache_dir = cache_dir
+        self.model = model
+        self.embeddings_path = os.path.join(cache_dir, "embeddings.npz")
+        self.translations_path = os.path.join(cache_dir, "translations.json")
+        self.embeddings = {}
+        self.translations = {}
+        if os.path.exists(self.embeddings_path):
+            with np.load(self.embeddings_path) as stored:
+                self.embeddings = {key: stored[key] for key in stored.files}
+        if os.path.exists(self.translations_path):
+            with open(self.translations_path, encoding="utf-8") as f:
+                self.translations = json.load(f)
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\n{text}".encode("utf-8")).hexdigest()
+
+    def save(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        np.savez_compressed(self.embeddings_path, **self.embeddings)
+        with open(self.translations_path, "w", encoding="utf-8") as f:
+            json.dump(self.translations, f, ensure_ascii=False, indent=1, sort_keys=True)
+
+
+def derive_title_questions(data_file_path: str) -> list:
+    """English questions made from "How to ..." article titles, each answered by its own article."""
+    with open(data_file_path, encoding="utf-8") as f:
+        data = json.load(f)
+    questions = []
+    for category in data["categories"]:
+        for sub_category in category["subcategories"]:
+            for article in sub_category["documents"]:
+                title = " ".join(article["doc_title"].split()).rstrip(".")
+                if not title.lower().startswith("how to "):
+                    continue
+                questions.append({
+                    "id": f"title:{title}",
+                    "articles": [article["doc_title"]],
+                    "text": {"en": f"How do I {title[7:]}?"},
+                })
+    return questions
+
+
+def load_cases(golden_path: str, langs: list, from_titles: bool) -> list:
+    """Flattens the golden set into one case per (question, language)."""
+    with open(golden_path, encoding="utf-8") as f:
+        questions = json.load(f)["questions"]
+    if from_titles:
+        questions = questions + derive_title_questions(DATA_FILE_PATH)
+    return [
+        {"id": question["id"], "lang": lang, "text": question["text"][lang], "articles": set(question["articles"])}
+        for question in questions
+        for lang in langs
+        if lang in question["text"]
+    ]
+
+
+def prepare_queries(cases: list, cache: EvalCache, translate: bool, embed: bool, extra_texts: list = ()):
+    """
+    Sets each case's query: the question itself, or with --translate its English
+    translation as the pipeline would retrieve with. With embed, translations and
+    embeddings missing from the cache (for the queries and `extra_texts`) are
+    fetched from the providers and saved.
+    """
+    if translate and embed:
+        from translate.translate import translate_text
+    for case in cases:
+        case["query"] = case["text"]
+        if not translate or case["lang"] == "en":
+            continue
+        key = f"{case['lang']}:{case['text']}"
+        if key not in cache.translations and embed:
+            cache.translations[key] = translate_text(case["text"], source_lang=case["lang"], target_lang="en",
+                                                     service="amazon")
+        if key not in cache.translations:
+            raise KeyError(f"No cached translation for {case['text']!r} in {cache.cache_dir}. "
+                           f"Run once online with --translate --embed (needs AWS credentials).")
+        case["query"] = cache.translations[key] or case["text"]
+
+    texts = {case["query"] for case in cases} | set(extra_texts)
+    missing = sorted(text for text in texts if cache.key(text) not in cache.embeddings)
+    if missing and embed:
+        from rag.rag_with_openai import get_components
+        _llm, embeddings = get_components()
+        for text, vector in zip(missing, embeddings.embed_documents(missing)):
+            cache.embeddings[cache.key(text)] = np.asarray(vector, dtype=np.float32)
+        missing = []
+    if embed:
+        cache.save()
+    if missing:
+        raise KeyError(f"{len(missing)} queries and category descriptions have no cached embedding in "
+                       f"{cache.cache_dir}. The eval cache is not committed; run once online with --embed "
+                       f"(needs OPENAI_API_KEY), after which the evaluation runs offline.")
+
+
+def category_descriptions(data_file_path: str) -> list:
+    """The texts the sharded index embeds to route between categories."""
+    from rag.rag_with_openai import process_data
+    from rag.sharded_index import category_description
+    return sorted({category_description(document) for document in process_data(data_file_path)})
+
+
+def load_vector_store(path: str):
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    # Queries are embedded from the cache, so the store never calls its embeddings
+    return FAISS.load_local(path, DeterministicFakeEmbedding(size=1), allow_dangerous_deserialization=True)
+
+
+def build_index(vectors: np.ndarray, config: dict):
+    """Builds the FAISS index a config asks for from the stored document vectors."""
+    import faiss
+    dimension = vectors.shape[1]
+    index_type = config.get("index", "flat")
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dimension)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, config.get("hnsw_m", 32))
+        index.hnsw.efSearch = config.get("ef_search", 64)
+    elif index_type == "ivf":
+        quantizer = faiss.IndexFlatL2(dimension)
+        index = faiss.IndexIVFFlat(quantizer, dimension, config.get("nlist", 6))
+        index.train(vectors)
+        index.nprobe = config.get("nprobe", 2)
+    else:
+        raise ValueError(f"Unknown index type {index_type!r}")
+    index.add(vectors)
+    return index
+
+
+def build_sharded_index(base_store, vectors: np.ndarray, cache: EvalCache, path: str):
+    """Builds the category shards from the stored document vectors and cached category descriptions."""
+    from rag.sharded_index import ShardedIndex, build_shards
+    documents = [base_store.docstore.search(base_store.index_to_docstore_id[i]) for i in range(len(vectors))]
+    by_text = {document.page_content: vector for document, vector in zip(documents, vectors)}
+
+    def embed_documents(texts):
+        return [by_text[text] if text in by_text else cache.embeddings[cache.key(text)] for text in texts]
+
+    build_shards(documents, path, base_store.embeddings, embed_documents=embed_documents)
+    index = ShardedIndex.load(path, base_store.embeddings)
+    for position in range(len(index.shards)):
+        index.store(position)
+    return index
+
+
+def documents_searched(vector_store, cache: EvalCache, cases: list):
+    """Mean number of documents a query is compared against; None for graph (HNSW) search."""
+    import faiss
+    from rag.sharded_index import ShardedIndex
+    if not isinstance(vector_store, ShardedIndex):
+        index = vector_store.index
+        if isinstance(index, faiss.IndexIVF):
+            return index.ntotal * min(index.nprobe, index.nlist) / index.nlist
+        if isinstance(index, faiss.IndexHNSW):
+            return None
+        return float(index.ntotal)
+    routes = vector_store.route([cache.embeddings[cache.key(case["query"])] for case in cases])
+    return float(np.mean([sum(vector_store.shards[position]["documents"] for position in route) for route in routes]))
+
+
+def evaluate(vector_store, cache: EvalCache, cases: list, config: dict) -> dict:
+    """Runs every case through search_by_vector with one config and scores the results."""
+    from rag.rag_with_openai import search_by_vector
+    k = config["k"]
+    threshold = config.get("threshold")
+    rows = []
+    for case in cases:
+        query_vector = cache.embeddings[cache.key(case["query"])].tolist()
+        start_time = time.perf_counter()
+        results = search_by_vector(vector_store, query_vector, k=k)
+        latency = time.perf_counter() - start_time
+        if threshold is not None:
+            results = [(doc, score) for doc, score in results if score >= threshold]
+        titles = [doc.metadata.get("title") for doc, _score in results]
+        rank = next((position for position, title in enumerate(titles, start=1) if title in case["articles"]), None)
+        rows.append({
+            "lang": case["lang"],
+            "recall": len(set(titles) & case["articles"]) / len(case["articles"]),
+            "reciprocal_rank": 1 / rank if rank else 0.0,
+            "latency": latency,
+        })
+
+    def scores(selected):
+        return {
+            "cases": len(selected),
+            f"recall@{k}": round(float(np.mean([row["recall"] for row in selected])), 4),
+            "mrr": round(float(np.mean([row["reciprocal_rank"] for row in selected])), 4),
+        }
+
+    overall = scores(rows)
+    latencies = [row["latency"] for row in rows]
+    return {
+        "config": config,
+        **overall,
+        "recall": overall[f"recall@{k}"],
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 3),
+            "p95": round(percentile(latencies, 95) * 1000, 3),
+        },
+        "by_lang": {lang: scores([row for row in rows if row["lang"] == lang])
+                    for lang in sorted({row["lang"] for row in rows})},
+    }
+
+
+def run(configs: list, cases: list, cache: EvalCache, vector_store_path: str) -> dict:
+    base_store = load_vector_store(vector_store_path)
+    vectors = base_store.index.reconstruct_n(0, base_store.index.ntotal)
+    report = {"cases": len(cases), "documents": int(base_store.index.ntotal), "configs": {}}
+    sharded_index = None
+    for config in configs:
+        if config.get("index") == "sharded":
+            if sharded_index is None:
+                sharded_index = build_sharded_index(base_store, vectors, cache, tempfile.mkdtemp(prefix="shards-"))
+            vector_store = copy.copy(sharded_index)
+            vector_store.categories = config.get("categories", 2)
+            vector_store.probe = config.get("probe", 3)
+        else:
+            vector_store = copy.copy(base_store)
+            vector_store.index = build_index(vectors, config)
+        # One untimed pass so first-query setup does not count as search latency
+        evaluate(vector_store, cache, cases[:5], config)
+        report["configs"][config["name"]] = evaluate(vector_store, cache, cases, config)
+        searched = documents_searched(vector_store, cache, cases)
+        report["configs"][config["name"]]["documents_searched"] = None if searched is None else round(searched, 1)
+    return report
+
+
+def print_report(report: dict):
+    print(f"\n{report['cases']} questions against {report['documents']} articles\n")
+    langs = sorted({lang for row in report["configs"].values() for lang in row["by_lang"]})
+
+    def fmt(value):
+        return "-" if value is None else f"{value:.1f}"
+
+    header = f"{'config':<16}{'recall':>8}{'mrr':>8}{'p50 ms':>9}{'p95 ms':>9}{'docs':>7}"
+    print(header + "".join(f"{lang + ' mrr':>9}" for lang in langs))
+    for name, row in report["configs"].items():
+        line = (f"{name:<16}{row['recall']:8.3f}{row['mrr']:8.3f}{row['latency_ms']['p50']:9.3f}"
+                f"{row['latency_ms']['p95']:9.3f}{fmt(row.get('documents_searched')):>7}")
+        print(line + "".join(f"{row['by_lang'].get(lang, {}).get('mrr', 0):9.3f}" for lang in langs))
+    print()
+
+
+def compare_to_baseline(report: dict, baseline: dict, max_drop: float, max_regression: float) -> list:
+    """Returns a description of every config whose recall or MRR dropped, or whose p95 latency grew, past the limits."""
+    regressions = []
+    for name, row in report["configs"].items():
+        previous = baseline.get("configs", {}).get(name)
+        if not previous:
+            continue
+        for metric in ("recall", "mrr"):
+            if previous[metric] - row[metric] > max_drop:
+                regressions.append(f"{name}: {metric} {previous[metric]:.3f} -> {row[metric]:.3f}")
+        before, after = previous["latency_ms"]["p95"], row["latency_ms"]["p95"]
+        if before and after / before - 1 > max_regression:
+            regressions.append(f"{name}: p95 {before:.3f}ms -> {after:.3f}ms (+{after / before - 1:.0%})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate retrieval quality and latency on the golden questions.")
+    parser.add_argument("--configs", help="JSON file with a list of configs (name, index, k, threshold, ...)")
+    parser.add_argument("--langs", default=",".join(LANGS), help="comma separated languages to evaluate")
+    parser.add_argument("--from-titles", action="store_true",
+                        help="add English questions derived from every \"How to ...\" article title")
+    parser.add_argument("--translate", action="store_true",
+                        help="retrieve with the English translation of non-English questions, as the pipeline does")
+    parser.add_argument("--embed", action="store_true",
+                        help="fetch missing embeddings and translations from the providers and cache them")
+    parser.add_argument("--golden", default=GOLDEN_PATH)
+    parser.add_argument("--vector-store", default=VECTOR_STORE_PATH)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--baseline", help="previous --json report to compare against")
+    parser.add_argument("--max-drop", type=float, default=0.02, help="allowed absolute drop in recall or MRR")
+    parser.add_argument("--max-regression", type=float, default=0.5, help="allowed relative p95 latency increase")
+    args = parser.parse_args(argv)
+
+    configs = DEFAULT_CONFIGS
+    if args.configs:
+        with open(args.configs) as f:
+            configs = json.load(f)
+
+    cache = EvalCache(args.cache_dir, EMBEDDING_MODEL)
+    cases = load_cases(args.golden, args.langs.split(","), args.from_titles)
+    sharded = any(config.get("index") == "sharded" for config in configs)
+    try:
+        prepare_queries(cases, cache, args.translate, args.embed,
+                        category_descriptions(DATA_FILE_PATH) if sharded else ())
+    except KeyError as e:
+        print(e.args[0])
+        return 2
+
+    report = run(configs, cases, cache, args.vector_store)
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(report, json.load(f), args.max_drop, args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
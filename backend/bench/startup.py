@@ -0,0 +1,193 @@
+# startup.py
+# Startup-time benchmark for the backend: measures how long `import app` takes
+# in a fresh interpreter, breaks that down per module with `python -X importtime`,
+# and optionally times the explicit warm-up step. Reports can be saved and
+# compared against a previous run like the load test.
+#
+# bench/startup_baseline.json is the committed report for the current tree. Run
+# the check before merging anything that adds imports; it exits 1 when the
+# median import time is more than 20% above the baseline. Timings depend on the
+# machine, so when a change is expected (or on new hardware), regenerate the
+# baseline with --json and commit it alongside the change.
+#
+# Usage (from backend/):
+#   python -m bench.startup
+#   python -m bench.startup --baseline                                   # check against the committed baseline
+#   python -m bench.startup --json bench/startup_baseline.json           # refresh the baseline
+#   python -m bench.startup --runs 10 --warm-up --json startup.json --baseline last_startup.json
+
+import os
+import re
+import sys
+import json
+import shutil
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(backend_dir, "bench", "startup_baseline.json")
+
+# Placeholder credentials so SDK clients can be constructed; nothing is called
+BENCH_ENV = {
+    "OPENAI_API_KEY": "bench",
+    "GROQ_API_KEY": "bench",
+    "AWS_REGION": "us-east-1",
+    "AWS_ACCESS_KEY_ID": "bench",
+    "AWS_SECRET_ACCESS_KEY": "bench",
+    "GOOGLE_TRANSLATE_ENDPOINT": "http://127.0.0.1:9",
+    "WARM_UP": "0",
+}
+
+IMPORT_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import app
+print(json.dumps({"import_seconds": time.perf_counter() - start}))
+"""
+
+WARM_UP_SCRIPT = """
+import json, time
+import app
+from warmup import warm_up
+start = time.perf_counter()
+steps = warm_up(app.DATA_FILE_PATH)
+print(json.dumps({"warm_up_seconds": time.perf_counter() - start, "warm_up_steps": steps}))
+"""
+
+_importtime_re = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)$")
+
+
+def run_python(script: str, workdir: str, extra_args: list = ()) -> subprocess.CompletedProcess:
+    env = {**os.environ, **BENCH_ENV, "PYTHONPATH": backend_dir}
+    return subprocess.run([sys.executable, *extra_args, "-c", script], cwd=workdir, env=env,
+                          capture_output=True, text=True, check=True)
+
+
+def last_json_line(output: str) -> dict:
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def parse_importtime(stderr: str) -> list:
+    """Returns (module, self seconds, cumulative seconds, depth) for each line of -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        match = _importtime_re.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            rows.append((module, int(self_us) / 1e6, int(cumulative_us) / 1e6, (len(indent) - 1) // 2))
+    return rows
+
+
+def breakdown(rows: list, root: str = "app", top: int = 15) -> dict:
+    """
+    Summarizes importtime rows: the modules imported directly by `root` by
+    cumulative time, and third-party/top-level packages by total self time.
+    """
+    root_depth = next((depth for module, _, _, depth in rows if module == root), 0)
+    direct = {module: cumulative for module, _, cumulative, depth in rows
+              if depth == root_depth + 1}
+    packages = {}
+    for module, self_seconds, _, _ in rows:
+        package = module.split(".")[0]
+        packages[package] = packages.get(package, 0.0) + self_seconds
+    return {
+        "direct": dict(sorted(direct.items(), key=lambda item: -item[1])[:top]),
+        "packages": dict(sorted(packages.items(), key=lambda item: -item[1])[:top]),
+    }
+
+
+def scratch_dir() -> str:
+    """A working directory like backend/ at runtime: app.py creates its folders there and finds the index."""
+    workdir = tempfile.mkdtemp(prefix="bench-startup-")
+    index = os.path.join(backend_dir, "rag", "faiss")
+    if os.path.isdir(index):
+        shutil.copytree(index, os.path.join(workdir, "faiss"))
+    return workdir
+
+
+def measure(runs: int, warm_up: bool, top: int) -> dict:
+    workdir = scratch_dir()
+    try:
+        # Separate interpreters, so every run is a cold import (modulo the OS file cache)
+        timings = [last_json_line(run_python(IMPORT_SCRIPT, workdir).stdout)["import_seconds"]
+                   for _ in range(runs)]
+        traced = run_python("import app", workdir, ["-X", "importtime"])
+        report = {
+            "runs": runs,
+            "import_seconds": {
+                "median": statistics.median(timings),
+                "min": min(timings),
+                "max": max(timings),
+            },
+            "importtime": breakdown(parse_importtime(traced.stderr), top=top),
+        }
+        if warm_up:
+            report.update(last_json_line(run_python(WARM_UP_SCRIPT, workdir).stdout))
+        return report
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def print_report(report: dict):
+    seconds = report["import_seconds"]
+    print(f"\nimport app: median {seconds['median'] * 1000:.0f} ms "
+          f"(min {seconds['min'] * 1000:.0f}, max {seconds['max'] * 1000:.0f}) over {report['runs']} runs\n")
+    for title, key in (("imported by app", "direct"), ("self time by package", "packages")):
+        print(f"{title:<40}{'ms':>8}")
+        for module, value in report["importtime"][key].items():
+            print(f"{module:<40}{value * 1000:8.1f}")
+        print()
+    if "warm_up_seconds" in report:
+        print(f"warm-up: {report['warm_up_seconds'] * 1000:.0f} ms")
+        for step, value in report["warm_up_steps"].items():
+            print(f"  {step:<38}{value * 1000:8.0f}")
+        print()
+
+
+def compare_to_baseline(report: dict, baseline: dict, max_regression: float) -> list:
+    """Returns a description of each startup timing that regressed more than max_regression."""
+    regressions = []
+    checks = [("import_seconds", report["import_seconds"]["median"], baseline.get("import_seconds", {}).get("median"))]
+    if "warm_up_seconds" in report:
+        checks.append(("warm_up_seconds", report["warm_up_seconds"], baseline.get("warm_up_seconds")))
+    for name, current, previous in checks:
+        if not previous:
+            continue
+        change = current / previous - 1
+        if change > max_regression:
+            regressions.append(f"{name}: {previous:.3f}s -> {current:.3f}s (+{change:.0%})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure backend startup time.")
+    parser.add_argument("--runs", type=int, default=5, help="number of cold imports to time")
+    parser.add_argument("--top", type=int, default=15, help="modules to list in the breakdown")
+    parser.add_argument("--warm-up", action="store_true", help="also time warmup.warm_up()")
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--baseline", nargs="?", const=BASELINE_PATH,
+                        help="previous --json report to compare against (default: the committed baseline)")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed relative increase")
+    args = parser.parse_args(argv)
+
+    report = measure(args.runs, args.warm_up, args.top)
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(report, json.load(f), args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+# deadline.py
+# Per-request time budgets. The API sets a deadline when a request starts; it is
+# carried in a context variable (and so follows work into thread pools that copy
+# the context), and every outbound call derives its timeout from what is left.
+# Transient failures are retried with jittered backoff only while budget remains.
+
+import os
+import time
+import random
+import logging
+import contextvars
+from contextlib import contextmanager
+import requests
+
+# Default budgets in seconds
+REQUEST_BUDGET = float(os.getenv("REQUEST_BUDGET", "30"))
+FORM_BUDGET = float(os.getenv("FORM_BUDGET", "90"))
+BATCH_BUDGET = float(os.getenv("BATCH_BUDGET", "60"))
+JOB_BUDGET = float(os.getenv("JOB_BUDGET", "300"))
+# No call is started with less time than this left
+MIN_CALL_TIMEOUT = 0.5
+
+# HTTP statuses worth retrying
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+# SDK exceptions (OpenAI, Groq, botocore) that mean the request never completed
+TRANSIENT_ERRORS = {"APIConnectionError", "APITimeoutError", "EndpointConnectionError",
+                    "ConnectTimeoutError", "ReadTimeoutError", "ConnectionClosedError"}
+
+_deadline = contextvars.ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when the request's budget does not leave enough time for the next call."""
+
+
+@contextmanager
+def deadline(seconds: float):
+    """Sets a deadline `seconds` from now, or keeps the current one if it is sooner."""
+    new_deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(new_deadline if current is None else min(current, new_deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining():
+    """Seconds left in the current budget, or None if no deadline is set."""
+    current = _deadline.get()
+    if current is None:
+        return None
+    return current - time.monotonic()
+
+
+def has_budget(seconds: float) -> bool:
+    left = remaining()
+    return left is None or left >= seconds
+
+
+def call_timeout(cap: float = None) -> float:
+    """
+    Timeout for the next outbound call: the remaining budget, capped at `cap`.
+    Raises DeadlineExceeded if too little time is left to make the call at all.
+    """
+    left = remaining()
+    if left is None:
+        return cap
+    if left < MIN_CALL_TIMEOUT:
+        raise DeadlineExceeded(f"{max(0.0, left):.2f}s left in the request budget")
+    return left if cap is None else min(cap, left)
+
+
+def is_transient(error: Exception) -> bool:
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    # OpenAI and Groq errors carry status_code; requests' HTTPError carries the response
+    status_code = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if status_code in RETRY_STATUSES:
+        return True
+    return type(error).__name__ in TRANSIENT_ERRORS
+
+
+def retry_call(call, cap: float = None, attempts: int = 3, base_delay: float = 0.25, max_delay: float = 2.0,
+               retry_if=None):
+    """
+    Calls call(timeout) with a timeout derived from the remaining budget, retrying
+    transient errors (and results for which retry_if returns True) with full-jitter
+    exponential backoff. A retry is only made if its backoff still leaves time
+    for another call.
+    """
+    for attempt in range(attempts):
+        timeout = call_timeout(cap)
+        try:
+            result = call(timeout)
+        except Exception as e:
+            if not is_transient(e):
+                raise
+            if not has_budget(MIN_CALL_TIMEOUT):
+                raise DeadlineExceeded(f"Out of budget after: {e}") from e
+            if attempt == attempts - 1:
+                raise
+            failure, result = e, None
+        else:
+            if retry_if is None or not retry_if(result) or attempt == attempts - 1:
+                return result
+            failure = None
+
+        delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+        if not has_budget(delay + MIN_CALL_TIMEOUT):
+            if failure is not None:
+                raise DeadlineExceeded(f"No budget left to retry: {failure}") from failure
+            return result
+        logging.warning(f"Retrying after {failure or 'retryable response'} in {delay:.2f}s")
+        time.sleep(delay)
+
+
+def retryable_response(response) -> bool:
+    return response.status_code in RETRY_STATUSES
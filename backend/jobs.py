@@ -0,0 +1,302 @@
+# jobs.py
+# A small persistent job queue for long-running requests. Jobs are stored in a
+# local SQLite database so queued work survives a restart, and are processed by
+# a bounded pool of background worker threads. When a job finishes its result
+# can be polled by id or pushed to a webhook.
+
+import os
+import json
+import time
+import uuid
+import logging
+import socket
+import sqlite3
+import ipaddress
+import threading
+import requests
+from urllib.parse import urlparse
+from tracing import start_request, stage
+from limits import Overloaded
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join(current_dir, "jobs.sqlite3"))
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "2"))
+# Jobs waiting to run beyond this are refused so the spool cannot grow without bound
+JOBS_MAX_QUEUED = int(os.getenv("JOBS_MAX_QUEUED", "100"))
+# A job still running after this many seconds is assumed lost with its worker and is
+# retried until it reaches JOBS_MAX_ATTEMPTS
+JOBS_LEASE = float(os.getenv("JOBS_LEASE", "900"))
+JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", "2"))
+# Finished jobs are kept this long (seconds) for polling
+JOBS_RETENTION = float(os.getenv("JOBS_RETENTION", str(24 * 3600)))
+# Comma-separated hosts webhooks may be sent to. When empty, any http(s) host whose
+# addresses are all public is allowed; loopback, private, link-local and reserved
+# addresses (the server's own network and cloud metadata endpoints) are refused.
+JOBS_CALLBACK_HOSTS = [h.strip() for h in os.getenv("JOBS_CALLBACK_HOSTS", "").split(",") if h.strip()]
+CALLBACK_TIMEOUT = 10
+CALLBACK_RETRIES = 3
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    callback_url TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+"""
+
+
+class QueueFull(Exception):
+    pass
+
+
+def validate_callback_url(url: str):
+    """Raises ValueError unless the URL is an http(s) URL to an allowed host."""
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise ValueError("callback_url must be an http or https URL")
+    if JOBS_CALLBACK_HOSTS:
+        if parsed.hostname not in JOBS_CALLBACK_HOSTS:
+            raise ValueError(f"callback_url host {parsed.hostname} is not allowed")
+        return
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(parsed.hostname, parsed.port or 443,
+                                                                  proto=socket.IPPROTO_TCP)}
+    except (socket.gaierror, UnicodeError):
+        raise ValueError(f"callback_url host {parsed.hostname} does not resolve")
+    for address in addresses:
+        # Drop any IPv6 zone id (fe80::1%eth0) before parsing
+        if not ipaddress.ip_address(address.split("%")[0]).is_global:
+            raise ValueError(f"callback_url host {parsed.hostname} resolves to a non-public address")
+
+
+class JobQueue:
+    """
+    Runs registered handlers for queued jobs on a fixed number of worker threads.
+    Handlers take the job payload and return a JSON-serializable result. A kind's
+    optional cleanup hook gets the payload once the job has succeeded or finally
+    failed, but not when it is put back in the queue to be retried.
+    """
+
+    def __init__(self, db_path: str = JOBS_DB_PATH, workers: int = JOBS_WORKERS,
+                 max_queued: int = JOBS_MAX_QUEUED, max_attempts: int = JOBS_MAX_ATTEMPTS,
+                 lease: float = JOBS_LEASE):
+        self.db_path = db_path
+        self.workers = workers
+        self.max_queued = max_queued
+        self.max_attempts = max_attempts
+        self.lease = lease
+        self.handlers = {}
+        self.cleanups = {}
+        self._wakeup = threading.Condition()
+        # Set when a job was submitted since a worker last found the queue empty
+        self._pending = False
+        self._stopping = threading.Event()
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self._last_cleanup = 0.0
+        # The database is created on first use, not when the queue is constructed
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        if not self._schema_ready:
+            with self._schema_lock:
+                if not self._schema_ready:
+                    conn.executescript(SCHEMA)
+                    self._schema_ready = True
+        return conn
+
+    def register(self, kind: str, handler, cleanup=None):
+        self.handlers[kind] = handler
+        if cleanup is not None:
+            self.cleanups[kind] = cleanup
+
+    def start(self):
+        """Starts the worker threads; does nothing if they are already running."""
+        with self._start_lock:
+            if self._threads:
+                return
+            self._stopping.clear()
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"job-worker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout: float = None):
+        self._stopping.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def submit(self, kind: str, payload: dict, callback_url: str = None, job_id: str = None) -> str:
+        if kind not in self.handlers:
+            raise ValueError(f"No handler registered for job kind {kind}")
+        job_id = job_id or uuid.uuid4().hex
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            queued = conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)).fetchone()[0]
+            if queued >= self.max_queued:
+                conn.execute("ROLLBACK")
+                raise QueueFull(f"{queued} jobs are already waiting")
+            conn.execute(
+                "INSERT INTO jobs (id, kind, status, payload, callback_url, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, QUEUED, json.dumps(payload), callback_url, now, now),
+            )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        with self._wakeup:
+            self._pending = True
+            self._wakeup.notify()
+        return job_id
+
+    def get(self, job_id: str):
+        """Returns the public view of a job, or None if it does not exist."""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        return self._describe(row) if row else None
+
+    def cleanup(self, retention: float = JOBS_RETENTION):
+        """Deletes finished jobs older than the retention period."""
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                         (SUCCEEDED, FAILED, time.time() - retention))
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _describe(row) -> dict:
+        job = {
+            "job_id": row["id"],
+            "status": row["status"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+        if row["status"] == SUCCEEDED:
+            job["result"] = json.loads(row["result"])
+        elif row["status"] == FAILED:
+            job["error"] = row["error"]
+        return job
+
+    def _claim(self):
+        """
+        Atomically marks the oldest runnable job as running and returns it, or None.
+        A job still marked running after the lease expired belonged to a worker that
+        died, and is retried until it reaches the attempt limit.
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            abandoned = conn.execute("SELECT * FROM jobs WHERE status = ? AND updated_at < ? AND attempts >= ?",
+                                     (RUNNING, now - self.lease, self.max_attempts)).fetchall()
+            conn.executemany("UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                             [(FAILED, "Interrupted too many times", now, job["id"]) for job in abandoned])
+            row = conn.execute("SELECT * FROM jobs WHERE status = ? OR (status = ? AND updated_at < ?) "
+                               "ORDER BY created_at LIMIT 1", (QUEUED, RUNNING, now - self.lease)).fetchone()
+            if row is not None:
+                conn.execute("UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                             (RUNNING, now, row["id"]))
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        for job in abandoned:
+            self._cleanup(job)
+        return row
+
+    def _finish(self, job_id: str, status: str, result=None, error: str = None):
+        conn = self._connect()
+        try:
+            conn.execute("UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                         (status, json.dumps(result) if result is not None else None, error, time.time(), job_id))
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        return row
+
+    def _work(self):
+        while not self._stopping.is_set():
+            row = self._claim()
+            if row is None:
+                if time.time() - self._last_cleanup > 3600:
+                    self._last_cleanup = time.time()
+                    self.cleanup()
+                with self._wakeup:
+                    # Also poll, so jobs queued by another process are picked up
+                    if not self._pending and not self._stopping.is_set():
+                        self._wakeup.wait(timeout=5)
+                    self._pending = False
+                continue
+            self._run(row)
+
+    def _run(self, row):
+        start_request(row["id"])
+        try:
+            with stage("job", kind=row["kind"], attempt=row["attempts"] + 1):
+                result = self.handlers[row["kind"]](json.loads(row["payload"]))
+            finished = self._finish(row["id"], SUCCEEDED, result=result)
+        except Overloaded as e:
+            if row["attempts"] + 1 < self.max_attempts:
+                # Put the job back and hold this worker off the saturated provider for a while
+                logging.warning(f"Job {row['id']} shed by admission control, retrying in {e.retry_after}s")
+                self._finish(row["id"], QUEUED)
+                self._stopping.wait(e.retry_after)
+                return
+            finished = self._finish(row["id"], FAILED, error=str(e))
+        except Exception as e:
+            logging.exception(f"Job {row['id']} failed")
+            finished = self._finish(row["id"], FAILED, error=str(e))
+        self._cleanup(row)
+        if finished["callback_url"]:
+            self._send_callback(finished["callback_url"], self._describe(finished))
+
+    def _cleanup(self, row):
+        cleanup = self.cleanups.get(row["kind"])
+        if cleanup is None:
+            return
+        try:
+            cleanup(json.loads(row["payload"]))
+        except Exception:
+            logging.exception(f"Cleanup of job {row['id']} failed")
+
+    def _send_callback(self, url: str, job: dict):
+        # Checked again at send time: the host's DNS may have changed since the job was submitted
+        try:
+            validate_callback_url(url)
+        except ValueError as e:
+            logging.warning(f"Callback for job {job['job_id']} not sent: {e}")
+            return
+        for attempt in range(CALLBACK_RETRIES):
+            try:
+                with stage("callback"):
+                    # Redirects are not followed, since they could point anywhere
+                    response = requests.post(url, json=job, timeout=CALLBACK_TIMEOUT, allow_redirects=False)
+                if response.status_code < 500:
+                    return
+                logging.warning(f"Callback for job {job['job_id']} returned HTTP {response.status_code}")
+            except requests.RequestException as e:
+                logging.warning(f"Callback for job {job['job_id']} failed: {e}")
+            time.sleep(2 ** attempt)
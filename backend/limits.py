@@ -0,0 +1,175 @@
+# limits.py
+# Admission control for calls to external providers. Each provider gets a
+# concurrency limit and a token-bucket rate limit with a bounded wait queue;
+# calls that cannot start within their wait budget are shed with Overloaded,
+# which the API turns into 503 with a Retry-After header.
+
+import os
+import json
+import math
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from prometheus_client import Counter, Gauge
+
+# concurrency: calls in flight; rate: calls per second (None for no rate limit);
+# burst: bucket size; max_queue: callers allowed to wait for a slot; max_wait:
+# longest wait for a slot (LIMIT_MAX_WAIT if unset, None to wait as long as the
+# caller's deadline allows, for slow calls made on behalf of long jobs)
+DEFAULT_LIMITS = {
+    "openai": {"concurrency": 16, "rate": 8, "burst": 16},
+    "groq": {"concurrency": 8, "rate": 4, "burst": 8},
+    "pindo": {"concurrency": 4, "rate": 2, "burst": 4},
+    "aws_translate": {"concurrency": 16, "rate": 20, "burst": 20},
+    "google_translate": {"concurrency": 16, "rate": 10, "burst": 10},
+    "cloudinary": {"concurrency": 8, "rate": 8, "burst": 8},
+    "ocr": {"concurrency": 4, "rate": None, "max_wait": None},
+}
+# Used for providers without an entry above
+FALLBACK_LIMIT = {"concurrency": 8, "rate": None}
+# Longest a call waits for a slot before it is shed (seconds)
+LIMIT_MAX_WAIT = float(os.getenv("LIMIT_MAX_WAIT", "5"))
+# Overrides as JSON, e.g. {"groq": {"concurrency": 2, "rate": 0.5}}
+PROVIDER_LIMITS = json.loads(os.getenv("PROVIDER_LIMITS") or "{}")
+
+QUEUE_DEPTH = Gauge("provider_queue_depth", "Calls waiting for a provider slot.", ["provider"])
+IN_FLIGHT = Gauge("provider_in_flight", "Calls currently running against a provider.", ["provider"])
+SHED = Counter("provider_shed_total", "Calls rejected by admission control.", ["provider", "reason"])
+
+
+class Overloaded(Exception):
+    """Raised when a call is shed because a provider is saturated."""
+
+    def __init__(self, provider: str, reason: str, retry_after: float):
+        super().__init__(f"{provider} is overloaded ({reason}), retry after {retry_after:.0f}s")
+        self.provider = provider
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Limiter:
+    """A concurrency semaphore combined with a token bucket and a bounded wait queue."""
+
+    def __init__(self, name: str, concurrency: int, rate: float = None, burst: float = None,
+                 max_queue: int = None, max_wait: float = LIMIT_MAX_WAIT):
+        self.name = name
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst or max(1, rate or 1)
+        self.max_queue = concurrency * 2 if max_queue is None else max_queue
+        self.max_wait = max_wait
+        self.tokens = self.burst
+        self.in_flight = 0
+        self.waiting = 0
+        self.shed = 0
+        self._refilled_at = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _refill(self, now: float):
+        if self.rate:
+            self.tokens = min(self.burst, self.tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _reject(self, reason: str, retry_after: float):
+        self.shed += 1
+        SHED.labels(self.name, reason).inc()
+        logging.warning(f"Shedding {self.name} call: {reason} ({self.in_flight} in flight, {self.waiting} waiting)")
+        raise Overloaded(self.name, reason, max(1, math.ceil(retry_after)))
+
+    def acquire(self, timeout: float = None) -> float:
+        """
+        Waits for a slot and returns the seconds spent waiting. Raises Overloaded
+        immediately if the wait queue is full or the slot cannot be granted within
+        the timeout, capped at max_wait (max_wait, or LIMIT_MAX_WAIT, by default).
+        """
+        max_wait = LIMIT_MAX_WAIT if self.max_wait is None else self.max_wait
+        if timeout is None:
+            timeout = max_wait
+        elif self.max_wait is not None:
+            timeout = min(timeout, self.max_wait)
+        start = time.monotonic()
+        with self._cond:
+            if not self._try_take(start):
+                if self.waiting >= self.max_queue:
+                    self._reject("queue_full", timeout)
+                self._wait_for_slot(start + timeout, timeout)
+            return time.monotonic() - start
+
+    def _try_take(self, now: float) -> bool:
+        self._refill(now)
+        if self.in_flight >= self.concurrency or (self.rate and self.tokens < 1):
+            return False
+        if self.rate:
+            self.tokens -= 1
+        self.in_flight += 1
+        IN_FLIGHT.labels(self.name).set(self.in_flight)
+        return True
+
+    def _wait_for_slot(self, deadline: float, timeout: float):
+        self.waiting += 1
+        QUEUE_DEPTH.labels(self.name).set(self.waiting)
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if self.rate:
+                    # Time until there are enough tokens for everyone queued up to this caller
+                    token_wait = (self.waiting - self.tokens) / self.rate
+                    if token_wait > remaining:
+                        self._reject("rate", token_wait)
+                if remaining <= 0:
+                    self._reject("timeout", timeout)
+                wait_for = remaining
+                if self.rate and self.tokens < 1:
+                    wait_for = min(remaining, (1 - self.tokens) / self.rate)
+                self._cond.wait(wait_for)
+                if self._try_take(time.monotonic()):
+                    return
+        finally:
+            self.waiting -= 1
+            QUEUE_DEPTH.labels(self.name).set(self.waiting)
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            IN_FLIGHT.labels(self.name).set(self.in_flight)
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self, timeout: float = None):
+        waited = self.acquire(timeout)
+        try:
+            yield waited
+        finally:
+            self.release()
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                "concurrency": self.concurrency,
+                "rate": self.rate,
+                "in_flight": self.in_flight,
+                "waiting": self.waiting,
+                "max_queue": self.max_queue,
+                "max_wait": self.max_wait,
+                "shed": self.shed,
+            }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(provider: str) -> Limiter:
+    with _limiters_lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            config = {**DEFAULT_LIMITS.get(provider, FALLBACK_LIMIT), **PROVIDER_LIMITS.get(provider, {})}
+            limiter = _limiters[provider] = Limiter(provider, **config)
+        return limiter
+
+
+def get_limit_stats() -> dict:
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {name: limiter.snapshot() for name, limiter in limiters.items()}
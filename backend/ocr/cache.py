@@ -0,0 +1,115 @@
+# cache.py
+# In-memory cache of OCR results keyed by the SHA-256 of the uploaded file and,
+# optionally, a perceptual hash so re-encoded copies of the same scan also hit.
+
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from PIL import Image, UnidentifiedImageError
+from tracing import record_cache_lookup
+
+OCR_CACHE_MAX_ENTRIES = int(os.getenv("OCR_CACHE_MAX_ENTRIES", "512"))
+OCR_CACHE_TTL = float(os.getenv("OCR_CACHE_TTL", str(24 * 3600)))
+# Perceptual matching is off by default: two scans of the same document template
+# must never share a result, so only enable it with a small distance.
+OCR_CACHE_PHASH = os.getenv("OCR_CACHE_PHASH", "0") == "1"
+OCR_CACHE_PHASH_DISTANCE = int(os.getenv("OCR_CACHE_PHASH_DISTANCE", "2"))
+
+
+def file_sha256(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def image_dhash(file_path: str, hash_size: int = 8):
+    """64-bit difference hash of an image, or None if the file is not an image Pillow can read."""
+    try:
+        with Image.open(file_path) as image:
+            image.draft("L", (hash_size * 16, hash_size * 16))
+            small = image.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+    except (UnidentifiedImageError, OSError):
+        return None
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        for column in range(hash_size):
+            left = pixels[row * (hash_size + 1) + column]
+            right = pixels[row * (hash_size + 1) + column + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+class CacheKey:
+    def __init__(self, sha256: str, phash: int = None):
+        self.sha256 = sha256
+        self.phash = phash
+
+
+class OCRCache:
+    """LRU cache of extracted fields with a per-entry time to live."""
+
+    def __init__(self, max_entries: int = OCR_CACHE_MAX_ENTRIES, ttl: float = OCR_CACHE_TTL,
+                 use_phash: bool = OCR_CACHE_PHASH, phash_distance: int = OCR_CACHE_PHASH_DISTANCE):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.use_phash = use_phash
+        self.phash_distance = phash_distance
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key_for(self, file_path: str) -> CacheKey:
+        phash = image_dhash(file_path) if self.use_phash else None
+        return CacheKey(file_sha256(file_path), phash)
+
+    def get(self, key: CacheKey):
+        """Returns the cached result for the key, or None."""
+        now = time.time()
+        with self._lock:
+            self._evict_expired(now)
+            entry = self._entries.get(key.sha256)
+            if entry is not None:
+                self._entries.move_to_end(key.sha256)
+                record_cache_lookup("ocr", "hit")
+                return entry["result"]
+            if key.phash is not None:
+                for sha256, entry in reversed(self._entries.items()):
+                    if entry["phash"] is not None and \
+                            bin(entry["phash"] ^ key.phash).count("1") <= self.phash_distance:
+                        self._entries.move_to_end(sha256)
+                        record_cache_lookup("ocr", "phash_hit")
+                        return entry["result"]
+        record_cache_lookup("ocr", "miss")
+        return None
+
+    def put(self, key: CacheKey, result):
+        if result is None:
+            return
+        with self._lock:
+            self._entries[key.sha256] = {"result": result, "phash": key.phash, "expires": time.time() + self.ttl}
+            self._entries.move_to_end(key.sha256)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def _evict_expired(self, now: float):
+        expired = [sha256 for sha256, entry in self._entries.items() if entry["expires"] <= now]
+        for sha256 in expired:
+            del self._entries[sha256]
+        if expired:
+            logging.info(f"Evicted {len(expired)} expired OCR cache entries")
+
+
+ocr_cache = OCRCache()
@@ -1,42 +1,98 @@
 # ocr.py
 # Calls the OCR endpoint to extract fields from an image or PDF file.
+# Documents are preprocessed first and PDF pages are sent concurrently.
 
 import requests
-import time
 import os
+import json
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from tracing import provider_call
+from deadline import retry_call, retryable_response
+from ocr.preprocess import iter_document_pages
+from ocr.cache import ocr_cache
 
 OCR_URL = os.getenv("OCR_URL")
+OCR_MAX_PARALLEL_PAGES = int(os.getenv("OCR_MAX_PARALLEL_PAGES", "4"))
+# Longest a single OCR request may take, in seconds
+OCR_TIMEOUT = float(os.getenv("OCR_TIMEOUT", "60"))
+
+def extract_page(page, page_number=1):
+    """Sends one prepared page to the OCR endpoint and returns its JSON response, or None on failure."""
+    url = f"{OCR_URL}/extract"
+
+    def post(timeout):
+        files = {'file': (page.filename, page.content, page.mime_type)}
+        with provider_call("ocr", "extract", page=page_number, bytes=len(page.content),
+                           prepare_ms=round(page.prepare_seconds * 1000, 1)) as span:
+            response = requests.post(url, files=files, timeout=timeout)
+            if response.status_code != 200:
+                span.fail(f"HTTP {response.status_code}")
+        return response
+
+    response = retry_call(post, cap=OCR_TIMEOUT, retry_if=retryable_response)
+    if response.status_code == 200:
+        return response.json()  # Extracted JSON response
+    else:
+        print(f"Error: {response.status_code} - {response.text}")
+        return None
+
+def merge_page_fields(results):
+    """
+    Merges per-page OCR results into one field set, keeping the first non-empty
+    value found for each field. Results are returned in the same encoding the
+    OCR service uses (a JSON string or an object).
+    """
+    results = [result for result in results if result is not None]
+    if not results:
+        return None
+    if len(results) == 1:
+        return results[0]
+
+    encoded_as_string = isinstance(results[0], str)
+    merged = {}
+    for result in results:
+        fields = json.loads(result) if isinstance(result, str) else result
+        if not isinstance(fields, dict):
+            continue
+        for key, value in fields.items():
+            if value not in (None, "", [], {}) and merged.get(key) in (None, "", [], {}):
+                merged[key] = value
+            else:
+                merged.setdefault(key, value)
+    return json.dumps(merged) if encoded_as_string else merged
 
 def extract_fields_from_image(image_path):
     """
     Sends an image or PDF to the FastAPI OCR endpoint and gets the extracted fields.
-    
+
     Args:
         image_path (str): Path to the image or PDF file to be processed.
-    
+
     Returns:
         dict: The extracted fields as a JSON response.
     """
-    url = f"{OCR_URL}/extract"
-
-    # Start timing
-    start_time = time.time()
-
-    with open(image_path, 'rb') as image_file:
-        files = {'file': image_file}
-        response = requests.post(url, files=files)
-
-        # End timing
-        end_time = time.time()
-        elapsed_time = end_time - start_time
-        print(f"Time taken: {elapsed_time:.2f} seconds")
+    # Resubmitted documents are answered from the cache without preprocessing or OCR
+    cache_key = ocr_cache.key_for(image_path)
+    cached = ocr_cache.get(cache_key)
+    if cached is not None:
+        logging.debug(f"OCR cache hit for {os.path.basename(image_path)}")
+        return cached
 
-        if response.status_code == 200:
-            return response.json()  # Extracted JSON response
-        else:
-            print(f"Error: {response.status_code} - {response.text}")
-            return None
+    with ThreadPoolExecutor(max_workers=OCR_MAX_PARALLEL_PAGES) as pool:
+        # Pages are uploaded while later PDF pages are still being rendered. Each
+        # runs in its own copy of the request context so its span keeps this stage.
+        futures = [
+            pool.submit(contextvars.copy_context().run, extract_page, page, number)
+            for number, page in enumerate(iter_document_pages(image_path), start=1)
+        ]
+        results = [future.result() for future in futures]
+    fields = merge_page_fields(results)
+    # Failed extractions are not cached so a retry reaches the OCR service again
+    ocr_cache.put(cache_key, fields)
+    return fields
 
 # Example usage
 # result = extract_fields_from_image("Ethiopia-1.jpg")
-# print(result)
\ No newline at end of file
+# print(result)
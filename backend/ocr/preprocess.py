@@ -0,0 +1,137 @@
+# preprocess.py
+# Prepares uploaded documents for OCR: images are auto-oriented, cropped to the
+# document, downsized to a resolution the OCR model needs and recompressed;
+# PDFs are split into pages rendered the same way.
+
+import io
+import os
+import time
+import logging
+import pypdfium2 as pdfium
+from PIL import Image, ImageChops, ImageOps, UnidentifiedImageError
+
+# Longest side in pixels; enough for OCR of ID cards, passports and A4 pages
+OCR_MAX_SIDE = int(os.getenv("OCR_MAX_SIDE", "2000"))
+OCR_JPEG_QUALITY = int(os.getenv("OCR_JPEG_QUALITY", "85"))
+PDF_RENDER_DPI = 200
+PDF_MAX_PAGES = int(os.getenv("OCR_PDF_MAX_PAGES", "10"))
+
+# Only crop when the detected document covers at least this share of the image
+MIN_CROP_AREA = 0.3
+CROP_MARGIN = 10
+# Border detection runs on a copy reduced to about this many pixels on its longest side
+CROP_PROXY_SIDE = 512
+
+
+class Page:
+    """One image to send to the OCR service."""
+
+    def __init__(self, filename: str, content: bytes, mime_type: str, prepare_seconds: float = 0.0):
+        self.filename = filename
+        self.content = content
+        self.mime_type = mime_type
+        self.prepare_seconds = prepare_seconds
+
+
+def is_pdf(file_path: str) -> bool:
+    with open(file_path, "rb") as f:
+        return f.read(5) == b"%PDF-"
+
+
+def autocrop(image: Image.Image) -> Image.Image:
+    """Crops away a uniform border (table, scanner bed) around the document."""
+    factor = max(1, max(image.size) // CROP_PROXY_SIDE)
+    proxy = image.reduce(factor)
+    background = Image.new(proxy.mode, proxy.size, proxy.getpixel((0, 0)))
+    difference = ImageChops.difference(proxy, background).convert("L")
+    # Ignore sensor noise and JPEG artefacts in the background
+    bbox = difference.point(lambda value: 255 if value > 30 else 0).getbbox()
+    if not bbox:
+        return image
+    left, top, right, bottom = (coordinate * factor for coordinate in bbox)
+    if (right - left) * (bottom - top) < MIN_CROP_AREA * image.width * image.height:
+        return image
+    return image.crop((
+        max(0, left - CROP_MARGIN),
+        max(0, top - CROP_MARGIN),
+        min(image.width, right + CROP_MARGIN),
+        min(image.height, bottom + CROP_MARGIN),
+    ))
+
+
+def prepare_image(image: Image.Image) -> bytes:
+    """Orients, crops, downsizes and JPEG-encodes an image for OCR."""
+    image = ImageOps.exif_transpose(image)
+    image = image.convert("RGB")
+    image = autocrop(image)
+    image.thumbnail((OCR_MAX_SIDE, OCR_MAX_SIDE), Image.LANCZOS)
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=OCR_JPEG_QUALITY, optimize=True)
+    return buffer.getvalue()
+
+
+def iter_pdf_pages(file_path: str):
+    """
+    Renders each page of a PDF to a prepared JPEG page, yielding pages as soon
+    as they are ready. PDFium is not thread-safe, so pages are rendered in order.
+    """
+    base_name = os.path.splitext(os.path.basename(file_path))[0]
+    pdf = pdfium.PdfDocument(file_path)
+    try:
+        if len(pdf) > PDF_MAX_PAGES:
+            logging.warning(f"{file_path} has {len(pdf)} pages, only the first {PDF_MAX_PAGES} are sent to OCR")
+        for index in range(min(len(pdf), PDF_MAX_PAGES)):
+            start_time = time.perf_counter()
+            page = pdf[index]
+            # Render straight at the target size rather than downsizing afterwards
+            scale = min(PDF_RENDER_DPI / 72, OCR_MAX_SIDE / max(page.get_size()))
+            image = page.render(scale=scale).to_pil()
+            content = prepare_image(image)
+            yield Page(f"{base_name}_page{index + 1}.jpg", content, "image/jpeg", time.perf_counter() - start_time)
+    finally:
+        pdf.close()
+
+
+def iter_document_pages(file_path: str):
+    """
+    Yields the pages of an uploaded image or PDF to send to the OCR service.
+
+    Files Pillow cannot read are passed through unchanged, and an image is only
+    replaced by its prepared version if that is smaller.
+    """
+    filename = os.path.basename(file_path)
+    with open(file_path, "rb") as f:
+        original = f.read()
+    original_page = Page(filename, original, "application/octet-stream")
+
+    start_time = time.perf_counter()
+    yielded = False
+    try:
+        if is_pdf(file_path):
+            for page in iter_pdf_pages(file_path):
+                yielded = True
+                yield page
+            if not yielded:
+                yield original_page
+            return
+        with Image.open(io.BytesIO(original)) as image:
+            # Lets the JPEG decoder downscale while decoding large phone photos
+            image.draft("RGB", (OCR_MAX_SIDE, OCR_MAX_SIDE))
+            prepared = prepare_image(image)
+    except (UnidentifiedImageError, pdfium.PdfiumError, OSError) as e:
+        if yielded:
+            logging.warning(f"Could not render the rest of {filename}: {e}")
+            return
+        logging.warning(f"Could not preprocess {filename}, sending it unchanged: {e}")
+        yield original_page
+        return
+
+    if len(prepared) >= len(original):
+        yield original_page
+    else:
+        yield Page(f"{os.path.splitext(filename)[0]}.jpg", prepared, "image/jpeg", time.perf_counter() - start_time)
+
+
+def preprocess_document(file_path: str) -> list:
+    """Returns all pages of an uploaded image or PDF, prepared for OCR."""
+    return list(iter_document_pages(file_path))
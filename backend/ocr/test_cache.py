@@ -0,0 +1,65 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+from PIL import Image
+
+# cache.py imports shared modules (tracing) from the backend root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cache import OCRCache
+
+
+class TestOCRCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.image = Image.frombytes("RGB", (300, 200), os.urandom(300 * 200 * 3)).resize((600, 400))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def save(self, name, **params):
+        path = os.path.join(self.tmp.name, name)
+        self.image.save(path, **params)
+        return path
+
+    def test_identical_file_hits(self):
+        cache = OCRCache()
+        path = self.save("id.png")
+        cache.put(cache.key_for(path), '{"name": "Jane"}')
+        self.assertEqual(cache.get(cache.key_for(self.save("copy.png"))), '{"name": "Jane"}')
+
+    def test_failed_results_are_not_stored(self):
+        cache = OCRCache()
+        cache.put(cache.key_for(self.save("id.png")), None)
+        self.assertEqual(len(cache), 0)
+
+    def test_entries_expire_and_are_bounded(self):
+        cache = OCRCache(max_entries=2, ttl=60)
+        keys = []
+        for number in range(3):
+            with open(os.path.join(self.tmp.name, f"{number}.bin"), "wb") as f:
+                f.write(bytes([number]))
+            keys.append(cache.key_for(f.name))
+            cache.put(keys[-1], {"page": number})
+        self.assertIsNone(cache.get(keys[0]))
+        self.assertEqual(cache.get(keys[2]), {"page": 2})
+        with patch("cache.time.time", return_value=10 ** 12):
+            self.assertIsNone(cache.get(keys[2]))
+        self.assertEqual(len(cache), 0)
+
+    def test_reencoded_copy_hits_only_with_perceptual_hash(self):
+        png = self.save("id.png")
+        jpeg = self.save("id.jpg", quality=70)
+        exact = OCRCache(use_phash=False)
+        exact.put(exact.key_for(png), {"name": "Jane"})
+        self.assertIsNone(exact.get(exact.key_for(jpeg)))
+
+        perceptual = OCRCache(use_phash=True, phash_distance=4)
+        perceptual.put(perceptual.key_for(png), {"name": "Jane"})
+        self.assertEqual(perceptual.get(perceptual.key_for(jpeg)), {"name": "Jane"})
+
+
+if __name__ == '__main__':
+    unittest.main()
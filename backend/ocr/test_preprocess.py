@@ -0,0 +1,58 @@
+import io
+import os
+import tempfile
+import unittest
+from PIL import Image
+from preprocess import preprocess_document, OCR_MAX_SIDE
+
+
+class TestPreprocessDocument(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def save(self, image, name, **params):
+        path = os.path.join(self.tmp.name, name)
+        image.save(path, **params)
+        return path
+
+    def noisy_image(self, size):
+        # Random pixels so the encoder cannot shrink the image to almost nothing
+        return Image.frombytes("RGB", size, os.urandom(size[0] * size[1] * 3))
+
+    def test_large_photo_is_downsized(self):
+        path = self.save(self.noisy_image((4000, 3000)), "passport.png")
+        pages = preprocess_document(path)
+        self.assertEqual(len(pages), 1)
+        self.assertEqual(pages[0].mime_type, "image/jpeg")
+        self.assertLess(len(pages[0].content), os.path.getsize(path))
+        with Image.open(io.BytesIO(pages[0].content)) as prepared:
+            self.assertEqual(max(prepared.size), OCR_MAX_SIDE)
+
+    def test_border_is_cropped(self):
+        image = Image.new("RGB", (1000, 1000), "white")
+        image.paste(self.noisy_image((700, 500)), (150, 250))
+        path = self.save(image, "id.bmp")
+        with Image.open(io.BytesIO(preprocess_document(path)[0].content)) as prepared:
+            self.assertLess(prepared.size[0], 800)
+            self.assertLess(prepared.size[1], 600)
+
+    def test_pdf_is_split_into_pages(self):
+        first, second = Image.new("RGB", (850, 1100), "white"), Image.new("RGB", (850, 1100), "gray")
+        path = self.save(first, "form.pdf", save_all=True, append_images=[second])
+        pages = preprocess_document(path)
+        self.assertEqual([page.filename for page in pages], ["form_page1.jpg", "form_page2.jpg"])
+
+    def test_unreadable_file_is_sent_unchanged(self):
+        path = os.path.join(self.tmp.name, "scan.heic")
+        with open(path, "wb") as f:
+            f.write(b"not an image")
+        pages = preprocess_document(path)
+        self.assertEqual(pages[0].content, b"not an image")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,192 @@
+# build_faq.py
+# Offline job that builds the FAQ answer store served by faq_store.py. For each
+# support article it asks the LLM for the questions citizens ask that the article
+# answers, answers the article title as a question with the same prompt the live
+# assistant uses, translates questions and answer into every supported language
+# and embeds all question variants.
+#
+# New or changed articles are written with "vetted": false and are not served
+# until a reviewer sets it to true in rag/faq/answers.json. Unchanged articles
+# (same content hash) keep their entry, including the reviewer's decision.
+#
+# Usage (from backend/):
+#   python -m rag.build_faq --limit 5
+#   python -m rag.build_faq --variants 8 --workers 4
+
+import os
+import sys
+import json
+import hashlib
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from rag.faq_store import FAQ_STORE_PATH, ANSWERS_FILE, VECTORS_FILE, normalize_question
+from rag.llm_backends import get_backend, parse_assistant_json
+
+DATA_FILE_PATH = os.path.join(backend_dir, "rag", "data", "web_scrape_output_with_content.json")
+LANGS = ["en", "fr", "sw", "rw"]
+# Article text sent to the LLM is cut to this many characters
+MAX_ARTICLE_CHARS = 12000
+
+QUESTIONS_PROMPT = """You write test questions for the Irembo support assistant.
+Below is one support article. List {variants} different questions, as a citizen
+would type or say them, that this article fully answers. Vary the wording and
+level of detail; keep each under 20 words. Return only a JSON list of strings.
+
+Title: {title}
+
+{body}"""
+
+
+def content_hash(article: dict) -> str:
+    return hashlib.sha256(json.dumps(article["content"], sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def load_articles(data_file_path: str) -> list:
+    """Returns (category title, article) for every article in the scraped data."""
+    with open(data_file_path, encoding="utf-8") as f:
+        data = json.load(f)
+    return [(category["title"], article)
+            for category in data["categories"]
+            for sub_category in category["subcategories"]
+            for article in sub_category["documents"]]
+
+
+def load_store(path: str) -> dict:
+    answers_path = os.path.join(path, ANSWERS_FILE)
+    if not os.path.exists(answers_path):
+        return {}
+    with open(answers_path, encoding="utf-8") as f:
+        return json.load(f)["articles"]
+
+
+def complete_json_list(backend, messages: list, timeout: float):
+    content, _usage = backend.complete(messages, timeout=timeout)
+    start, end = content.find("["), content.rfind("]")
+    return json.loads(content[start:end + 1]) if start != -1 and end > start else None
+
+
+def generate_entry(category: str, article: dict, variants: int, backend_name: str, timeout: float) -> dict:
+    """Builds the English questions and answer for one article."""
+    from langchain.docstore.document import Document
+    from rag.rag_with_openai import build_messages
+    backend = get_backend(backend_name)
+    body = article["content"]["body"][:MAX_ARTICLE_CHARS]
+
+    prompt = QUESTIONS_PROMPT.format(variants=variants, title=article["doc_title"], body=body)
+    questions = complete_json_list(backend, [{"role": "user", "content": prompt}], timeout) or []
+    questions = [question.strip() for question in questions if isinstance(question, str) and question.strip()]
+    # The title itself is a question users ask too
+    questions = list(dict.fromkeys([article["doc_title"], *questions]))[:variants + 1]
+
+    # Answered exactly as the live assistant would, from this article alone
+    document = Document(page_content=article["content"]["body"], metadata={"title": article["doc_title"]})
+    content, _usage = backend.complete(build_messages(questions[0], [document]), timeout=timeout)
+    answer = parse_assistant_json(content)
+    if answer is None or answer["op_type"] not in ("chat", "new", "renew") or not answer.get("data"):
+        raise ValueError(f"no valid answer for {article['doc_title']!r}")
+
+    return {
+        "category": category,
+        "content_sha256": content_hash(article),
+        "vetted": False,
+        "questions": {"en": questions},
+        "answers": {"en": answer},
+    }
+
+
+def translate_entry(entry: dict, langs: list):
+    """Adds translated questions and answers for each language other than English."""
+    from translate.translate import translate_text
+    for lang in langs:
+        if lang == "en":
+            continue
+        questions = [translate_text(question, source_lang="en", target_lang=lang, service="amazon")
+                     for question in entry["questions"]["en"]]
+        entry["questions"][lang] = [question for question in questions if question]
+        answer = entry["answers"]["en"]
+        data = translate_text(answer["data"], source_lang="en", target_lang=lang, service="amazon")
+        if data:
+            entry["answers"][lang] = {**answer, "data": data}
+
+
+def embed_store(articles: dict):
+    """Returns (rows, vectors) for every distinct question variant in the store."""
+    from rag.rag_with_openai import get_components
+    _llm, embeddings = get_components()
+    rows, seen = [], set()
+    for title in sorted(articles):
+        for lang, questions in sorted(articles[title]["questions"].items()):
+            for question in questions:
+                key = (title, lang, normalize_question(question))
+                if key not in seen:
+                    seen.add(key)
+                    rows.append([title, lang, question])
+    vectors = embeddings.embed_documents([question for _title, _lang, question in rows])
+    return rows, np.asarray(vectors, dtype=np.float32)
+
+
+def save_store(path: str, articles: dict, rows: list, vectors: np.ndarray):
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, ANSWERS_FILE), "w", encoding="utf-8") as f:
+        json.dump({"articles": articles, "rows": rows}, f, ensure_ascii=False, indent=1, sort_keys=True)
+    np.save(os.path.join(path, VECTORS_FILE), vectors)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the precomputed FAQ answer store.")
+    parser.add_argument("--data", default=DATA_FILE_PATH, help="scraped articles JSON")
+    parser.add_argument("--out", default=FAQ_STORE_PATH, help="store directory")
+    parser.add_argument("--langs", default=",".join(LANGS), help="comma separated languages to store")
+    parser.add_argument("--variants", type=int, default=6, help="questions to generate per article")
+    parser.add_argument("--backend", default="openai", help="LLM backend used to write questions and answers")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds allowed per LLM call")
+    parser.add_argument("--workers", type=int, default=4, help="articles processed at once")
+    parser.add_argument("--limit", type=int, help="only process the first N articles")
+    parser.add_argument("--force", action="store_true", help="regenerate unchanged articles too")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    langs = args.langs.split(",")
+    articles = load_articles(args.data)[:args.limit]
+    previous = load_store(args.out)
+    store = {}
+    todo = []
+    for category, article in articles:
+        entry = previous.get(article["doc_title"])
+        if entry and entry.get("content_sha256") == content_hash(article) and not args.force:
+            store[article["doc_title"]] = entry
+        else:
+            todo.append((category, article))
+    logging.info(f"{len(store)} articles unchanged, {len(todo)} to generate")
+
+    def build(item):
+        category, article = item
+        try:
+            entry = generate_entry(category, article, args.variants, args.backend, args.timeout)
+            translate_entry(entry, langs)
+            return article["doc_title"], entry
+        except Exception as e:
+            logging.error(f"Skipping {article['doc_title']!r}: {e}")
+            return article["doc_title"], None
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        for title, entry in pool.map(build, todo):
+            if entry is not None:
+                store[title] = entry
+
+    rows, vectors = embed_store(store)
+    save_store(args.out, store, rows, vectors)
+    unvetted = sum(not entry.get("vetted") for entry in store.values())
+    print(f"Wrote {len(store)} articles and {len(rows)} questions to {args.out}; {unvetted} awaiting review")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+# faq_store.py
+# Precomputed answers for the support articles. rag/build_faq.py generates,
+# per article, question variants and a {data, op_type, redir_url} answer in
+# every supported language; once an entry is vetted, /process answers matching
+# questions from here without translation or an LLM call.
+#
+# A question is matched exactly (after normalizing case, punctuation and
+# whitespace) or, failing that, by embedding similarity to the stored variants.
+# Semantic matches must be both close and clearly ahead of any other article.
+
+import os
+import re
+import json
+import logging
+import threading
+import numpy as np
+from tracing import stage, record_cache_lookup
+from limits import Overloaded
+from deadline import DeadlineExceeded
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+FAQ_STORE_PATH = os.getenv("FAQ_STORE_PATH", os.path.join(current_dir, "faq"))
+FAQ_ENABLED = os.getenv("FAQ_ENABLED", "1") == "1"
+# Set FAQ_SEMANTIC=0 to answer exact matches only (no embedding call per question)
+FAQ_SEMANTIC = os.getenv("FAQ_SEMANTIC", "1") == "1"
+# Lowest cosine similarity to a stored question for a semantic match
+FAQ_MIN_SCORE = float(os.getenv("FAQ_MIN_SCORE", "0.93"))
+# How far the best article must be ahead of the next article
+FAQ_MIN_MARGIN = float(os.getenv("FAQ_MIN_MARGIN", "0.02"))
+# Only serve entries a reviewer has marked as vetted
+FAQ_REQUIRE_VETTED = os.getenv("FAQ_REQUIRE_VETTED", "1") == "1"
+
+ANSWERS_FILE = "answers.json"
+VECTORS_FILE = "vectors.npy"
+
+_store = None
+_store_loaded = False
+_store_lock = threading.Lock()
+
+
+def normalize_question(text: str) -> str:
+    return " ".join(re.sub(r"[^\w\s']", " ", str(text or "")).split()).casefold()
+
+
+class FAQMatch:
+    """A stored answer for a question, in the language it was asked in."""
+
+    def __init__(self, article: str, answer: dict, score: float, method: str):
+        self.article = article
+        self.answer = answer
+        self.score = score
+        self.method = method
+
+
+class FAQStore:
+    """
+    Answers and question variants per article. `rows` lists the
+    (article, lang, question) behind each row of `vectors`.
+    """
+
+    def __init__(self, articles: dict, rows: list = (), vectors: np.ndarray = None,
+                 require_vetted: bool = FAQ_REQUIRE_VETTED):
+        self.articles = {
+            title: entry for title, entry in articles.items()
+            if entry.get("vetted") or not require_vetted
+        }
+        self.exact = {}
+        for title, entry in self.articles.items():
+            for lang, questions in entry.get("questions", {}).items():
+                for question in questions:
+                    self.exact.setdefault((lang, normalize_question(question)), title)
+
+        keep = [index for index, (title, _lang, _question) in enumerate(rows) if title in self.articles]
+        self.rows = [rows[index] for index in keep]
+        self.vectors = None
+        if vectors is not None and keep:
+            vectors = np.asarray(vectors, dtype=np.float32)[keep]
+            self.vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+            titles = sorted(self.articles)
+            self._row_articles = np.array([titles.index(title) for title, _lang, _question in self.rows])
+
+    @classmethod
+    def load(cls, path: str = FAQ_STORE_PATH):
+        with open(os.path.join(path, ANSWERS_FILE), encoding="utf-8") as f:
+            data = json.load(f)
+        vectors_path = os.path.join(path, VECTORS_FILE)
+        vectors = np.load(vectors_path) if os.path.exists(vectors_path) else None
+        return cls(data["articles"], [tuple(row) for row in data.get("rows", [])], vectors)
+
+    def __len__(self):
+        return len(self.articles)
+
+    def answer_for(self, article: str, lang: str):
+        return self.articles[article].get("answers", {}).get(lang)
+
+    def match_exact(self, text: str, lang: str, answer_lang: str = None):
+        """Matches a question asked in `lang`, answering in `answer_lang` (`lang` by default)."""
+        answer_lang = answer_lang or lang
+        article = self.exact.get((lang, normalize_question(text)))
+        if article is None or self.answer_for(article, answer_lang) is None:
+            return None
+        return FAQMatch(article, self.answer_for(article, answer_lang), 1.0, "exact")
+
+    def match_vector(self, vector, lang: str, min_score: float = FAQ_MIN_SCORE,
+                     min_margin: float = FAQ_MIN_MARGIN):
+        if self.vectors is None:
+            return None
+        query = np.asarray(vector, dtype=np.float32)
+        scores = self.vectors @ (query / np.linalg.norm(query))
+        best = int(np.argmax(scores))
+        others = scores[self._row_articles != self._row_articles[best]]
+        runner_up = float(others.max()) if len(others) else -1.0
+        score = float(scores[best])
+        article = self.rows[best][0]
+        if score < min_score or score - runner_up < min_margin or self.answer_for(article, lang) is None:
+            return None
+        return FAQMatch(article, self.answer_for(article, lang), score, "semantic")
+
+
+def get_faq_store():
+    """Returns the FAQ store, loading it on first use, or None if it is disabled or has not been built."""
+    global _store, _store_loaded
+    with _store_lock:
+        if not _store_loaded:
+            _store_loaded = True
+            if FAQ_ENABLED and os.path.exists(os.path.join(FAQ_STORE_PATH, ANSWERS_FILE)):
+                try:
+                    _store = FAQStore.load(FAQ_STORE_PATH)
+                    logging.info(f"FAQ store loaded with {len(_store)} vetted articles")
+                except Exception as e:
+                    logging.error(f"Could not load the FAQ store from {FAQ_STORE_PATH}: {e}")
+        return _store
+
+
+def embed_question(text: str):
+    return embed_questions([text])[0]
+
+
+def embed_questions(texts: list):
+    from rag.rag_with_openai import get_components, embed_texts
+    _llm, embeddings = get_components()
+    return embed_texts(embeddings, texts)
+
+
+def find_answers(questions: list, embedded: dict = None, answer_langs: list = None):
+    """
+    find_answer for a batch of (text, lang) pairs, answered in `answer_langs`
+    (each question's own language by default). Questions without an exact
+    match are embedded together in one request.
+    """
+    answer_langs = answer_langs or [lang for _text, lang in questions]
+    store = get_faq_store()
+    if not store:
+        return [None] * len(questions)
+    with stage("faq", questions=len(questions)) as span:
+        matches = [store.match_exact(text, lang, answer_lang)
+                   for (text, lang), answer_lang in zip(questions, answer_langs)]
+        misses = [index for index, match in enumerate(matches) if match is None]
+        if misses and FAQ_SEMANTIC and store.vectors is not None:
+            try:
+                vectors = embed_questions([questions[index][0] for index in misses])
+            except (Overloaded, DeadlineExceeded):
+                raise
+            except Exception as e:
+                logging.warning(f"FAQ lookup failed: {e}")
+                vectors = []
+            for index, vector in zip(misses, vectors):
+                if embedded is not None:
+                    embedded[questions[index][0]] = vector
+                matches[index] = store.match_vector(vector, answer_langs[index])
+        for match in matches:
+            record_cache_lookup("faq", "hit" if match else "miss")
+        span.attributes.update(hits=sum(match is not None for match in matches))
+    return matches
+
+
+def find_answer(text: str, lang: str, embedded: dict = None, answer_lang: str = None):
+    """
+    Returns an FAQMatch for a confidently matched question asked in `lang`, with
+    the answer in `answer_lang` (`lang` by default), or None to fall back to the
+    assistant. If the question was embedded, its vector is added to the
+    `embedded` dict under the text, so retrieval can reuse it after a miss.
+    """
+    answer_lang = answer_lang or lang
+    store = get_faq_store()
+    if not store:
+        return None
+    with stage("faq", lang=lang) as span:
+        match = store.match_exact(text, lang, answer_lang)
+        if match is None and FAQ_SEMANTIC and store.vectors is not None:
+            try:
+                vector = embed_question(text)
+            except (Overloaded, DeadlineExceeded):
+                raise
+            except Exception as e:
+                # The assistant can still answer without the store
+                logging.warning(f"FAQ lookup failed: {e}")
+                vector = None
+            if vector is not None:
+                if embedded is not None:
+                    embedded[text] = vector
+                match = store.match_vector(vector, answer_lang)
+        record_cache_lookup("faq", "hit" if match else "miss")
+        if match:
+            span.attributes.update(method=match.method, score=round(match.score, 3))
+    return match
@@ -0,0 +1,350 @@
+# llm_backends.py
+# Provider-agnostic chat completion backends (Groq and OpenAI) with per-provider
+# latency tracking and hedged requests across providers.
+
+import os
+import json
+import re
+import time
+import socket
+import logging
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dotenv import load_dotenv
+from tracing import provider_call
+from limits import Overloaded, get_limiter
+from deadline import DeadlineExceeded, MIN_CALL_TIMEOUT, call_timeout, has_budget
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+env_path = os.path.join(project_root, '.env')
+
+# Load the .env file
+load_dotenv(dotenv_path=env_path)
+
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+
+# Hard ceiling for a single provider call, in seconds
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+# Hedge delay used until a provider has enough latency samples
+LLM_HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "4"))
+LLM_HEDGE_MIN_SAMPLES = 20
+
+
+
+class LLMCancelled(Exception):
+    """Raised inside a backend call when the hedged request it belongs to was won by another provider."""
+
+
+class CancelEvent(threading.Event):
+    """
+    An Event that also runs the abort callbacks registered with it when it is
+    set. Callbacks run under the lock, so once discard() returns its callback
+    will not run.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._aborts = []
+        self._aborts_lock = threading.Lock()
+
+    def on_set(self, abort):
+        """Calls abort() when the event is set, or right away if it already is."""
+        with self._aborts_lock:
+            if not self.is_set():
+                self._aborts.append(abort)
+                return
+        abort()
+
+    def discard(self, abort):
+        with self._aborts_lock:
+            if abort in self._aborts:
+                self._aborts.remove(abort)
+
+    def set(self):
+        with self._aborts_lock:
+            super().set()
+            for abort in self._aborts:
+                try:
+                    abort()
+                except Exception as e:
+                    logging.debug(f"Aborting a cancelled LLM call failed: {e}")
+            self._aborts = []
+
+
+def abort_stream(stream):
+    """
+    Wakes a thread blocked reading a streamed response. Closing the stream from
+    another thread does not interrupt a blocked read, so the socket is shut
+    down; the reading thread then fails and closes the stream itself.
+    """
+    network_stream = stream.response.extensions.get("network_stream")
+    sock = network_stream.get_extra_info("socket") if network_stream is not None else None
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class LatencyTracker:
+    """Rolling window of call latencies for one provider."""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._samples)
+
+    def percentile(self, p: float, default: float = None):
+        """Returns the p-th percentile (0-100) of the recorded latencies, or default if there are none."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return default
+        index = min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))
+        return samples[index]
+
+
+class ChatBackend:
+    """A single chat model served by one provider."""
+
+    provider = None
+
+    def __init__(self, model: str):
+        self.model = model
+        self.latency = LatencyTracker()
+        self._client = None
+
+    @property
+    def name(self):
+        return f"{self.provider}:{self.model}"
+
+    def available(self) -> bool:
+        raise NotImplementedError
+
+    def create_client(self):
+        raise NotImplementedError
+
+    def client(self):
+        if self._client is None:
+            self._client = self.create_client()
+        return self._client
+
+    def hedge_delay(self) -> float:
+        """How long to wait on this backend before hedging to another one (its p95 latency)."""
+        if self.latency.count() < LLM_HEDGE_MIN_SAMPLES:
+            return LLM_HEDGE_DEFAULT_DELAY
+        return self.latency.percentile(95)
+
+    def complete(self, messages: list, timeout: float = LLM_TIMEOUT, cancel_event: CancelEvent = None,
+                 temperature: float = 0):
+        """
+        Streams a chat completion and returns (content, usage).
+
+        The response is streamed so that a hedged call which has already lost
+        is aborted as soon as cancel_event is set, even while it waits for the
+        next chunk. Before the response headers arrive there is no stream to
+        abort, so a call stalled there runs until its timeout.
+        """
+        stream = self.client().chat.completions.create(
+            messages=messages,
+            model=self.model,
+            temperature=temperature,
+            stream=True,
+            timeout=timeout,
+            **self.stream_options()
+        )
+        parts = []
+        usage = None
+        abort = lambda: abort_stream(stream)
+        try:
+            if cancel_event is not None:
+                cancel_event.on_set(abort)
+            for chunk in stream:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise LLMCancelled(self.name)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                usage = self.chunk_usage(chunk) or usage
+        except Exception:
+            # Reading an aborted stream fails; report it as the cancellation it is
+            if cancel_event is not None and cancel_event.is_set():
+                raise LLMCancelled(self.name)
+            raise
+        finally:
+            # The connection may go back to the pool, where it must not be aborted
+            if cancel_event is not None:
+                cancel_event.discard(abort)
+            stream.close()
+        return "".join(parts), usage
+
+    def stream_options(self) -> dict:
+        return {}
+
+    def chunk_usage(self, chunk):
+        return getattr(chunk, "usage", None)
+
+
+class OpenAIBackend(ChatBackend):
+    provider = "openai"
+
+    def available(self):
+        return bool(OPENAI_API_KEY)
+
+    def create_client(self):
+        from openai import OpenAI
+        return OpenAI(api_key=OPENAI_API_KEY, max_retries=0)
+
+    def stream_options(self):
+        return {"stream_options": {"include_usage": True}}
+
+
+class GroqBackend(ChatBackend):
+    provider = "groq"
+
+    def available(self):
+        return bool(GROQ_API_KEY)
+
+    def create_client(self):
+        from groq import Groq
+        return Groq(api_key=GROQ_API_KEY, max_retries=0)
+
+    def chunk_usage(self, chunk):
+        x_groq = getattr(chunk, "x_groq", None)
+        return getattr(x_groq, "usage", None)
+
+
+BACKENDS = {
+    "openai": OpenAIBackend("gpt-4o"),
+    "groq": GroqBackend("llama-3.1-70b-versatile"),
+}
+
+# Losers stalled before their response headers keep a thread until their timeout,
+# so the pool has a thread for every call the providers' limits let run at once
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("LLM_MAX_WORKERS") or sum(get_limiter(provider).concurrency for provider in
+                                                          {backend.provider for backend in BACKENDS.values()})),
+    thread_name_prefix="llm")
+
+
+def get_backend(name: str) -> ChatBackend:
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend: {name}")
+    return BACKENDS[name]
+
+
+def parse_assistant_json(content: str):
+    """Returns the first JSON object in an assistant reply if it has the expected keys, otherwise None."""
+    if not content:
+        return None
+    match = re.search(r"\{.*\}", content, re.DOTALL)
+    if not match:
+        return None
+    try:
+        response = json.loads(match.group())
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(response, dict) or "data" not in response or "op_type" not in response:
+        return None
+    response.setdefault("redir_url", response["op_type"])
+    return response
+
+
+def _run_backend(backend: ChatBackend, messages: list, timeout: float, cancel_event: CancelEvent):
+    start_time = time.time()
+    with provider_call(backend.provider, "chat", model=backend.model) as span:
+        try:
+            content, usage = backend.complete(messages, timeout=timeout, cancel_event=cancel_event)
+        except LLMCancelled:
+            # The elapsed time is a lower bound on what this call would have taken
+            backend.latency.record(time.time() - start_time)
+            span.status = "cancelled"
+            raise
+        elapsed = time.time() - start_time
+        backend.latency.record(elapsed)
+        response = parse_assistant_json(content)
+        if response is None:
+            span.fail("invalid JSON answer")
+            raise ValueError(f"{backend.name} returned an invalid JSON answer: {content!r}")
+    return {"response": response, "backend": backend.name, "usage": usage, "latency": elapsed}
+
+
+def hedged_chat_completion(messages: list, primary: str = "openai", secondary: str = "groq",
+                           timeout: float = None):
+    """
+    Runs a chat completion on the primary backend and, if it has not produced a
+    valid JSON answer within its p95 latency (or failed), fires the same request
+    at the secondary backend. The first valid answer wins and the other call is
+    cancelled.
+
+    Returns:
+        dict: {"response": parsed JSON answer, "backend": name, "usage": usage, "latency": seconds}
+    """
+    candidates = [get_backend(name) for name in (primary, secondary) if name]
+    candidates = [backend for backend in candidates if backend.available()] or candidates[:1]
+
+    # Bounded by what is left of the request's budget
+    timeout = call_timeout(LLM_TIMEOUT if timeout is None else timeout)
+    cancel_event = CancelEvent()
+    deadline = time.time() + timeout
+    pending = {}
+    errors = []
+    shed = []
+
+    def launch(backend):
+        remaining = max(0.1, deadline - time.time())
+        # Run in a copy of the caller's context so spans keep their request id and stage
+        context = contextvars.copy_context()
+        future = _executor.submit(context.run, _run_backend, backend, messages, remaining, cancel_event)
+        pending[future] = backend
+
+    launch(candidates[0])
+    hedges = candidates[1:]
+    hedge_at = time.time() + candidates[0].hedge_delay()
+
+    try:
+        while pending:
+            now = time.time()
+            if now >= deadline:
+                break
+            wait_for = deadline - now
+            if hedges:
+                wait_for = max(0, min(wait_for, hedge_at - now))
+            done, _ = wait(list(pending), timeout=wait_for, return_when=FIRST_COMPLETED)
+            for future in done:
+                backend = pending.pop(future)
+                try:
+                    return future.result()
+                except Exception as e:
+                    logging.warning(f"{backend.name} completion failed: {e}")
+                    errors.append(f"{backend.name}: {e}")
+                    if isinstance(e, Overloaded):
+                        shed.append(e)
+            if hedges and (time.time() >= hedge_at or not pending):
+                backend = hedges.pop(0)
+                logging.info(f"Hedging LLM request to {backend.name}")
+                launch(backend)
+    finally:
+        # Tell whichever call is still running that it lost
+        cancel_event.set()
+        for future in pending:
+            future.cancel()
+
+    if shed and len(shed) == len(errors):
+        # Every backend tried was saturated, so the caller should back off rather than fail
+        raise min(shed, key=lambda e: e.retry_after)
+    if not errors:
+        if not has_budget(MIN_CALL_TIMEOUT):
+            raise DeadlineExceeded(f"No LLM answer within the request budget ({timeout:.1f}s)")
+        errors.append(f"timed out after {timeout} seconds")
+    raise RuntimeError("All LLM backends failed: " + "; ".join(errors))
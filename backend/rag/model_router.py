@@ -0,0 +1,144 @@
+# model_router.py
+# Routes each query to a model tier: simple, well-grounded questions go to a fast
+# small model and only complex or poorly-grounded ones escalate to GPT-4o.
+
+import os
+import re
+import time
+import logging
+import threading
+from rag.llm_backends import BACKENDS, OpenAIBackend, LatencyTracker, hedged_chat_completion
+
+# Register the small OpenAI model next to the default GPT-4o / llama-3.1-70b backends
+BACKENDS.setdefault("openai-mini", OpenAIBackend("gpt-4o-mini"))
+
+# (primary, hedge) backends per tier
+TIERS = {
+    "fast": ("groq", "openai-mini"),
+    "strong": ("openai", "groq"),
+}
+
+# USD per million (input, output) tokens
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "llama-3.1-70b-versatile": (0.59, 0.79),
+}
+
+# Queries scoring above this go straight to the strong tier
+COMPLEXITY_THRESHOLD = float(os.getenv("ROUTER_COMPLEXITY_THRESHOLD", "0.5"))
+# Minimum top retrieval relevance score for the fast tier. FAISS relevance is
+# 1 - squared L2 / sqrt(2), and ada-002 vectors of unrelated support articles are
+# close: in the stored index an article's best match in another category scores
+# 0.82-0.90 (p10-p90) while its best match in its own subcategory scores 0.89-0.98.
+CONFIDENCE_THRESHOLD = float(os.getenv("ROUTER_CONFIDENCE_THRESHOLD", "0.88"))
+
+SMALL_TALK = {"hi", "hello", "hey", "thanks", "thank you", "good morning", "good afternoon",
+              "good evening", "bye", "goodbye", "ok", "okay"}
+COMPLEX_MARKERS = ["difference", "compare", "versus", " vs ", "why", "both", "instead", "if i",
+                   "what happens", "step by step", "steps", "explain", "after", "before"]
+
+
+def score_complexity(query: str) -> float:
+    """Heuristic query complexity between 0 (small talk, single fact) and 1 (multi-part reasoning)."""
+    text = query.lower().strip()
+    if text.strip("!.? ") in SMALL_TALK:
+        return 0.0
+    words = re.findall(r"\w+", text)
+    score = min(len(words) / 40, 0.4)
+    score += 0.15 * max(0, text.count("?") - 1)
+    score += 0.1 * len(re.findall(r"\b(and|or|but|also)\b", text))
+    score += 0.2 * sum(marker in f" {text} " for marker in COMPLEX_MARKERS)
+    return min(score, 1.0)
+
+
+def choose_tier(query: str, top_score: float = None) -> str:
+    complexity = score_complexity(query)
+    if complexity == 0.0:
+        return "fast"
+    if complexity > COMPLEXITY_THRESHOLD:
+        return "strong"
+    if top_score is None or top_score < CONFIDENCE_THRESHOLD:
+        return "strong"
+    return "fast"
+
+
+def estimate_cost(model: str, usage, messages: list, content: str = "") -> float:
+    """USD cost of a completion, estimating tokens from text length when the provider sent no usage."""
+    prompt_tokens = getattr(usage, "prompt_tokens", None)
+    completion_tokens = getattr(usage, "completion_tokens", None)
+    if prompt_tokens is None:
+        prompt_tokens = sum(len(message["content"]) for message in messages) / 4
+    if completion_tokens is None:
+        completion_tokens = len(content) / 4
+    input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+
+class TierStats:
+    def __init__(self):
+        self.requests = 0
+        self.fallbacks = 0
+        self.cost = 0.0
+        self.latency = LatencyTracker()
+
+
+_stats = {tier: TierStats() for tier in TIERS}
+_stats_lock = threading.Lock()
+
+
+def _record(tier, latency=None, cost=0.0, fallback=False):
+    with _stats_lock:
+        stats = _stats[tier]
+        stats.requests += 1
+        stats.cost += cost
+        if fallback:
+            stats.fallbacks += 1
+    if latency is not None:
+        stats.latency.record(latency)
+
+
+def get_router_stats() -> dict:
+    """Per-tier request counts, latency percentiles, total cost and fallback rate."""
+    with _stats_lock:
+        return {
+            tier: {
+                "requests": stats.requests,
+                "fallbacks": stats.fallbacks,
+                "fallback_rate": stats.fallbacks / stats.requests if stats.requests else 0.0,
+                "cost_usd": round(stats.cost, 6),
+                "latency_p50": stats.latency.percentile(50),
+                "latency_p95": stats.latency.percentile(95),
+            }
+            for tier, stats in _stats.items()
+        }
+
+
+def routed_chat_completion(query: str, messages: list, top_score: float = None):
+    """
+    Runs the completion on the tier chosen for the query, escalating from the
+    fast tier to the strong tier if no fast backend returns a valid answer.
+
+    Returns:
+        dict: hedged_chat_completion result plus the "tier" that served it.
+    """
+    tier = choose_tier(query, top_score)
+    logging.info(f"Routing query to {tier} tier (top retrieval score: {top_score})")
+    while True:
+        primary, secondary = TIERS[tier]
+        start_time = time.time()
+        try:
+            result = hedged_chat_completion(messages, primary=primary, secondary=secondary)
+        except Exception as e:
+            if tier == "strong":
+                _record(tier, latency=time.time() - start_time)
+                raise
+            logging.warning(f"Fast tier failed, escalating to strong tier: {e}")
+            _record(tier, latency=time.time() - start_time, fallback=True)
+            tier = "strong"
+            continue
+        model = result["backend"].split(":", 1)[1]
+        cost = estimate_cost(model, result["usage"], messages, result["response"].get("data", ""))
+        _record(tier, latency=time.time() - start_time, cost=cost)
+        result["tier"] = tier
+        return result
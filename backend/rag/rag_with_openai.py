@@ -2,16 +2,66 @@ import os
 import datetime
 import json
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain.docstore.document import Document
-from langchain.tools.retriever import create_retriever_tool
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.agents.output_parsers.openai_tools import OpenAIToolsAgentOutputParser
-from langchain.agents import AgentExecutor
-from langchain.agents.format_scratchpad.openai_tools import format_to_openai_tool_messages
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from rag.llm_backends import hedged_chat_completion, LLM_TIMEOUT
+from rag.model_router import routed_chat_completion
+from rag.sharded_index import ShardedIndex, build_shards, search_store, shards_path_for, MANIFEST_FILE
+from tracing import stage, provider_call
+from deadline import call_timeout, retry_call
+from singleflight import coalesced, normalize_text
 import re
 
+# "tiered" picks a fast or strong model per query, "hedged" always hedges GPT-4o with Groq,
+# "agent" runs the GPT-4o tool agent
+LLM_ROUTING = os.getenv("LLM_ROUTING", "tiered")
+RETRIEVAL_K = 4
+# "flat" searches one index of every article; "sharded" first routes each query to
+# the closest category shards and searches only those (see rag/sharded_index.py)
+RETRIEVAL_INDEX = os.getenv("RETRIEVAL_INDEX", "flat")
+# Token-length checking needs tiktoken's encoding files, which offline runs cannot download
+EMBEDDINGS_CHECK_CTX_LENGTH = os.getenv("EMBEDDINGS_CHECK_CTX_LENGTH", "1") == "1"
+EMBEDDINGS_TIMEOUT = float(os.getenv("EMBEDDINGS_TIMEOUT", "10"))
+# LLM calls run at once when answering a batch of questions
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))
+
+SYSTEM_PROMPT = """
+            You are a virtual assistant for Irembo, the Rwandan government's e-services platform. Your primary role is to help citizens navigate and use the various services available on the Irembo website. Here are your key responsibilities:
+
+            1. Guide users through the process of accessing different government services on Irembo.
+            2. Provide information about required documents, fees, and procedures for specific services.
+            3. Assist with troubleshooting common issues users might encounter while using the platform.
+            4. Offer clear, step-by-step instructions for completing online applications and forms.
+            5. Explain the status of ongoing service requests and how to track them.
+            6. Direct users to the appropriate departments or contact points for complex issues beyond your scope.
+
+            You will be provided with relevant, up-to-date context for each user query to ensure your responses are accurate and helpful. Always maintain a professional, friendly, and patient demeanor, as you are representing the Rwandan government. If you're unsure about any information, it's better to acknowledge your uncertainty and suggest where the user might find more accurate details.
+
+            Important: For each response, only provide a concise one-paragraph summary (3-4 sentences) of the relevant information, requirements, timeline, fees and other relevant 
+            information. 
+            Important: You must strictly return all responses in the following JSON format. Do not include any extra explanations or text outside of the JSON format. Provide only one JSON object in your response.
+            For any query related to student permits , set the value of op_type to either renew or new depending on whether user wants to renew or apply for new student permit.
+            For any other query, set the value of op_type to chat.
+            The value of redir_url takes on same value as op_type.
+
+            Strictly follow this format for all outputs.
+            
+            {
+            "data": "Your response here",
+            "op_type": "new|renew|chat",
+            "redir_url": "new|renew|chat"
+            }
+            
+        """
+
+# Vector stores loaded so far, keyed by path
+_vector_stores = {}
+_vector_stores_lock = threading.Lock()
+# LLM and embeddings clients, created on first use
+_components = None
+_components_lock = threading.Lock()
+
 def extract_json_from_response(response):
     try:
         # Use regex to find content between the first set of curly braces
@@ -27,11 +77,24 @@ def load_environment_variables():
     return os.getenv("OPENAI_API_KEY")
 
 def initialize_components(openai_key):
-    llm = ChatOpenAI(openai_api_key=openai_key, temperature=0 , model="gpt-4o")
-    embeddings = OpenAIEmbeddings(openai_api_key=openai_key)
+    # langchain is imported on first use; it is the slowest import in the app
+    from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+    # Retries are made by retry_call within the request's budget, not by the clients
+    llm = ChatOpenAI(openai_api_key=openai_key, temperature=0 , model="gpt-4o", timeout=LLM_TIMEOUT, max_retries=0)
+    embeddings = OpenAIEmbeddings(openai_api_key=openai_key, check_embedding_ctx_length=EMBEDDINGS_CHECK_CTX_LENGTH,
+                                  request_timeout=EMBEDDINGS_TIMEOUT, max_retries=0)
     return llm, embeddings
 
+def get_components():
+    """Returns the shared (llm, embeddings) clients, creating them on the first call."""
+    global _components
+    with _components_lock:
+        if _components is None:
+            _components = initialize_components(load_environment_variables())
+        return _components
+
 def process_data(file_path):
+    from langchain.docstore.document import Document
     with open(file_path, "r", encoding="utf-8") as f:
         data = json.load(f)
 
@@ -55,6 +118,7 @@ def process_data(file_path):
     return documents
 
 def create_or_load_vector_store(embeddings, data_file_path, vector_store_path):
+    from langchain_community.vectorstores import FAISS
     try:
         vector_store = FAISS.load_local(vector_store_path, embeddings, allow_dangerous_deserialization=True)
         print(f"Vector store loaded from {vector_store_path}")
@@ -66,6 +130,7 @@ def create_or_load_vector_store(embeddings, data_file_path, vector_store_path):
     return vector_store
 
 def setup_retriever_tool(vector_store):
+    from langchain.tools.retriever import create_retriever_tool
     retriever = vector_store.as_retriever()
     retriever_tool = create_retriever_tool(
         retriever,
@@ -75,38 +140,18 @@ def setup_retriever_tool(vector_store):
     return retriever_tool
 
 def setup_agent(llm, retriever_tool):
+    from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+    from langchain.agents.output_parsers.openai_tools import OpenAIToolsAgentOutputParser
+    from langchain.agents import AgentExecutor
+    from langchain.agents.format_scratchpad.openai_tools import format_to_openai_tool_messages
     tools = [retriever_tool]
-    llm_with_tools = llm.bind_tools(tools)
+    # Each agent completion is bounded by what is left of the request's budget
+    llm_with_tools = llm.bind_tools(tools, timeout=call_timeout(LLM_TIMEOUT))
 
+    # The prompt template treats braces as variables, so escape the JSON example
+    system_prompt = SYSTEM_PROMPT.replace("{", "{{").replace("}", "}}")
     prompt = ChatPromptTemplate.from_messages([
-        ("system", """
-            You are a virtual assistant for Irembo, the Rwandan government's e-services platform. Your primary role is to help citizens navigate and use the various services available on the Irembo website. Here are your key responsibilities:
-
-            1. Guide users through the process of accessing different government services on Irembo.
-            2. Provide information about required documents, fees, and procedures for specific services.
-            3. Assist with troubleshooting common issues users might encounter while using the platform.
-            4. Offer clear, step-by-step instructions for completing online applications and forms.
-            5. Explain the status of ongoing service requests and how to track them.
-            6. Direct users to the appropriate departments or contact points for complex issues beyond your scope.
-
-            You will be provided with relevant, up-to-date context for each user query to ensure your responses are accurate and helpful. Always maintain a professional, friendly, and patient demeanor, as you are representing the Rwandan government. If you're unsure about any information, it's better to acknowledge your uncertainty and suggest where the user might find more accurate details.
-
-            Important: For each response, only provide a concise one-paragraph summary (3-4 sentences) of the relevant information, requirements, timeline, fees and other relevant 
-            information. 
-            Important: You must strictly return all responses in the following JSON format. Do not include any extra explanations or text outside of the JSON format. Provide only one JSON object in your response.
-            For any query related to student permits , set the value of op_type to either renew or new depending on whether user wants to renew or apply for new student permit.
-            For any other query, set the value of op_type to chat.
-            The value of redir_url takes on same value as op_type.
-
-            Strictly follow this format for all outputs.
-            
-            {{
-            "data": "Your response here",
-            "op_type": "new|renew|chat",
-            "redir_url": "new|renew|chat"
-            }}
-            
-        """),
+        ("system", system_prompt),
         ("human", "{input}"),
         MessagesPlaceholder(variable_name="agent_scratchpad"),
     ])
@@ -124,18 +169,174 @@ def setup_agent(llm, retriever_tool):
     agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=False)
     return agent_executor
 
-def get_irembo_assistant_response(user_query, data_file_path="data/web_scrape_output_with_content.json", vector_store_path="faiss"):
-    openai_key = load_environment_variables()
-    llm, embeddings = initialize_components(openai_key)
-    vector_store = create_or_load_vector_store(embeddings, data_file_path, vector_store_path)
+def get_vector_store(embeddings, data_file_path, vector_store_path):
+    """Returns the vector store for vector_store_path, loading it only once per process."""
+    with _vector_stores_lock:
+        if vector_store_path not in _vector_stores:
+            _vector_stores[vector_store_path] = create_or_load_vector_store(embeddings, data_file_path, vector_store_path)
+        return _vector_stores[vector_store_path]
+
+def get_sharded_index(embeddings, data_file_path, vector_store_path):
+    """Returns the category-sharded index next to vector_store_path, building its shards if there are none yet."""
+    path = shards_path_for(vector_store_path)
+    with _vector_stores_lock:
+        if path not in _vector_stores:
+            if not os.path.exists(os.path.join(path, MANIFEST_FILE)):
+                build_shards(process_data(data_file_path), path, embeddings)
+                print(f"Sharded index created and saved to {path}")
+            _vector_stores[path] = ShardedIndex.load(path, embeddings)
+        return _vector_stores[path]
+
+def get_search_index(embeddings, data_file_path, vector_store_path):
+    """The index retrieval searches, flat or sharded per RETRIEVAL_INDEX."""
+    if RETRIEVAL_INDEX == "sharded":
+        return get_sharded_index(embeddings, data_file_path, vector_store_path)
+    return get_vector_store(embeddings, data_file_path, vector_store_path)
+
+def build_messages(user_query, documents):
+    context_text = "\n\n---\n\n".join(
+        f"{doc.metadata.get('title', '')}\n{doc.page_content}" for doc in documents
+    )
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"Context: {context_text}\n\nQuestion: {user_query}"},
+    ]
+
+def embed_texts(embeddings, texts):
+    """
+    Embeds texts with a timeout taken from the remaining budget, retrying
+    transient failures while there is budget left for another attempt.
+    """
+    def embed(timeout):
+        # model_kwargs are passed on to every embeddings request; the copy shares the client
+        client = embeddings.model_copy(update={"model_kwargs": {**embeddings.model_kwargs, "timeout": timeout}})
+        with provider_call("openai", "embeddings", inputs=len(texts)):
+            return client.embed_documents(list(texts))
+    return retry_call(embed, cap=EMBEDDINGS_TIMEOUT)
+
+def search_with_relevance(vector_store, embeddings, user_query, k=RETRIEVAL_K, query_vector=None):
+    """
+    Embeds the query and searches the vector store as separate stages, returning
+    (document, relevance) pairs. A query already embedded (by the FAQ lookup) is
+    passed as `query_vector` and not embedded again.
+    """
+    if query_vector is None:
+        with stage("embed"):
+            query_vector = embed_texts(embeddings, [user_query])[0]
+    with stage("retrieve", k=k):
+        return search_by_vector(vector_store, query_vector, k=k)
+
+def search_by_vector(vector_store, query_vector, k=RETRIEVAL_K):
+    """Returns the k nearest (document, relevance) pairs for an embedded query."""
+    if isinstance(vector_store, ShardedIndex):
+        return vector_store.search_many([query_vector], k=k)[0]
+    results = vector_store.similarity_search_with_score_by_vector(query_vector, k=k)
+    relevance_fn = vector_store._select_relevance_score_fn()
+    return [(doc, relevance_fn(score)) for doc, score in results]
+
+def search_batch_with_relevance(vector_store, embeddings, user_queries, k=RETRIEVAL_K, query_vectors=None):
+    """
+    Embeds all queries in one embeddings request and searches the index with them
+    as one matrix, returning a list of (document, relevance) pairs per query.
+    `query_vectors` may hold, in order, embeddings already made for some queries
+    (None for the rest); only the others are embedded.
+    """
+    query_vectors = list(query_vectors or [None] * len(user_queries))
+    missing = [index for index, vector in enumerate(query_vectors) if vector is None]
+    if missing:
+        with stage("embed", queries=len(missing)):
+            vectors = embed_texts(embeddings, [user_queries[index] for index in missing])
+        for index, vector in zip(missing, vectors):
+            query_vectors[index] = vector
+    with stage("retrieve", k=k, queries=len(user_queries)):
+        return search_by_vectors(vector_store, query_vectors, k=k)
+
+def search_by_vectors(vector_store, query_vectors, k=RETRIEVAL_K):
+    """search_by_vector for many embedded queries with a single index search."""
+    if isinstance(vector_store, ShardedIndex):
+        return vector_store.search_many(query_vectors, k=k)
+    return search_store(vector_store, query_vectors, k=k)
+
+def get_hedged_response(user_query, vector_store, embeddings, results=None):
+    """Answers from retrieved context, hedging the completion across the Groq and OpenAI backends."""
+    if results is None:
+        results = search_with_relevance(vector_store, embeddings, user_query)
+    documents = [doc for doc, _score in results]
+    with stage("llm", routing="hedged"):
+        result = hedged_chat_completion(build_messages(user_query, documents), primary="openai", secondary="groq")
+    return result["response"]
+
+def get_tiered_response(user_query, vector_store, embeddings, results=None):
+    """Answers from retrieved context on the cheapest model tier the query and its retrieval confidence allow."""
+    if results is None:
+        results = search_with_relevance(vector_store, embeddings, user_query)
+    documents = [doc for doc, _score in results]
+    top_score = results[0][1] if results else None
+    with stage("llm", routing="tiered") as span:
+        result = routed_chat_completion(user_query, build_messages(user_query, documents), top_score=top_score)
+        span.attributes.update(tier=result["tier"], backend=result["backend"])
+    return result["response"]
+
+# Concurrent identical questions share one retrieval and LLM call
+@coalesced("assistant", key=lambda args: (normalize_text(args["user_query"]),
+                                          args["data_file_path"], args["vector_store_path"]))
+def get_irembo_assistant_response(user_query, data_file_path="data/web_scrape_output_with_content.json", vector_store_path="faiss",
+                                  query_vector=None):
+    llm, embeddings = get_components()
+    if LLM_ROUTING in ("tiered", "hedged"):
+        answer = get_tiered_response if LLM_ROUTING == "tiered" else get_hedged_response
+        vector_store = get_search_index(embeddings, data_file_path, vector_store_path)
+        results = search_with_relevance(vector_store, embeddings, user_query, query_vector=query_vector)
+        return answer(user_query, vector_store, embeddings, results=results)
+    # The agent's retriever tool searches the flat store
+    vector_store = get_vector_store(embeddings, data_file_path, vector_store_path)
     retriever_tool = setup_retriever_tool(vector_store)
     agent_executor = setup_agent(llm, retriever_tool)
-    result = agent_executor.invoke({"input": user_query})
+    with stage("llm", routing="agent"):
+        with provider_call("openai", "agent", model="gpt-4o"):
+            result = agent_executor.invoke({"input": user_query})
     response = result['output']
     response= extract_json_from_response(response)
     response_json = json.loads(response)
     return response_json
 
+def get_irembo_assistant_responses(user_queries, data_file_path="data/web_scrape_output_with_content.json", vector_store_path="faiss",
+                                   query_vectors=None):
+    """
+    Answers a batch of questions. Retrieval for the whole batch is one embeddings
+    request and one index search; the LLM calls then run BATCH_LLM_CONCURRENCY at
+    a time. `query_vectors` optionally holds each question's embedding, or None.
+    Returns, in order, each question's response or the exception it raised.
+    """
+    llm, embeddings = get_components()
+    # Repeated questions in a batch are answered once
+    first, known = {}, {}
+    for query, vector in zip(user_queries, query_vectors or [None] * len(user_queries)):
+        first.setdefault(normalize_text(query), query)
+        if vector is not None:
+            known.setdefault(normalize_text(query), vector)
+    queries = list(first.values())
+
+    if LLM_ROUTING in ("tiered", "hedged"):
+        answer = get_tiered_response if LLM_ROUTING == "tiered" else get_hedged_response
+        vector_store = get_search_index(embeddings, data_file_path, vector_store_path)
+        results = search_batch_with_relevance(vector_store, embeddings, queries,
+                                              query_vectors=[known.get(key) for key in first])
+        calls = [(answer, query, vector_store, embeddings, query_results)
+                 for query, query_results in zip(queries, results)]
+    else:
+        calls = [(get_irembo_assistant_response, query, data_file_path, vector_store_path) for query in queries]
+
+    with ThreadPoolExecutor(max_workers=BATCH_LLM_CONCURRENCY) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, *call) for call in calls]
+        responses = {}
+        for key, future in zip(first, futures):
+            try:
+                responses[key] = future.result()
+            except Exception as e:
+                responses[key] = e
+    return [responses[normalize_text(query)] for query in user_queries]
+
 # # Example usage
 # if __name__ == "__main__":
 #     user_query = "How much is a marriage certificate?"
@@ -0,0 +1,262 @@
+# sharded_index.py
+# Two-stage retrieval over the support articles split by category. Every
+# (category, subcategory) pair is a shard with its own FAISS index. A query is
+# first scored against category and subcategory centroid embeddings and then
+# searched only in the closest shards, so search work grows with shard size
+# rather than with the whole corpus.
+#
+# Shards are stored in their own directories under <vector_store_path>_shards,
+# next to manifest.json (shard names, sizes and content hashes) and
+# centroids.npz. Building re-embeds only shards whose articles changed, and
+# each shard index is loaded the first time a query is routed to it.
+#
+# Usage (from backend/):
+#   python -m rag.sharded_index --vector-store faiss
+#   python -m rag.sharded_index --vector-store faiss --force
+
+import os
+import re
+import sys
+import json
+import shutil
+import hashlib
+import logging
+import argparse
+import threading
+import numpy as np
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Categories kept after the first stage, and shards searched among their subcategories
+SHARD_CATEGORIES = int(os.getenv("SHARD_CATEGORIES", "2"))
+SHARD_PROBE = int(os.getenv("SHARD_PROBE", "3"))
+
+MANIFEST_FILE = "manifest.json"
+CENTROIDS_FILE = "centroids.npz"
+
+
+def shards_path_for(vector_store_path: str) -> str:
+    return f"{os.path.normpath(vector_store_path)}_shards"
+
+
+def shard_id(category: str, subcategory: str) -> str:
+    """Directory name of a shard: a readable slug plus a hash, since slugs of different names can collide."""
+    slug = re.sub(r"[^a-z0-9]+", "-", f"{category} {subcategory}".lower()).strip("-")[:48]
+    digest = hashlib.sha256(f"{category}\n{subcategory}".encode("utf-8")).hexdigest()[:8]
+    return f"{slug}-{digest}"
+
+
+def category_description(document) -> str:
+    """What a category's routing embedding is built from besides its articles: its title and text."""
+    return f"{document.metadata['category_title']}\n{document.metadata.get('category_text') or ''}".strip()
+
+
+def content_hash(documents: list) -> str:
+    return hashlib.sha256(json.dumps(
+        [[document.metadata.get("title"), document.page_content] for document in documents]
+    ).encode("utf-8")).hexdigest()
+
+
+def unit(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+
+def search_store(vector_store, query_vectors, k: int) -> list:
+    """The k nearest (document, relevance) pairs in a flat FAISS store for each query, with one matrix search."""
+    import faiss
+    vectors = np.asarray(query_vectors, dtype=np.float32)
+    if vector_store._normalize_L2:
+        faiss.normalize_L2(vectors)
+    scores, indices = vector_store.index.search(vectors, k)
+    relevance_fn = vector_store._select_relevance_score_fn()
+    return [
+        [(vector_store.docstore.search(vector_store.index_to_docstore_id[i]), relevance_fn(score))
+         for score, i in zip(row_scores, row_indices) if i != -1]
+        for row_scores, row_indices in zip(scores, indices)
+    ]
+
+
+def group_documents(documents: list) -> dict:
+    """Documents by shard id, in corpus order."""
+    groups = {}
+    for document in documents:
+        key = shard_id(document.metadata["category_title"], document.metadata["subcategory_title"])
+        groups.setdefault(key, []).append(document)
+    return groups
+
+
+class ShardedIndex:
+    """Category and subcategory centroids, with one lazily loaded FAISS store per shard."""
+
+    def __init__(self, path: str, embeddings, manifest: dict, category_centroids: np.ndarray,
+                 shard_centroids: np.ndarray, categories: int = SHARD_CATEGORIES, probe: int = SHARD_PROBE):
+        self.path = path
+        self.embeddings = embeddings
+        self.categories = categories
+        self.probe = probe
+        self._stores = {}
+        self._lock = threading.Lock()
+        self._use(manifest, category_centroids, shard_centroids)
+
+    def _use(self, manifest: dict, category_centroids: np.ndarray, shard_centroids: np.ndarray):
+        self.shards = manifest["shards"]
+        self.category_names = manifest["categories"]
+        self.category_centroids = category_centroids
+        self.shard_centroids = shard_centroids
+        self._shard_categories = np.array([self.category_names.index(shard["category"]) for shard in self.shards])
+
+    @classmethod
+    def load(cls, path: str, embeddings, **kwargs):
+        manifest, centroids = read_manifest(path)
+        return cls(path, embeddings, manifest, centroids["categories"], centroids["shards"], **kwargs)
+
+    def __len__(self):
+        return sum(shard["documents"] for shard in self.shards)
+
+    def store(self, position: int):
+        """The FAISS store of the shard at `position` in the manifest, loaded on first use."""
+        shard = self.shards[position]
+        with self._lock:
+            store = self._stores.get(shard["id"])
+            if store is None:
+                from langchain_community.vectorstores import FAISS
+                store = FAISS.load_local(os.path.join(self.path, shard["id"]), self.embeddings,
+                                         allow_dangerous_deserialization=True)
+                self._stores[shard["id"]] = store
+            return store
+
+    def route(self, query_vectors) -> list:
+        """Positions of the shards to search for each query: the best subcategories of the best categories."""
+        queries = unit(np.atleast_2d(query_vectors))
+        category_scores = queries @ self.category_centroids.T
+        shard_scores = queries @ self.shard_centroids.T
+        routes = []
+        for category_row, shard_row in zip(category_scores, shard_scores):
+            top_categories = np.argsort(-category_row)[:self.categories]
+            candidates = np.flatnonzero(np.isin(self._shard_categories, top_categories))
+            routes.append(candidates[np.argsort(-shard_row[candidates])[:self.probe]].tolist())
+        return routes
+
+    def search_many(self, query_vectors, k: int) -> list:
+        """
+        The k nearest (document, relevance) pairs for each query. Queries routed
+        to the same shard are searched together with one matrix search.
+        """
+        query_vectors = np.asarray(query_vectors, dtype=np.float32)
+        by_shard = {}
+        for query, positions in enumerate(self.route(query_vectors)):
+            for position in positions:
+                by_shard.setdefault(position, []).append(query)
+
+        results = [[] for _ in range(len(query_vectors))]
+        for position, queries in by_shard.items():
+            for query, pairs in zip(queries, search_store(self.store(position), query_vectors[queries], k=k)):
+                results[query].extend(pairs)
+        # Shards share the embedding space, so relevance is comparable across them
+        return [sorted(pairs, key=lambda pair: pair[1], reverse=True)[:k] for pairs in results]
+
+    def reload(self):
+        """Rereads the manifest, keeping the loaded stores of shards whose content has not changed."""
+        manifest, centroids = read_manifest(self.path)
+        current = {(shard["id"], shard["sha256"]) for shard in self.shards}
+        unchanged = {shard["id"] for shard in manifest["shards"] if (shard["id"], shard["sha256"]) in current}
+        with self._lock:
+            self._stores = {key: store for key, store in self._stores.items() if key in unchanged}
+            self._use(manifest, centroids["categories"], centroids["shards"])
+
+
+def read_manifest(path: str):
+    with open(os.path.join(path, MANIFEST_FILE), encoding="utf-8") as f:
+        manifest = json.load(f)
+    with np.load(os.path.join(path, CENTROIDS_FILE)) as stored:
+        centroids = {name: stored[name] for name in stored.files}
+    return manifest, centroids
+
+
+def build_shards(documents: list, path: str, embeddings, embed_documents=None, force: bool = False) -> dict:
+    """
+    Builds or updates the shards for `documents` under `path`. Shards whose
+    articles are unchanged keep their index and centroid unless `force` is set.
+    `embed_documents` defaults to the embeddings client and is called once for
+    all changed articles and once for the category descriptions.
+
+    Returns:
+        dict: {"built": [...], "kept": [...], "removed": [...]} shard ids
+    """
+    from langchain_community.vectorstores import FAISS
+    embed_documents = embed_documents or embeddings.embed_documents
+    previous, previous_centroids = {}, {}
+    if os.path.exists(os.path.join(path, MANIFEST_FILE)):
+        manifest, centroids = read_manifest(path)
+        previous = {shard["id"]: shard for shard in manifest["shards"]}
+        previous_centroids = dict(zip(previous, centroids["shards"]))
+
+    groups = group_documents(documents)
+    hashes = {key: content_hash(group) for key, group in groups.items()}
+    changed = [key for key in groups
+               if force or previous.get(key, {}).get("sha256") != hashes[key]
+               or not os.path.isdir(os.path.join(path, key))]
+
+    texts = [document.page_content for key in changed for document in groups[key]]
+    vectors = iter(np.asarray(embed_documents(texts), dtype=np.float32)) if texts else iter(())
+    shard_centroids = dict(previous_centroids)
+    for key in changed:
+        group = groups[key]
+        group_vectors = np.stack([next(vectors) for _ in group])
+        store = FAISS.from_embeddings(list(zip([document.page_content for document in group], group_vectors.tolist())),
+                                      embeddings, metadatas=[document.metadata for document in group])
+        shutil.rmtree(os.path.join(path, key), ignore_errors=True)
+        store.save_local(os.path.join(path, key))
+        shard_centroids[key] = unit(unit(group_vectors).mean(axis=0))
+
+    # A category is routed on its articles' centroid together with its own description
+    descriptions = {}
+    for document in documents:
+        descriptions.setdefault(document.metadata["category_title"], category_description(document))
+    category_names = list(descriptions)
+    description_vectors = unit(embed_documents([descriptions[name] for name in category_names]))
+    shards = [{
+        "id": key,
+        "category": group[0].metadata["category_title"],
+        "subcategory": group[0].metadata["subcategory_title"],
+        "documents": len(group),
+        "sha256": hashes[key],
+    } for key, group in groups.items()]
+    category_centroids = []
+    for name, description_vector in zip(category_names, description_vectors):
+        members = [shard_centroids[shard["id"]] * shard["documents"] for shard in shards if shard["category"] == name]
+        category_centroids.append(unit(unit(np.sum(members, axis=0)) + description_vector))
+
+    removed = [key for key in previous if key not in groups]
+    for key in removed:
+        shutil.rmtree(os.path.join(path, key), ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+    np.savez(os.path.join(path, CENTROIDS_FILE), categories=np.stack(category_centroids),
+             shards=np.stack([shard_centroids[shard["id"]] for shard in shards]))
+    # The manifest is written last, so an interrupted build leaves the previous one in place
+    with open(os.path.join(path, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump({"categories": category_names, "shards": shards}, f, ensure_ascii=False, indent=1)
+    return {"built": changed, "kept": [key for key in groups if key not in changed], "removed": removed}
+
+
+def main(argv=None):
+    from rag.rag_with_openai import get_components, process_data
+
+    parser = argparse.ArgumentParser(description="Build or update the category-sharded retrieval index.")
+    parser.add_argument("--data", default=os.path.join(backend_dir, "rag", "data", "web_scrape_output_with_content.json"),
+                        help="scraped articles JSON")
+    parser.add_argument("--vector-store", default="faiss", help="flat vector store path; shards go next to it")
+    parser.add_argument("--force", action="store_true", help="rebuild unchanged shards too")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    _llm, embeddings = get_components()
+    result = build_shards(process_data(args.data), shards_path_for(args.vector_store), embeddings, force=args.force)
+    print(f"Built {len(result['built'])} shards, kept {len(result['kept'])}, removed {len(result['removed'])} "
+          f"in {shards_path_for(args.vector_store)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
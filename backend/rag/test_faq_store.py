@@ -0,0 +1,118 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+import numpy as np
+
+# faq_store.py imports shared modules (tracing) from the backend root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import faq_store
+from faq_store import FAQStore, find_answer, find_answers
+
+ANSWER_EN = {"data": "A marriage certificate costs 1,500 RWF.", "op_type": "chat", "redir_url": "chat"}
+ANSWER_FR = {"data": "Un certificat de mariage coûte 1 500 RWF.", "op_type": "chat", "redir_url": "chat"}
+
+ARTICLES = {
+    "How to Apply for a Marriage Certificate": {
+        "vetted": True,
+        "questions": {"en": ["How much is a marriage certificate?"], "fr": ["Combien coûte un certificat de mariage ?"]},
+        "answers": {"en": ANSWER_EN, "fr": ANSWER_FR},
+    },
+    "How to Apply for a Birth Certificate": {
+        "vetted": True,
+        "questions": {"en": ["How do I get a birth certificate?"]},
+        "answers": {"en": {"data": "Apply on IremboGov.", "op_type": "chat", "redir_url": "chat"}},
+    },
+    "How to Apply for a Permit": {
+        "vetted": False,
+        "questions": {"en": ["How do I apply for a student permit?"]},
+        "answers": {"en": {"data": "", "op_type": "new", "redir_url": "new"}},
+    },
+}
+ROWS = [
+    ("How to Apply for a Birth Certificate", "en", "How do I get a birth certificate?"),
+    ("How to Apply for a Marriage Certificate", "en", "How much is a marriage certificate?"),
+    ("How to Apply for a Marriage Certificate", "fr", "Combien coûte un certificat de mariage ?"),
+    ("How to Apply for a Permit", "en", "How do I apply for a student permit?"),
+]
+VECTORS = np.array([[1, 0, 0], [0, 1, 0], [0, 0.98, 0.2], [0, 0, 1]], dtype=np.float32)
+
+
+class TestFAQStore(unittest.TestCase):
+
+    def setUp(self):
+        self.store = FAQStore(ARTICLES, ROWS, VECTORS, require_vetted=True)
+
+    def test_exact_match_ignores_case_punctuation_and_spacing(self):
+        match = self.store.match_exact("  how much is a MARRIAGE certificate ", "en")
+        self.assertEqual(match.article, "How to Apply for a Marriage Certificate")
+        self.assertEqual(match.answer, ANSWER_EN)
+        self.assertEqual(self.store.match_exact("Combien coûte un certificat de mariage?", "fr").answer, ANSWER_FR)
+
+    def test_answer_is_in_the_question_language(self):
+        match = self.store.match_vector([0, 1, 0.05], "fr")
+        self.assertEqual(match.answer, ANSWER_FR)
+        # No Swahili answer is stored, so the assistant has to answer
+        self.assertIsNone(self.store.match_vector([0, 1, 0.05], "sw"))
+
+    def test_answer_in_the_selected_language(self):
+        match = self.store.match_exact("How much is a marriage certificate?", "en", answer_lang="fr")
+        self.assertEqual(match.answer, ANSWER_FR)
+        self.assertIsNone(self.store.match_exact("How much is a marriage certificate?", "en", answer_lang="sw"))
+
+    def test_semantic_match_needs_score_and_margin(self):
+        self.assertIsNotNone(self.store.match_vector([0.1, 1, 0], "en", min_score=0.9, min_margin=0.02))
+        self.assertIsNone(self.store.match_vector([0.5, 0.6, 0], "en", min_score=0.9, min_margin=0.02))
+        self.assertIsNone(self.store.match_vector([0.9, 1, 0], "en", min_score=0.5, min_margin=0.2))
+
+    def test_unvetted_articles_are_not_served(self):
+        self.assertEqual(len(self.store), 2)
+        self.assertIsNone(self.store.match_exact("How do I apply for a student permit?", "en"))
+        self.assertIsNone(self.store.match_vector([0, 0, 1], "en", min_score=0.5))
+        unvetted = FAQStore(ARTICLES, ROWS, VECTORS, require_vetted=False)
+        self.assertEqual(unvetted.match_exact("How do I apply for a student permit?", "en").answer["op_type"], "new")
+
+    def test_load_from_directory(self):
+        with tempfile.TemporaryDirectory() as path:
+            with open(os.path.join(path, "answers.json"), "w", encoding="utf-8") as f:
+                json.dump({"articles": ARTICLES, "rows": ROWS}, f)
+            np.save(os.path.join(path, "vectors.npy"), VECTORS)
+            store = FAQStore.load(path)
+        self.assertEqual(store.match_vector([0, 1, 0], "en").article, "How to Apply for a Marriage Certificate")
+
+
+class TestFindAnswer(unittest.TestCase):
+
+    def setUp(self):
+        store = FAQStore(ARTICLES, ROWS, VECTORS, require_vetted=True)
+        self.patches = [patch.object(faq_store, "get_faq_store", return_value=store),
+                        patch.object(faq_store, "embed_questions", side_effect=lambda texts: [[0, 0, 1] for _ in texts])]
+        for patcher in self.patches:
+            patcher.start()
+
+    def tearDown(self):
+        for patcher in self.patches:
+            patcher.stop()
+
+    def test_miss_keeps_the_question_embedding_for_retrieval(self):
+        embedded = {}
+        self.assertIsNone(find_answer("What documents does a student permit need?", "en", embedded))
+        self.assertEqual(embedded, {"What documents does a student permit need?": [0, 0, 1]})
+
+    def test_exact_match_embeds_nothing(self):
+        embedded = {}
+        self.assertIsNotNone(find_answer("How much is a marriage certificate?", "en", embedded))
+        self.assertEqual(embedded, {})
+
+    def test_batch_miss_keeps_the_question_embedding(self):
+        embedded = {}
+        matches = find_answers([("How much is a marriage certificate?", "en"), ("Student permit documents", "en")], embedded)
+        self.assertIsNotNone(matches[0])
+        self.assertIsNone(matches[1])
+        self.assertEqual(list(embedded), ["Student permit documents"])
+
+
+if __name__ == "__main__":
+    unittest.main()
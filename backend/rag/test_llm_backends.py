@@ -0,0 +1,145 @@
+import os
+import sys
+import time
+import socket
+import threading
+import unittest
+from unittest.mock import patch
+
+# llm_backends.py imports shared modules (tracing) from the backend root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import llm_backends
+from llm_backends import (ChatBackend, OpenAIBackend, CancelEvent, LatencyTracker, LLMCancelled,
+                          hedged_chat_completion, parse_assistant_json)
+
+ANSWER = '{"data": "A marriage certificate costs 1,500 RWF.", "op_type": "chat", "redir_url": "chat"}'
+
+
+class FakeBackend(ChatBackend):
+    provider = "fake"
+
+    def __init__(self, model, delay, content=ANSWER, error=None):
+        super().__init__(model)
+        self.delay = delay
+        self.content = content
+        self.error = error
+        self.cancelled = False
+
+    def available(self):
+        return True
+
+    def complete(self, messages, timeout=30, cancel_event=None, temperature=0):
+        end = time.time() + self.delay
+        while time.time() < end:
+            if cancel_event is not None and cancel_event.is_set():
+                self.cancelled = True
+                raise LLMCancelled(self.name)
+            time.sleep(0.005)
+        if self.error:
+            raise self.error
+        return self.content, None
+
+
+class TestHedgedChatCompletion(unittest.TestCase):
+
+    def run_hedged(self, primary, secondary, timeout=5):
+        with patch.dict(llm_backends.BACKENDS, {"primary": primary, "secondary": secondary}):
+            return hedged_chat_completion([], primary="primary", secondary="secondary", timeout=timeout)
+
+    def test_fast_primary_does_not_hedge(self):
+        primary, secondary = FakeBackend("a", 0.01), FakeBackend("b", 0.01)
+        with patch.object(llm_backends, "LLM_HEDGE_DEFAULT_DELAY", 1):
+            result = self.run_hedged(primary, secondary)
+        self.assertEqual(result["backend"], "fake:a")
+        self.assertEqual(secondary.latency.count(), 0)
+
+    def test_slow_primary_is_hedged_and_cancelled(self):
+        primary, secondary = FakeBackend("a", 2), FakeBackend("b", 0.05)
+        with patch.object(llm_backends, "LLM_HEDGE_DEFAULT_DELAY", 0.1):
+            start = time.time()
+            result = self.run_hedged(primary, secondary)
+        self.assertEqual(result["backend"], "fake:b")
+        self.assertLess(time.time() - start, 1)
+        time.sleep(0.05)
+        self.assertTrue(primary.cancelled)
+
+    def test_invalid_json_falls_back_to_secondary(self):
+        primary, secondary = FakeBackend("a", 0.01, content="Sorry, I can't help."), FakeBackend("b", 0.01)
+        with patch.object(llm_backends, "LLM_HEDGE_DEFAULT_DELAY", 1):
+            result = self.run_hedged(primary, secondary)
+        self.assertEqual(result["backend"], "fake:b")
+        self.assertEqual(result["response"]["op_type"], "chat")
+
+    def test_all_backends_failing_raises(self):
+        primary = FakeBackend("a", 0.01, error=RuntimeError("rate limited"))
+        secondary = FakeBackend("b", 0.01, error=RuntimeError("unavailable"))
+        with self.assertRaises(RuntimeError):
+            self.run_hedged(primary, secondary)
+
+
+class StalledOpenAIBackend(OpenAIBackend):
+    """Talks to a local server that streams one chunk and then stops sending."""
+
+    def __init__(self):
+        super().__init__("stalled")
+        self.server = socket.socket()
+        self.server.bind(("127.0.0.1", 0))
+        self.server.listen()
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    def serve(self):
+        connection, _address = self.server.accept()
+        connection.recv(65536)
+        chunk = b'data: {"id": "1", "object": "chat.completion.chunk", "created": 1, "model": "stalled", ' \
+                b'"choices": [{"index": 0, "delta": {"content": "{"}}]}\n\n'
+        connection.sendall(b"HTTP/1.1 200 OK\r\ncontent-type: text/event-stream\r\ntransfer-encoding: chunked\r\n\r\n"
+                           + f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+        time.sleep(10)
+        connection.close()
+
+    def create_client(self):
+        from openai import OpenAI
+        return OpenAI(api_key="test", base_url=f"http://127.0.0.1:{self.server.getsockname()[1]}/v1", max_retries=0)
+
+
+class TestCancellation(unittest.TestCase):
+
+    def test_stalled_stream_is_aborted_when_cancelled(self):
+        backend = StalledOpenAIBackend()
+        cancel_event = CancelEvent()
+        threading.Timer(0.2, cancel_event.set).start()
+        start = time.time()
+        with self.assertRaises(LLMCancelled):
+            backend.complete([{"role": "user", "content": "hi"}], timeout=5, cancel_event=cancel_event)
+        self.assertLess(time.time() - start, 1)
+
+    def test_discarded_abort_is_not_run(self):
+        aborted = []
+        cancel_event = CancelEvent()
+        cancel_event.on_set(lambda: aborted.append("first"))
+        second = lambda: aborted.append("second")
+        cancel_event.on_set(second)
+        cancel_event.discard(second)
+        cancel_event.set()
+        cancel_event.on_set(lambda: aborted.append("late"))
+        self.assertEqual(aborted, ["first", "late"])
+
+
+class TestHelpers(unittest.TestCase):
+
+    def test_latency_percentile(self):
+        tracker = LatencyTracker()
+        for value in range(1, 101):
+            tracker.record(value / 100)
+        self.assertAlmostEqual(tracker.percentile(95), 0.95, places=2)
+        self.assertIsNone(LatencyTracker().percentile(95))
+
+    def test_parse_assistant_json(self):
+        self.assertEqual(parse_assistant_json("Here you go: " + ANSWER)["data"], "A marriage certificate costs 1,500 RWF.")
+        self.assertEqual(parse_assistant_json('{"data": "x", "op_type": "new"}')["redir_url"], "new")
+        self.assertIsNone(parse_assistant_json('{"answer": "x"}'))
+        self.assertIsNone(parse_assistant_json("no json here"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+# model_router.py is part of the rag package, imported from the backend root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rag import llm_backends, model_router
+from rag.llm_backends import ChatBackend
+from rag.model_router import COMPLEXITY_THRESHOLD, CONFIDENCE_THRESHOLD, choose_tier, score_complexity
+
+ANSWER = '{"data": "A marriage certificate costs 1,500 RWF.", "op_type": "chat", "redir_url": "chat"}'
+
+
+class FakeBackend(ChatBackend):
+    provider = "fake"
+
+    def __init__(self, model, content=ANSWER, error=None):
+        super().__init__(model)
+        self.content = content
+        self.error = error
+        self.calls = 0
+
+    def available(self):
+        return True
+
+    def complete(self, messages, timeout=30, cancel_event=None, temperature=0):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return self.content, None
+
+
+class TestComplexity(unittest.TestCase):
+
+    def test_small_talk_is_simplest(self):
+        self.assertEqual(score_complexity("Hello!"), 0.0)
+        self.assertEqual(score_complexity(" thank you "), 0.0)
+
+    def test_single_fact_question_is_simple(self):
+        self.assertLessEqual(score_complexity("How much is a marriage certificate?"), COMPLEXITY_THRESHOLD)
+
+    def test_multi_part_question_is_complex(self):
+        query = "What is the difference between a passport and a national ID, and why do I need both?"
+        self.assertGreater(score_complexity(query), COMPLEXITY_THRESHOLD)
+
+    def test_score_is_capped(self):
+        self.assertEqual(score_complexity("why and or but? " * 20), 1.0)
+
+
+class TestChooseTier(unittest.TestCase):
+    SIMPLE = "How much is a marriage certificate?"
+
+    def test_small_talk_stays_fast_without_retrieval(self):
+        self.assertEqual(choose_tier("hi", None), "fast")
+
+    def test_complex_query_is_strong_even_when_well_grounded(self):
+        self.assertEqual(choose_tier("Explain the steps to compare both permits", 1.0), "strong")
+
+    def test_simple_query_follows_retrieval_confidence(self):
+        self.assertEqual(choose_tier(self.SIMPLE, CONFIDENCE_THRESHOLD), "fast")
+        self.assertEqual(choose_tier(self.SIMPLE, CONFIDENCE_THRESHOLD - 0.01), "strong")
+        self.assertEqual(choose_tier(self.SIMPLE, None), "strong")
+
+    def test_unrelated_article_score_is_not_confident(self):
+        # The median best match from another category in the stored ada-002 index
+        self.assertEqual(choose_tier(self.SIMPLE, 0.86), "strong")
+
+
+class TestEscalation(unittest.TestCase):
+
+    def route(self, fast, strong):
+        backends = {"fast": fast, "strong": strong}
+        tiers = {"fast": ("fast", None), "strong": ("strong", None)}
+        with patch.dict(llm_backends.BACKENDS, backends), patch.dict(model_router.TIERS, tiers):
+            return model_router.routed_chat_completion("How much is a marriage certificate?", [], top_score=1.0)
+
+    def fallbacks(self):
+        return model_router.get_router_stats()["fast"]["fallbacks"]
+
+    def test_valid_fast_answer_is_not_escalated(self):
+        fast, strong = FakeBackend("small"), FakeBackend("large")
+        result = self.route(fast, strong)
+        self.assertEqual(result["tier"], "fast")
+        self.assertEqual(strong.calls, 0)
+
+    def test_invalid_json_escalates_to_strong(self):
+        fast, strong = FakeBackend("small", content="Sorry, I can't help."), FakeBackend("large")
+        before = self.fallbacks()
+        result = self.route(fast, strong)
+        self.assertEqual(result["tier"], "strong")
+        self.assertEqual(result["backend"], "fake:large")
+        self.assertEqual(self.fallbacks(), before + 1)
+
+    def test_fast_failure_escalates_to_strong(self):
+        fast, strong = FakeBackend("small", error=RuntimeError("rate limited")), FakeBackend("large")
+        result = self.route(fast, strong)
+        self.assertEqual(result["tier"], "strong")
+        self.assertEqual(strong.calls, 1)
+
+    def test_strong_failure_is_raised(self):
+        fast = FakeBackend("small", error=RuntimeError("rate limited"))
+        strong = FakeBackend("large", error=RuntimeError("unavailable"))
+        with self.assertRaises(RuntimeError):
+            self.route(fast, strong)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import os
+import sys
+import tempfile
+import unittest
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+# sharded_index.py is part of the rag package, imported from the backend root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rag.sharded_index import ShardedIndex, build_shards
+
+# Article text -> embedding; the first two axes are Family, the last two Identification
+VECTORS = {
+    "Marriage certificates cost 1,500 RWF.": [1, 0.1, 0, 0],
+    "Marriage is registered at the sector office.": [0.9, 0.2, 0, 0],
+    "Birth certificates are free.": [0.1, 1, 0, 0],
+    "A new national ID costs 500 RWF.": [0, 0, 1, 0.1],
+    "Replace a lost ID at the sector office.": [0, 0, 0.2, 1],
+    "Family": [0.5, 0.5, 0, 0],
+    "Identification": [0, 0, 0.5, 0.5],
+}
+
+
+def document(text, category, subcategory):
+    return Document(page_content=text, metadata={
+        "title": text, "category_title": category, "subcategory_title": subcategory, "category_text": ""})
+
+
+DOCUMENTS = [
+    document("Marriage certificates cost 1,500 RWF.", "Family", "Marriage Services"),
+    document("Marriage is registered at the sector office.", "Family", "Marriage Services"),
+    document("Birth certificates are free.", "Family", "Birth Services"),
+    document("A new national ID costs 500 RWF.", "Identification", "National ID Application"),
+    document("Replace a lost ID at the sector office.", "Identification", "National ID Replacement"),
+]
+
+
+class TestShardedIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.embedded = []
+        self.embeddings = DeterministicFakeEmbedding(size=4)
+
+    def embed(self, texts):
+        self.embedded.extend(texts)
+        return [VECTORS[text] for text in texts]
+
+    def build(self, documents, **kwargs):
+        return build_shards(documents, self.path, self.embeddings, embed_documents=self.embed, **kwargs)
+
+    def test_search_only_loads_routed_shards(self):
+        self.build(DOCUMENTS)
+        index = ShardedIndex.load(self.path, self.embeddings, categories=1, probe=1)
+        results = index.search_many([[1, 0.05, 0, 0], [0, 0, 0.1, 1]], k=2)
+        self.assertEqual([doc.page_content for doc, _score in results[0]],
+                         ["Marriage certificates cost 1,500 RWF.", "Marriage is registered at the sector office."])
+        self.assertEqual([doc.page_content for doc, _score in results[1]], ["Replace a lost ID at the sector office."])
+        self.assertEqual(len(index._stores), 2)
+
+    def test_probing_more_shards_merges_by_relevance(self):
+        self.build(DOCUMENTS)
+        index = ShardedIndex.load(self.path, self.embeddings, categories=1, probe=2)
+        results = index.search_many([[0.5, 0.6, 0, 0]], k=3)[0]
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0][0].page_content, "Birth certificates are free.")
+        self.assertEqual([score for _doc, score in results], sorted([score for _doc, score in results], reverse=True))
+
+    def test_rebuild_only_embeds_changed_shards(self):
+        self.build(DOCUMENTS)
+        index = ShardedIndex.load(self.path, self.embeddings, categories=2, probe=4)
+        index.search_many([[1, 0, 0, 0]], k=1)
+        self.embedded = []
+
+        changed = [DOCUMENTS[0], DOCUMENTS[2], DOCUMENTS[3], DOCUMENTS[4]]
+        result = self.build(changed)
+        self.assertEqual(len(result["built"]), 1)
+        self.assertEqual(len(result["kept"]), 3)
+        self.assertEqual(self.embedded, ["Marriage certificates cost 1,500 RWF.", "Family", "Identification"])
+
+        marriage = result["built"][0]
+        index.reload()
+        self.assertNotIn(marriage, index._stores)
+        self.assertEqual(len(index), 4)
+
+    def test_removed_shards_are_deleted(self):
+        self.build(DOCUMENTS)
+        result = self.build(DOCUMENTS[:3])
+        self.assertEqual(len(result["removed"]), 2)
+        self.assertEqual(len([name for name in os.listdir(self.path) if os.path.isdir(os.path.join(self.path, name))]), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
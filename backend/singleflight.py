@@ -0,0 +1,108 @@
+# singleflight.py
+# Request coalescing. When identical calls arrive while one is already running
+# (a popular question asked by many users in the same second), the later ones
+# wait for the running call and share its result or its error instead of
+# repeating translation, retrieval, the LLM and TTS for each of them.
+#
+# A leader that fails because of its own budget or admission (DeadlineExceeded,
+# Overloaded) does not pass that failure on: waiters with time left try again.
+
+import os
+import inspect
+import functools
+import threading
+from prometheus_client import Counter
+from limits import Overloaded
+from deadline import DeadlineExceeded, MIN_CALL_TIMEOUT, has_budget, remaining
+
+# Set SINGLEFLIGHT=0 to run every call on its own
+SINGLEFLIGHT = os.getenv("SINGLEFLIGHT", "1") != "0"
+
+COALESCED = Counter("singleflight_calls_total",
+                    "Calls to coalesced functions, by whether they ran, shared an in-flight call "
+                    "or retried after the shared call ran out of budget.",
+                    ["name", "result"])
+
+
+def normalize_text(text) -> str:
+    """Key form of user text: case and whitespace differences do not make a call distinct."""
+    return " ".join(str(text or "").split()).casefold()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time; concurrent callers with the same key share it."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, *args, **kwargs):
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+
+            if leader:
+                COALESCED.labels(self.name, "leader").inc()
+                try:
+                    call.result = fn(*args, **kwargs)
+                    return call.result
+                except BaseException as e:
+                    call.error = e
+                    raise
+                finally:
+                    with self._lock:
+                        del self._calls[key]
+                    call.done.set()
+
+            COALESCED.labels(self.name, "shared").inc()
+            # A waiting caller still keeps to its own deadline
+            wait = remaining()
+            if not call.done.wait(None if wait is None else max(wait, 0)):
+                raise DeadlineExceeded(f"Budget ran out waiting for an in-flight {self.name} call")
+            if call.error is None:
+                return call.result
+            # The leader's budget or admission is not this caller's; retry while it has time
+            if isinstance(call.error, (DeadlineExceeded, Overloaded)) and has_budget(MIN_CALL_TIMEOUT):
+                COALESCED.labels(self.name, "retried").inc()
+                continue
+            raise call.error
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+def coalesced(name: str, key):
+    """
+    Decorator that coalesces concurrent calls to a function. `key` receives the
+    call's arguments by name (defaults applied) and returns a hashable key;
+    calls with equal keys made while one is running share its outcome.
+    """
+    flight = SingleFlight(name)
+
+    def decorator(fn):
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not SINGLEFLIGHT:
+                return fn(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return flight.do(key(bound.arguments), fn, *args, **kwargs)
+
+        wrapper.flight = flight
+        return wrapper
+
+    return decorator
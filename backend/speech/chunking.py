@@ -0,0 +1,150 @@
+# chunking.py
+# Splits long recordings into bounded-length segments for concurrent
+# transcription and stitches the segment transcripts back together.
+# Cuts are placed in the quietest stretch near the segment limit; when a
+# recording has no pause there, segments overlap slightly so no word is lost
+# at the cut, and the repeated words are removed when stitching.
+
+import io
+import os
+import re
+import wave
+import numpy as np
+
+# Recordings longer than this are split, in seconds
+LONG_AUDIO_SECONDS = float(os.getenv("STT_LONG_AUDIO_SECONDS", "30"))
+# Longest segment sent in one transcription request, in seconds
+SEGMENT_SECONDS = float(os.getenv("STT_SEGMENT_SECONDS", "20"))
+# Audio repeated on both sides of a cut that does not fall in a pause, in seconds
+SEGMENT_OVERLAP_SECONDS = float(os.getenv("STT_SEGMENT_OVERLAP_SECONDS", "1.0"))
+
+# Loudness is measured over windows of this length, in seconds
+ENERGY_WINDOW_SECONDS = 0.02
+# A window quieter than this share of the recording's typical loudness counts as a pause
+SILENCE_RATIO = 0.1
+# Most words repeated across an overlapping cut
+MAX_OVERLAP_WORDS = 8
+
+_SAMPLE_TYPES = {1: np.uint8, 2: np.int16, 4: np.int32}
+
+
+class AudioSegment:
+    """One piece of a recording, encoded as a WAV file."""
+
+    def __init__(self, index: int, start_seconds: float, content: bytes, overlapped: bool):
+        self.index = index
+        self.start_seconds = start_seconds
+        self.content = content
+        # True when this segment starts with audio already sent at the end of the previous one
+        self.overlapped = overlapped
+
+
+def read_wav(file_path: str):
+    """Returns (wave params, raw frames) for a PCM WAV file, or None for any other format."""
+    try:
+        with wave.open(file_path, "rb") as wav:
+            params = wav.getparams()
+            if params.sampwidth not in _SAMPLE_TYPES:
+                return None
+            return params, wav.readframes(params.nframes)
+    except (wave.Error, EOFError):
+        return None
+
+
+def window_energy(frames: bytes, params, window_frames: int) -> np.ndarray:
+    """RMS loudness of each window of window_frames frames, mixed down to mono."""
+    samples = np.frombuffer(frames, dtype=_SAMPLE_TYPES[params.sampwidth]).astype(np.float64)
+    if params.sampwidth == 1:
+        samples -= 128
+    samples = samples.reshape(-1, params.nchannels).mean(axis=1)
+    windows = len(samples) // window_frames
+    if windows == 0:
+        return np.zeros(0)
+    samples = samples[:windows * window_frames].reshape(windows, window_frames)
+    return np.sqrt((samples ** 2).mean(axis=1))
+
+
+def plan_cuts(energy: np.ndarray, window_frames: int, total_frames: int, max_frames: int, overlap_frames: int):
+    """
+    Returns (start, end, overlapped) frame ranges of at most max_frames each.
+    Each cut is made in the quietest window of the second half of the segment.
+    """
+    speech_level = np.percentile(energy, 90) if len(energy) else 0.0
+    silence_level = speech_level * SILENCE_RATIO
+    ranges = []
+    start, overlapped = 0, False
+    while total_frames - start > max_frames:
+        first = (start + max_frames // 2) // window_frames
+        last = max((start + max_frames) // window_frames - 1, first + 1)
+        # The latest of equally quiet windows, to keep segments (and requests) few
+        quietest = last - 1 - int(np.argmin(energy[first:last][::-1]))
+        end = (quietest * window_frames) + window_frames // 2
+        ranges.append((start, end, overlapped))
+        # Without a pause at the cut, the next segment repeats the audio just before it
+        overlapped = energy[quietest] > silence_level and overlap_frames > 0
+        start = end - overlap_frames if overlapped else end
+    ranges.append((start, total_frames, overlapped))
+    return ranges
+
+
+def encode_wav(params, frames: bytes) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(params.nchannels)
+        wav.setsampwidth(params.sampwidth)
+        wav.setframerate(params.framerate)
+        wav.writeframes(frames)
+    return buffer.getvalue()
+
+
+def split_audio(file_path: str, long_audio_seconds: float = LONG_AUDIO_SECONDS,
+                segment_seconds: float = SEGMENT_SECONDS,
+                overlap_seconds: float = SEGMENT_OVERLAP_SECONDS):
+    """
+    Splits a recording longer than long_audio_seconds into segments of at most
+    segment_seconds. Returns None when the recording is short or is not a PCM
+    WAV file, in which case it should be transcribed in one request.
+    """
+    audio = read_wav(file_path)
+    if audio is None:
+        return None
+    params, frames = audio
+    frame_size = params.sampwidth * params.nchannels
+    total_frames = len(frames) // frame_size
+    if total_frames <= long_audio_seconds * params.framerate:
+        return None
+
+    window_frames = max(1, int(params.framerate * ENERGY_WINDOW_SECONDS))
+    max_frames = int(segment_seconds * params.framerate)
+    overlap_frames = min(int(overlap_seconds * params.framerate), max_frames // 4)
+    energy = window_energy(frames, params, window_frames)
+    return [
+        AudioSegment(index, start / params.framerate,
+                     encode_wav(params, frames[start * frame_size:end * frame_size]), overlapped)
+        for index, (start, end, overlapped) in enumerate(
+            plan_cuts(energy, window_frames, total_frames, max_frames, overlap_frames))
+    ]
+
+
+def _normalize(word: str) -> str:
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+def stitch_transcripts(segments, texts) -> str:
+    """
+    Joins segment transcripts in order. After an overlapping cut, the longest
+    run of words ending the previous transcript that also starts the next one
+    is dropped from the next one.
+    """
+    words = []
+    for segment, text in zip(segments, texts):
+        next_words = (text or "").split()
+        if segment.overlapped and words:
+            tail = [_normalize(word) for word in words[-MAX_OVERLAP_WORDS:]]
+            head = [_normalize(word) for word in next_words[:MAX_OVERLAP_WORDS]]
+            for size in range(min(len(tail), len(head)), 0, -1):
+                if tail[-size:] == head[:size]:
+                    next_words = next_words[size:]
+                    break
+        words.extend(next_words)
+    return " ".join(words)
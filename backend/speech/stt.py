@@ -1,14 +1,22 @@
 # stt.py
 # This implements speech recognition using Whisper via Groq by default.
 # For Kinyarwanda, it uses Pindo.ai
+# Long recordings are split at pauses and the segments transcribed concurrently.
 
 import os
 import base64
 import requests
 import logging
-import time
+import threading
+import contextvars
 from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from tracing import provider_call
+from limits import Overloaded
+from deadline import DeadlineExceeded, retry_call, retryable_response
+from translate.language_id import input_language
+from speech.chunking import split_audio, stitch_transcripts
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 # Go up one directory to the project root
@@ -23,63 +31,118 @@ logging.basicConfig(level=logging.INFO)
 
 # Supported languages for transcription
 SUPPORTED_LANGS = ["en", "rw", "sw", "fr"]
+# Languages transcribed by Pindo; the rest go to Whisper
+PINDO_LANGS = ["rw", "sw"]
 
 # API keys (store these securely)
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 # PINDO_API_KEY = os.getenv("PINDO_API_KEY")
+PINDO_URL = os.getenv("PINDO_URL", "https://api.pindo.io")
+# Longest a single transcription request may take, in seconds
+STT_TIMEOUT = float(os.getenv("STT_TIMEOUT", "60"))
+# Segments of a long recording transcribed at the same time
+STT_MAX_PARALLEL_SEGMENTS = int(os.getenv("STT_MAX_PARALLEL_SEGMENTS", "4"))
+
+# Groq client, created on first use
+_groq_client = None
+_groq_client_lock = threading.Lock()
 
 def setup_groq_client():
     """Setup Groq client."""
-    from groq import Groq
-    return Groq(api_key=GROQ_API_KEY)
+    global _groq_client
+    with _groq_client_lock:
+        if _groq_client is None:
+            from groq import Groq
+            # Retries are made by retry_call, within the request's budget
+            _groq_client = Groq(api_key=GROQ_API_KEY, max_retries=0)
+        return _groq_client
 
-def transcribe_whisper(filename: str, language: str = "en"):
-    """Transcribe audio using Whisper via Groq API."""
-    start_time = time.time()
-    try:
-        client = setup_groq_client()
-        with open(filename, "rb") as file:
-            transcription = client.audio.transcriptions.create(
-                file=(filename, file.read()),
+def whisper_request(name: str, audio_content: bytes, language: str) -> str:
+    """Sends one recording or segment to Whisper via Groq and returns the text."""
+    client = setup_groq_client()
+
+    def transcribe(timeout):
+        with provider_call("groq", "transcription", language=language, bytes=len(audio_content)):
+            return client.audio.transcriptions.create(
+                file=(name, audio_content),
                 model="whisper-large-v3",
                 response_format="json",
                 language=language,
-                temperature=0.2
+                temperature=0.2,
+                timeout=timeout
             )
-        logging.info(f"Whisper transcription: {transcription.text}")
-        logging.info(f"Whisper Transcription took {time.time() - start_time} seconds.")
-        return transcription.text
+
+    return retry_call(transcribe, cap=STT_TIMEOUT).text
+
+def pindo_request(name: str, audio_content: bytes, language: str) -> str:
+    """Sends one recording or segment to Pindo and returns the text."""
+    url = f"{PINDO_URL}/v1/transcription/stt"
+    data = {"lang": language}
+
+    def post(timeout):
+        files = {
+            'audio': (name, BytesIO(audio_content), 'audio/wav')
+        }
+        with provider_call("pindo", "transcription", language=language, bytes=len(audio_content)) as span:
+            response = requests.post(url, files=files, data=data, timeout=timeout)
+            if response.status_code != 200:
+                span.fail(f"HTTP {response.status_code}")
+        return response
+
+    response = retry_call(post, cap=STT_TIMEOUT, retry_if=retryable_response)
+    print(response.status_code)
+    if response.status_code != 200:
+        logging.error(f"Pindo transcription failed: {response.status_code}")
+        raise RuntimeError(f"HTTP {response.status_code}")
+    return response.json()['text']
+
+def transcribe_file(filename: str, language: str, request) -> str:
+    """
+    Transcribes a file with request(name, audio_content, language). Long WAV
+    recordings are split at pauses and the segments transcribed concurrently,
+    so latency follows segment length rather than recording length.
+    """
+    name = os.path.basename(filename)
+    segments = split_audio(filename)
+    if segments is None:
+        with open(filename, "rb") as file:
+            return request(name, file.read(), language)
+
+    logging.info(f"Transcribing {name} in {len(segments)} segments")
+    stem, _ = os.path.splitext(name)
+    with ThreadPoolExecutor(max_workers=STT_MAX_PARALLEL_SEGMENTS) as pool:
+        # Each segment runs in its own copy of the request context so its span keeps this stage
+        futures = [
+            pool.submit(contextvars.copy_context().run, request,
+                        f"{stem}_{segment.index}.wav", segment.content, language)
+            for segment in segments
+        ]
+        texts = [future.result() for future in futures]
+    return stitch_transcripts(segments, texts)
+
+def transcribe_whisper(filename: str, language: str = "en"):
+    """Transcribe audio using Whisper via Groq API. Returns None if transcription failed."""
+    try:
+        text = transcribe_file(filename, language, whisper_request)
+        logging.info(f"Whisper transcription: {text}")
+        return text
+    except (Overloaded, DeadlineExceeded):
+        raise
     except Exception as e:
         logging.error(f"Error in Whisper transcription: {e}")
-        return "Error in transcription."
+        return None
 
 def transcribe_pindo(filename: str, language: str):
-    """Transcribe audio using Pindo for supported languages."""
-    start_time = time.time()
+    """Transcribe audio using Pindo for supported languages. Returns None if transcription failed."""
     try:
-        url = "https://api.pindo.io/v1/transcription/stt"
-        data = {"lang": language}
-
-        with open(filename, 'rb') as audio_file:
-            audio_content = audio_file.read()
-        audio_file_io = BytesIO(audio_content)
-        filename = os.path.basename(filename)
-        files = {
-            'audio': (filename, audio_file_io, 'audio/wav')
-        }
-        response = requests.post(url, files=files, data=data)
-        print(response.status_code)
-        if response.status_code == 200:
-            response_json = response.json()
-            logging.info(f"Pindo transcription: {response_json['text']}")
-            logging.info(f"Pindo Transcription took {time.time() - start_time} seconds.")
-            return response_json['text']
-        else:
-            logging.error(f"Pindo transcription failed: {response.status_code}")
-            return "Error in transcription."
+        text = transcribe_file(filename, language, pindo_request)
+        logging.info(f"Pindo transcription: {text}")
+        return text
+    except (Overloaded, DeadlineExceeded):
+        raise
     except Exception as e:
         logging.error(f"Error in Pindo transcription: {e}")
-        return "Error in transcription."
+        return None
 
 def transcribe_audio(file_path: str, language: str):
     """Main function to handle audio transcription."""
@@ -89,9 +152,36 @@ def transcribe_audio(file_path: str, language: str):
         raise ValueError("Unsupported language.")
 
     # Choose transcription service
-    if language in ['rw', 'sw']:
+    if language in PINDO_LANGS:
         transcription = transcribe_pindo(file_path, language)
     else:
         transcription = transcribe_whisper(file_path, language)
 
     return transcription
+
+def transcribe_and_detect(file_path: str, language: str):
+    """
+    Transcribes audio and identifies the language actually spoken.
+
+    If the transcript is detected as a language served by the other STT engine
+    (e.g. Kinyarwanda speech sent with lang=fr), the audio is transcribed again
+    with the matching engine.
+
+    Returns:
+        tuple: (transcription, spoken language code); the transcription is None
+        if the audio could not be transcribed
+    """
+    transcription = transcribe_audio(file_path, language)
+    if transcription is None:
+        return None, language
+    detected = input_language(transcription, language)
+    if detected == language:
+        return transcription, language
+    if (detected in PINDO_LANGS) != (language in PINDO_LANGS):
+        logging.info(f"Transcript detected as {detected} but {language} was selected, re-transcribing")
+        retranscribed = transcribe_audio(file_path, detected)
+        if retranscribed is None:
+            # The first transcript is still usable
+            return transcription, language
+        transcription = retranscribed
+    return transcription, detected
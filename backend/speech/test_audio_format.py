@@ -0,0 +1,36 @@
+import os
+import sys
+import unittest
+
+# tts.py imports shared modules (tracing) from the backend root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tts import negotiate_audio_format, sniff_audio_format, audio_format_of, DEFAULT_AUDIO_FORMAT
+
+
+class TestAudioFormat(unittest.TestCase):
+
+    def test_explicit_format_wins_over_accept(self):
+        self.assertEqual(negotiate_audio_format("OPUS", [("audio/mpeg", 1)]), "opus")
+
+    def test_unknown_format_is_rejected(self):
+        with self.assertRaises(ValueError):
+            negotiate_audio_format("flac")
+
+    def test_accept_header_in_quality_order(self):
+        self.assertEqual(negotiate_audio_format(None, [("audio/aac", 1), ("audio/ogg", 0.8)]), "aac")
+        self.assertEqual(negotiate_audio_format(None, [("audio/ogg", 0), ("audio/wav", 0.5)]), "wav")
+
+    def test_wildcards_use_default(self):
+        self.assertEqual(negotiate_audio_format(None, [("*/*", 1), ("audio/*", 1)]), DEFAULT_AUDIO_FORMAT)
+
+    def test_sniff_and_extension(self):
+        self.assertEqual(sniff_audio_format(b"RIFF\x00\x00\x00\x00WAVEfmt "), "wav")
+        self.assertEqual(sniff_audio_format(b"OggS\x00\x02"), "opus")
+        self.assertEqual(sniff_audio_format(b"ID3\x04"), "mp3")
+        self.assertEqual(sniff_audio_format(b"\xff\xf1\x50\x80"), "aac")
+        self.assertIsNone(sniff_audio_format(b"<html>"))
+        self.assertEqual(audio_format_of("uploads/tts_openai_1a2b3c4d.opus"), "opus")
+
+
+if __name__ == '__main__':
+    unittest.main()
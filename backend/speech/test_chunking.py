@@ -0,0 +1,86 @@
+import io
+import os
+import tempfile
+import unittest
+import wave
+import numpy as np
+
+from chunking import AudioSegment, split_audio, stitch_transcripts
+
+RATE = 8000
+
+
+def write_wav(path, samples):
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(RATE)
+        wav.writeframes(samples.astype(np.int16).tobytes())
+
+
+def tone(seconds):
+    t = np.arange(int(seconds * RATE)) / RATE
+    return 8000 * np.sin(2 * np.pi * 220 * t)
+
+
+def silence(seconds):
+    return np.zeros(int(seconds * RATE))
+
+
+class TestSplitAudio(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "audio.wav")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def durations(self, segments):
+        result = []
+        for segment in segments:
+            with wave.open(io.BytesIO(segment.content)) as wav:
+                result.append(wav.getnframes() / RATE)
+        return result
+
+    def test_short_or_non_wav_audio_is_not_split(self):
+        write_wav(self.path, tone(5))
+        self.assertIsNone(split_audio(self.path, long_audio_seconds=30))
+        with open(self.path, "wb") as f:
+            f.write(b"\x1aE\xdf\xa3 not a wav file")
+        self.assertIsNone(split_audio(self.path, long_audio_seconds=0))
+
+    def test_cuts_fall_in_pauses(self):
+        # Speech with a half-second pause every 7 seconds
+        write_wav(self.path, np.concatenate([np.concatenate([tone(6.5), silence(0.5)]) for _ in range(6)]))
+        segments = split_audio(self.path, long_audio_seconds=10, segment_seconds=10, overlap_seconds=1)
+
+        self.assertEqual(len(segments), 6)
+        self.assertTrue(all(duration <= 10 for duration in self.durations(segments)))
+        self.assertFalse(any(segment.overlapped for segment in segments))
+        for segment in segments[1:]:
+            self.assertAlmostEqual(segment.start_seconds % 7, 6.75, delta=0.3)
+
+    def test_continuous_speech_overlaps_segments(self):
+        write_wav(self.path, tone(25))
+        segments = split_audio(self.path, long_audio_seconds=10, segment_seconds=10, overlap_seconds=1)
+
+        self.assertTrue(all(duration <= 10 for duration in self.durations(segments)))
+        self.assertTrue(all(segment.overlapped for segment in segments[1:]))
+        self.assertGreaterEqual(sum(self.durations(segments)), 25)
+
+
+class TestStitchTranscripts(unittest.TestCase):
+
+    def test_overlapping_words_are_removed(self):
+        segments = [AudioSegment(0, 0, b"", False), AudioSegment(1, 9, b"", True), AudioSegment(2, 18, b"", False)]
+        texts = ["I need to renew my", "renew my passport, please.", "Thank you"]
+        self.assertEqual(stitch_transcripts(segments, texts), "I need to renew my passport, please. Thank you")
+
+    def test_repeated_words_kept_without_overlap(self):
+        segments = [AudioSegment(0, 0, b"", False), AudioSegment(1, 9, b"", False)]
+        self.assertEqual(stitch_transcripts(segments, ["yes yes", "yes"]), "yes yes yes")
+
+
+if __name__ == "__main__":
+    unittest.main()
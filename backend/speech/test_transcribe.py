@@ -0,0 +1,44 @@
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+# stt.py imports shared modules (tracing) and its siblings from the backend root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from speech import stt
+
+
+class TestTranscribeAndDetect(unittest.TestCase):
+
+    def transcribe(self, transcripts, language):
+        calls = []
+
+        def transcribe_audio(file_path, lang):
+            calls.append(lang)
+            return transcripts[lang]
+
+        with patch.object(stt, "transcribe_audio", transcribe_audio):
+            return stt.transcribe_and_detect("audio.wav", language), calls
+
+    def test_failed_transcription_is_not_detected(self):
+        result, calls = self.transcribe({"rw": None}, "rw")
+        self.assertEqual(result, (None, "rw"))
+        self.assertEqual(calls, ["rw"])
+
+    def test_spoken_language_switch_is_retranscribed(self):
+        result, calls = self.transcribe({"rw": "How much is a marriage certificate?", "en": "How much?"}, "rw")
+        self.assertEqual(result, ("How much?", "en"))
+        self.assertEqual(calls, ["rw", "en"])
+
+    def test_failed_retranscription_keeps_the_first_transcript(self):
+        result, _calls = self.transcribe({"rw": "How much is a marriage certificate?", "en": None}, "rw")
+        self.assertEqual(result, ("How much is a marriage certificate?", "rw"))
+
+    def test_code_mixed_transcript_keeps_the_selected_language(self):
+        result, calls = self.transcribe({"rw": "Ndashaka passport"}, "rw")
+        self.assertEqual(result, ("Ndashaka passport", "rw"))
+        self.assertEqual(calls, ["rw"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,13 +1,16 @@
 # tts.py
 # This implements text-to-speech (TTS) functionality using OpenAI or Pindo for specific languages.
+# Answers are produced in the audio format the client negotiated (Opus, AAC, MP3 or WAV).
 
 import os
 import requests
 import logging
-import time
-from openai import OpenAI
+import threading
 from dotenv import load_dotenv
 import uuid
+from tracing import provider_call
+from limits import Overloaded
+from deadline import DeadlineExceeded, retry_call, retryable_response
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 # Go up one directory to the project root
@@ -25,65 +28,159 @@ SUPPORTED_LANGS = ["en", "rw", "sw", "fr"]
 UPLOAD_FOLDER = 'uploads'
 # API keys (store these securely)
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-
-# Setup OpenAI TTS Client
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
-
-def synthesize_speech_openai(text: str, language_code: str = "en"):
+PINDO_URL = os.getenv("PINDO_URL", "https://api.pindo.io")
+# Longest a single speech synthesis request may take, in seconds
+TTS_TIMEOUT = float(os.getenv("TTS_TIMEOUT", "30"))
+
+# Output formats (OpenAI response_format names) with their file extension and MIME type.
+# OpenAI's opus output is Ogg Opus and its aac output is ADTS AAC.
+AUDIO_FORMATS = {
+    "opus": {"extension": "opus", "mime_type": "audio/ogg"},
+    "aac": {"extension": "aac", "mime_type": "audio/aac"},
+    "mp3": {"extension": "mp3", "mime_type": "audio/mpeg"},
+    "wav": {"extension": "wav", "mime_type": "audio/wav"},
+}
+# MP3 plays everywhere, so it is used unless the client asks for something else
+DEFAULT_AUDIO_FORMAT = os.getenv("TTS_AUDIO_FORMAT", "mp3")
+# Accept header media types and the format each one selects
+ACCEPT_TYPES = {
+    "audio/ogg": "opus", "audio/opus": "opus",
+    "audio/aac": "aac",
+    "audio/mpeg": "mp3", "audio/mp3": "mp3",
+    "audio/wav": "wav", "audio/x-wav": "wav", "audio/wave": "wav",
+}
+
+# OpenAI TTS client, created on first use
+_openai_client = None
+_openai_client_lock = threading.Lock()
+
+def get_openai_client():
+    """Setup OpenAI TTS Client."""
+    global _openai_client
+    with _openai_client_lock:
+        if _openai_client is None:
+            from openai import OpenAI
+            # Retries are made by retry_call, within the request's budget
+            _openai_client = OpenAI(api_key=OPENAI_API_KEY, max_retries=0)
+        return _openai_client
+
+def negotiate_audio_format(requested: str = None, accept_mimetypes=None) -> str:
+    """
+    Picks the output format from an explicit format name, or else from the
+    audio types listed in the Accept header (in quality order). Wildcards do
+    not select anything, so plain browser requests get the default format.
+    """
+    if requested:
+        requested = requested.lower()
+        if requested not in AUDIO_FORMATS:
+            raise ValueError(f"Unsupported audio format: {requested}")
+        return requested
+    for mime_type, quality in accept_mimetypes or ():
+        if quality > 0 and mime_type.lower() in ACCEPT_TYPES:
+            return ACCEPT_TYPES[mime_type.lower()]
+    return DEFAULT_AUDIO_FORMAT
+
+def sniff_audio_format(content: bytes):
+    """Identifies audio bytes of unknown format from their header."""
+    if content[:4] == b"RIFF" and content[8:12] == b"WAVE":
+        return "wav"
+    if content[:4] == b"OggS":
+        return "opus"
+    if content[:3] == b"ID3" or content[:2] in (b"\xff\xfb", b"\xff\xf3", b"\xff\xf2"):
+        return "mp3"
+    if content[:2] in (b"\xff\xf1", b"\xff\xf9"):
+        return "aac"
+    return None
+
+def audio_format_of(file_path: str) -> str:
+    """The format of a file written by this module, from its extension."""
+    extension = os.path.splitext(file_path)[1].lstrip(".")
+    return next((name for name, spec in AUDIO_FORMATS.items() if spec["extension"] == extension), None)
+
+def output_path(provider: str, audio_format: str) -> str:
+    extension = AUDIO_FORMATS[audio_format]["extension"]
+    return os.path.join(UPLOAD_FOLDER, f"tts_{provider}_{uuid.uuid4().hex[:8]}.{extension}")
+
+def synthesize_speech_openai(text: str, language_code: str = "en", audio_format: str = DEFAULT_AUDIO_FORMAT):
     """Synthesize speech using OpenAI API."""
-    start_time = time.time()
     try:
-        # Call the OpenAI TTS API
-        response = openai_client.audio.speech.create(
-            model="tts-1",
-            voice="onyx",
-            input=text
-        )
-
-        # Stream the audio content directly to a file
-        output_file = "output_openai.wav"
-        file_path = os.path.join(UPLOAD_FOLDER, f"{output_file}_{uuid.uuid4().hex[:8]}")
-        with open(file_path, "wb") as audio_file:
-            for chunk in response.iter_bytes():
-                audio_file.write(chunk)
+        file_path = output_path("openai", audio_format)
+
+        def synthesize(timeout):
+            with provider_call("openai", "speech", characters=len(text), format=audio_format):
+                # Call the OpenAI TTS API
+                response = get_openai_client().audio.speech.create(
+                    model="tts-1",
+                    voice="onyx",
+                    input=text,
+                    response_format=audio_format,
+                    timeout=timeout
+                )
+
+                # Stream the audio content directly to a file
+                with open(file_path, "wb") as audio_file:
+                    for chunk in response.iter_bytes():
+                        audio_file.write(chunk)
+
+        retry_call(synthesize, cap=TTS_TIMEOUT)
 
         logging.info(f"OpenAI TTS audio saved to {file_path}")
-        logging.info(f"OpenAI TTS took {time.time() - start_time} seconds.")
         return file_path
 
+    except (Overloaded, DeadlineExceeded):
+        raise
     except Exception as e:
         logging.error(f"Error in OpenAI TTS: {e}")
         return None
 
 
 def synthesize_speech_pindo(text: str, language: str):
-    """Synthesize speech using Pindo for supported languages."""
-    start = time.time()
+    """
+    Synthesize speech using Pindo for supported languages. Pindo picks the
+    format; the file is saved under the extension of what it actually returned
+    and converted to the negotiated format when it is uploaded.
+    """
     try:
-        url = "https://api.pindo.io/v1/transcription/tts"
+        url = f"{PINDO_URL}/v1/transcription/tts"
         data = {"text": text, "lang": language}
 
-        response = requests.post(url, json=data)
+        def synthesize(timeout):
+            with provider_call("pindo", "speech", characters=len(text)) as span:
+                response = requests.post(url, json=data, timeout=timeout)
+                if response.status_code != 200:
+                    span.fail(f"HTTP {response.status_code}")
+            return response
+
+        def download(timeout):
+            with provider_call("pindo", "download"):
+                response = requests.get(audio_url, timeout=timeout)
+                response.raise_for_status()
+                return response.content
+
+        response = retry_call(synthesize, cap=TTS_TIMEOUT, retry_if=retryable_response)
         if response.status_code == 200:
             audio_url = response.json().get("generated_audio_url")
-            audio_content = requests.get(audio_url).content
+            audio_content = retry_call(download, cap=TTS_TIMEOUT)
 
-            output_file = "output_openai.wav"
-            file_path = os.path.join(UPLOAD_FOLDER, f"{output_file}_{uuid.uuid4().hex[:8]}")
+            file_path = output_path("pindo", sniff_audio_format(audio_content) or "wav")
             with open(file_path, "wb") as audio_file:
                 audio_file.write(audio_content)
-            logging.info(f"Pindo TTS audio saved to {output_file}")
-            logging.info(f"Pindo TTS took {time.time() - start} seconds.")
+            logging.info(f"Pindo TTS audio saved to {file_path}")
             return file_path
         else:
             logging.error(f"Pindo TTS failed: {response.status_code}")
             return None
+    except (Overloaded, DeadlineExceeded):
+        raise
     except Exception as e:
         logging.error(f"Error in Pindo TTS: {e}")
         return None
 
-def synthesize_text_to_speech(text: str, language: str):
-    """Main function to handle TTS based on the language."""
+def synthesize_text_to_speech(text: str, language: str, audio_format: str = DEFAULT_AUDIO_FORMAT):
+    """
+    Main function to handle TTS based on the language. Returns the path of the
+    audio file, which is in audio_format except for Pindo output (see audio_format_of).
+    """
     
     # Validate language
     if language not in SUPPORTED_LANGS:
@@ -94,6 +191,6 @@ def synthesize_text_to_speech(text: str, language: str):
         audio_file = synthesize_speech_pindo(text, language)
     else:
         # Use OpenAI for other languages
-        audio_file = synthesize_speech_openai(text, language)
+        audio_file = synthesize_speech_openai(text, language, audio_format)
 
     return audio_file
\ No newline at end of file
@@ -1,9 +1,23 @@
 import unittest
 import requests
 import os
+import tempfile
+from bench.fake_providers import make_wav
 
 class TestAPIWorkflow(unittest.TestCase):
-    BASE_URL = "http://localhost:5000/process"
+    BASE_URL = os.getenv("API_BASE_URL", "http://localhost:5000") + "/process"
+
+    @classmethod
+    def setUpClass(cls):
+        # Generated voice notes so the tests do not depend on files on one machine
+        cls.audio_dir = tempfile.TemporaryDirectory()
+        cls.audio_file_path = os.path.join(cls.audio_dir.name, 'voice_note.wav')
+        with open(cls.audio_file_path, 'wb') as audio_file:
+            audio_file.write(make_wav(3.0))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.audio_dir.cleanup()
 
     def test_text_input_english(self):
         payload = {"text": "This is a test sentence in English."}
@@ -20,11 +34,7 @@ class TestAPIWorkflow(unittest.TestCase):
         self.assertIn('response', data)
 
     def test_audio_input_english(self):
-        audio_file_path = '/Users/teddy/Downloads/F_0101 10y4m.wav'
-        if not os.path.exists(audio_file_path):
-            self.skipTest(f"Test audio file not found: {audio_file_path}")
-        
-        with open(audio_file_path, 'rb') as audio_file:
+        with open(self.audio_file_path, 'rb') as audio_file:
             files = {'file': audio_file}
             response = requests.post(f"{self.BASE_URL}?lang=en", files=files)
         
@@ -33,11 +43,7 @@ class TestAPIWorkflow(unittest.TestCase):
         self.assertTrue('audio' in data or 'redirect_url' in data)
 
     def test_audio_input_non_english(self):
-        audio_file_path = '/Users/teddy/Downloads/French Anywhere will do.wav'
-        if not os.path.exists(audio_file_path):
-            self.skipTest(f"Test audio file not found: {audio_file_path}")
-        
-        with open(audio_file_path, 'rb') as audio_file:
+        with open(self.audio_file_path, 'rb') as audio_file:
             files = {'file': audio_file}
             response = requests.post(f"{self.BASE_URL}?lang=fr", files=files)
         
@@ -0,0 +1,55 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import requests
+from deadline import deadline, remaining, call_timeout, retry_call, retryable_response, DeadlineExceeded
+
+
+class TestDeadline(unittest.TestCase):
+
+    def test_timeout_follows_remaining_budget(self):
+        self.assertIsNone(remaining())
+        self.assertEqual(call_timeout(10), 10)
+        with deadline(2):
+            self.assertLessEqual(call_timeout(10), 2)
+            self.assertEqual(call_timeout(1), 1)
+            # A nested deadline can only shorten the budget
+            with deadline(60):
+                self.assertLessEqual(remaining(), 2)
+        self.assertIsNone(remaining())
+
+    def test_spent_budget_raises(self):
+        with deadline(0.1):
+            with self.assertRaises(DeadlineExceeded):
+                call_timeout(10)
+
+    @patch("deadline.time.sleep")
+    def test_transient_errors_are_retried(self, sleep):
+        call = MagicMock(side_effect=[requests.ConnectionError("reset"), "ok"])
+        self.assertEqual(retry_call(call, cap=5), "ok")
+        self.assertEqual(call.call_count, 2)
+        self.assertEqual(call.call_args[0][0], 5)
+
+    def test_other_errors_are_not_retried(self):
+        call = MagicMock(side_effect=ValueError("bad input"))
+        with self.assertRaises(ValueError):
+            retry_call(call)
+        self.assertEqual(call.call_count, 1)
+
+    @patch("deadline.time.sleep")
+    def test_retryable_responses_are_retried_until_attempts_run_out(self, sleep):
+        busy = MagicMock(status_code=503)
+        call = MagicMock(return_value=busy)
+        self.assertIs(retry_call(call, attempts=3, retry_if=retryable_response), busy)
+        self.assertEqual(call.call_count, 3)
+
+    @patch("deadline.random.uniform", return_value=0.8)
+    def test_no_retry_without_budget(self, uniform):
+        call = MagicMock(side_effect=requests.Timeout("read timed out"))
+        with deadline(1):
+            with self.assertRaises(DeadlineExceeded):
+                retry_call(call)
+        self.assertEqual(call.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import os
+import time
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+from jobs import JobQueue, QueueFull, validate_callback_url
+from limits import Overloaded
+
+
+def resolve_to(*addresses):
+    """Patches DNS so every host resolves to the given addresses."""
+    return patch("jobs.socket.getaddrinfo",
+                 return_value=[(2, 1, 6, "", (address, 443)) for address in addresses])
+
+
+class TestJobQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "jobs.sqlite3")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def wait_for(self, queue, job_id, timeout=5):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            job = queue.get(job_id)
+            if job["status"] in ("succeeded", "failed"):
+                return job
+            time.sleep(0.01)
+        self.fail(f"Job {job_id} did not finish")
+
+    def test_job_result_can_be_polled(self):
+        queue = JobQueue(self.db_path, workers=2)
+        queue.register("double", lambda payload: {"value": payload["value"] * 2})
+        queue.start()
+        try:
+            job_id = queue.submit("double", {"value": 21})
+            job = self.wait_for(queue, job_id)
+        finally:
+            queue.stop()
+        self.assertEqual(job["status"], "succeeded")
+        self.assertEqual(job["result"], {"value": 42})
+        self.assertIsNone(queue.get("unknown"))
+
+    def test_failure_is_reported(self):
+        def broken(payload):
+            raise RuntimeError("OCR service unavailable")
+        queue = JobQueue(self.db_path, workers=1)
+        queue.register("broken", broken)
+        queue.start()
+        try:
+            job = self.wait_for(queue, queue.submit("broken", {}))
+        finally:
+            queue.stop()
+        self.assertEqual(job["status"], "failed")
+        self.assertIn("OCR service unavailable", job["error"])
+
+    def test_queue_is_bounded_and_persistent(self):
+        queue = JobQueue(self.db_path, max_queued=1)
+        queue.register("echo", lambda payload: payload)
+        job_id = queue.submit("echo", {"n": 1})
+        with self.assertRaises(QueueFull):
+            queue.submit("echo", {"n": 2})
+
+        # A new process picks up the job queued before the restart
+        restarted = JobQueue(self.db_path, workers=1)
+        restarted.register("echo", lambda payload: payload)
+        restarted.start()
+        try:
+            self.assertEqual(self.wait_for(restarted, job_id)["result"], {"n": 1})
+        finally:
+            restarted.stop()
+
+    def test_callback_receives_finished_job(self):
+        delivered = threading.Event()
+        queue = JobQueue(self.db_path, workers=1)
+        queue.register("echo", lambda payload: payload)
+        with patch("jobs.requests.post") as post, resolve_to("93.184.215.14"):
+            post.side_effect = lambda url, json, timeout, allow_redirects: \
+                delivered.set() or type("R", (), {"status_code": 200})()
+            queue.start()
+            try:
+                job_id = queue.submit("echo", {"n": 1}, callback_url="https://example.com/hook")
+                self.assertTrue(delivered.wait(5))
+            finally:
+                queue.stop()
+        url = post.call_args[0][0]
+        self.assertEqual(url, "https://example.com/hook")
+        self.assertEqual(post.call_args[1]["json"]["job_id"], job_id)
+        self.assertEqual(post.call_args[1]["json"]["result"], {"n": 1})
+
+    def test_shed_job_keeps_its_files_until_it_completes(self):
+        spool = os.path.join(self.tmp.name, "spool")
+        os.makedirs(spool)
+        image_path = os.path.join(spool, "image.jpg")
+        with open(image_path, "wb") as f:
+            f.write(b"jpeg")
+        attempts = []
+        cleaned = []
+
+        def ocr(payload):
+            attempts.append(os.path.exists(payload["image_path"]))
+            if len(attempts) == 1:
+                raise Overloaded("ocr", "queue_full", 0.01)
+            return {"pages": 1}
+
+        queue = JobQueue(self.db_path, workers=1, max_attempts=2)
+        queue.register("form", ocr, cleanup=lambda payload: cleaned.append(payload) or os.remove(payload["image_path"]))
+        queue.start()
+        try:
+            job = self.wait_for(queue, queue.submit("form", {"image_path": image_path}))
+        finally:
+            queue.stop()
+        self.assertEqual(job["status"], "succeeded")
+        self.assertEqual(attempts, [True, True])
+        self.assertEqual(len(cleaned), 1)
+        self.assertFalse(os.path.exists(image_path))
+
+    def test_callback_url_must_be_http(self):
+        with self.assertRaises(ValueError):
+            validate_callback_url("file:///etc/passwd")
+        with resolve_to("93.184.215.14"):
+            validate_callback_url("https://example.com/hook")
+
+    def test_callback_url_must_not_reach_internal_addresses(self):
+        for address in ("127.0.0.1", "169.254.169.254", "10.0.0.5", "192.168.1.1", "::1", "fe80::1%eth0", "0.0.0.0"):
+            with self.subTest(address=address), resolve_to("93.184.215.14", address):
+                with self.assertRaises(ValueError):
+                    validate_callback_url("http://hooks.example.com/job")
+
+    def test_callback_allowlist_is_exclusive(self):
+        with patch("jobs.JOBS_CALLBACK_HOSTS", ["hooks.internal"]):
+            validate_callback_url("http://hooks.internal/job")
+            with self.assertRaises(ValueError):
+                validate_callback_url("https://example.com/hook")
+
+
+if __name__ == '__main__':
+    unittest.main()
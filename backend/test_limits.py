@@ -0,0 +1,81 @@
+import time
+import threading
+import unittest
+from limits import Limiter, Overloaded, get_limiter
+
+
+class TestLimiter(unittest.TestCase):
+
+    def test_concurrency_is_bounded(self):
+        limiter = Limiter("test", concurrency=2, max_wait=1)
+        peak = []
+        lock = threading.Lock()
+        active = [0]
+
+        def call():
+            with limiter.slot():
+                with lock:
+                    active[0] += 1
+                    peak.append(active[0])
+                time.sleep(0.02)
+                with lock:
+                    active[0] -= 1
+
+        threads = [threading.Thread(target=call) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(max(peak), 2)
+        self.assertEqual(limiter.snapshot()["in_flight"], 0)
+
+    def test_full_queue_is_shed_immediately(self):
+        limiter = Limiter("test", concurrency=1, max_queue=0, max_wait=5)
+        limiter.acquire()
+        start = time.monotonic()
+        with self.assertRaises(Overloaded) as raised:
+            limiter.acquire()
+        self.assertLess(time.monotonic() - start, 0.1)
+        self.assertEqual(raised.exception.reason, "queue_full")
+        self.assertGreaterEqual(raised.exception.retry_after, 1)
+        self.assertEqual(limiter.snapshot()["shed"], 1)
+
+    def test_waiter_times_out(self):
+        limiter = Limiter("test", concurrency=1, max_wait=0.05)
+        limiter.acquire()
+        with self.assertRaises(Overloaded) as raised:
+            limiter.acquire()
+        self.assertEqual(raised.exception.reason, "timeout")
+
+    def test_rate_limit(self):
+        limiter = Limiter("test", concurrency=10, rate=20, burst=1, max_wait=1)
+        start = time.monotonic()
+        for _ in range(3):
+            with limiter.slot():
+                pass
+        # The burst allows one call at once, the next two wait 50 ms each
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+    def test_rate_limit_sheds_when_wait_exceeds_budget(self):
+        limiter = Limiter("test", concurrency=10, rate=1, burst=1, max_wait=0.5)
+        limiter.acquire()
+        start = time.monotonic()
+        with self.assertRaises(Overloaded) as raised:
+            limiter.acquire()
+        self.assertEqual(raised.exception.reason, "rate")
+        self.assertLess(time.monotonic() - start, 0.1)
+
+    def test_unbounded_wait_follows_the_callers_timeout(self):
+        limiter = Limiter("test", concurrency=1, max_wait=None)
+        limiter.acquire()
+        threading.Timer(0.2, limiter.release).start()
+        with self.assertRaises(Overloaded):
+            limiter.acquire(0.05)
+        self.assertGreaterEqual(limiter.acquire(2), 0.1)
+
+    def test_ocr_pages_wait_for_the_callers_deadline(self):
+        self.assertIsNone(get_limiter("ocr").max_wait)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,180 @@
+import time
+import threading
+import unittest
+from deadline import deadline, DeadlineExceeded
+from limits import Overloaded
+from singleflight import SingleFlight, coalesced, normalize_text
+
+
+def run_concurrently(fn, count):
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(fn())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def start_in_background(fn):
+    """Starts fn in a thread; returns the thread and the list its exception is added to."""
+    errors = []
+
+    def call():
+        try:
+            fn()
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=call)
+    thread.start()
+    return thread, errors
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def test_concurrent_duplicates_share_one_call(self):
+        calls = []
+
+        @coalesced("test", key=lambda args: (normalize_text(args["text"]), args["lang"]))
+        def answer(text, lang="en"):
+            calls.append(text)
+            time.sleep(0.1)
+            return {"answer": text.upper()}
+
+        texts = iter(["How much is a passport?", "  how much is a PASSPORT? "] * 4)
+        lock = threading.Lock()
+
+        def ask():
+            with lock:
+                text = next(texts)
+            return answer(text)
+
+        results, errors = run_concurrently(ask, 8)
+        self.assertEqual(errors, [])
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len({id(result) for result in results}), 1)
+        self.assertEqual(answer.flight.in_flight(), 0)
+
+    def test_different_keys_run_separately(self):
+        calls = []
+
+        @coalesced("test", key=lambda args: (args["text"], args["lang"]))
+        def answer(text, lang):
+            calls.append(lang)
+            time.sleep(0.05)
+            return lang
+
+        langs = iter(["en", "fr", "en", "fr"])
+        lock = threading.Lock()
+
+        def ask():
+            with lock:
+                lang = next(langs)
+            return answer("hello", lang)
+
+        results, _ = run_concurrently(ask, 4)
+        self.assertEqual(sorted(calls), ["en", "fr"])
+        self.assertEqual(sorted(results), ["en", "en", "fr", "fr"])
+
+    def test_error_is_shared_and_not_remembered(self):
+        flight = SingleFlight("test")
+        calls = []
+
+        def fail():
+            calls.append(1)
+            time.sleep(0.1)
+            raise RuntimeError("provider down")
+
+        results, errors = run_concurrently(lambda: flight.do("key", fail), 4)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(errors), 4)
+        self.assertEqual(flight.do("key", lambda: "recovered"), "recovered")
+
+    def test_waiter_keeps_its_own_deadline(self):
+        flight = SingleFlight("test")
+        started = threading.Event()
+
+        def slow():
+            started.set()
+            time.sleep(0.5)
+            return "done"
+
+        leader = threading.Thread(target=flight.do, args=("key", slow))
+        leader.start()
+        started.wait()
+        with deadline(0.1), self.assertRaises(DeadlineExceeded):
+            flight.do("key", slow)
+        leader.join()
+
+    def test_waiter_retries_when_leader_runs_out_of_budget(self):
+        flight = SingleFlight("test")
+        started = threading.Event()
+        calls = []
+
+        def answer():
+            calls.append(1)
+            started.set()
+            time.sleep(0.3)
+            if len(calls) == 1:
+                # The first caller's short budget has run out by now
+                raise DeadlineExceeded("leader budget spent")
+            return "answer"
+
+        def impatient_leader():
+            with deadline(0.2):
+                flight.do("key", answer)
+
+        leader, leader_errors = start_in_background(impatient_leader)
+        started.wait()
+        with deadline(5):
+            self.assertEqual(flight.do("key", answer), "answer")
+        leader.join()
+        self.assertEqual([type(e) for e in leader_errors], [DeadlineExceeded])
+        self.assertEqual(len(calls), 2)
+
+    def test_waiter_retries_when_leader_is_shed(self):
+        flight = SingleFlight("test")
+        started = threading.Event()
+        calls = []
+
+        def answer():
+            calls.append(1)
+            if len(calls) == 1:
+                started.set()
+                time.sleep(0.1)
+                raise Overloaded("openai", "queue_full", 1)
+            return "answer"
+
+        leader, leader_errors = start_in_background(lambda: flight.do("key", answer))
+        started.wait()
+        self.assertEqual(flight.do("key", answer), "answer")
+        leader.join()
+        self.assertEqual([type(e) for e in leader_errors], [Overloaded])
+
+    def test_waiter_without_budget_shares_the_deadline_error(self):
+        flight = SingleFlight("test")
+        started = threading.Event()
+
+        def slow_failure():
+            started.set()
+            time.sleep(0.2)
+            raise DeadlineExceeded("leader budget spent")
+
+        leader, leader_errors = start_in_background(lambda: flight.do("key", slow_failure))
+        started.wait()
+        with deadline(0.3), self.assertRaises(DeadlineExceeded):
+            flight.do("key", lambda: "never reached")
+        leader.join()
+        self.assertEqual([type(e) for e in leader_errors], [DeadlineExceeded])
+
+
+if __name__ == "__main__":
+    unittest.main()
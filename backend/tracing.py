@@ -0,0 +1,147 @@
+# tracing.py
+# Structured spans for each stage of the request pipeline and for every call to
+# an external provider, exported as Prometheus histograms on /metrics.
+
+import json
+import time
+import uuid
+import logging
+import contextvars
+from contextlib import contextmanager
+from prometheus_client import Histogram, Counter, generate_latest, CONTENT_TYPE_LATEST
+from limits import get_limiter
+from deadline import remaining
+
+# Seconds; provider calls such as OCR and long transcriptions can take tens of seconds
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+REQUEST_SECONDS = Histogram(
+    "http_request_seconds", "End-to-end request latency.",
+    ["endpoint", "status"], buckets=LATENCY_BUCKETS,
+)
+STAGE_SECONDS = Histogram(
+    "pipeline_stage_seconds", "Latency of each pipeline stage.",
+    ["stage", "status"], buckets=LATENCY_BUCKETS,
+)
+PROVIDER_SECONDS = Histogram(
+    "provider_call_seconds", "Latency of each call to an external provider, by the stage that made it.",
+    ["stage", "provider", "operation", "status"], buckets=LATENCY_BUCKETS,
+)
+PROVIDER_ERRORS = Counter(
+    "provider_call_errors_total", "Failed calls to external providers.",
+    ["stage", "provider", "operation"],
+)
+
+TRANSLATIONS_SAVED = Counter(
+    "translation_calls_saved_total", "Translation calls skipped because the text was already in the target language.",
+    ["direction"],
+)
+CACHE_LOOKUPS = Counter(
+    "cache_lookups_total", "Lookups in in-process result caches.",
+    ["cache", "result"],
+)
+
+_request_id = contextvars.ContextVar("request_id", default=None)
+_current_stage = contextvars.ContextVar("stage", default="none")
+
+
+class Span:
+    """A timed unit of work. Code inside the span can mark it failed without raising."""
+
+    def __init__(self, name: str, **attributes):
+        self.name = name
+        self.attributes = attributes
+        self.status = "ok"
+        self.start = time.perf_counter()
+        self.duration = None
+
+    def fail(self, reason: str = None):
+        self.status = "error"
+        if reason:
+            self.attributes["error"] = reason
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.start
+        logging.info(json.dumps({
+            "span": self.name,
+            "request_id": _request_id.get(),
+            "duration_ms": round(self.duration * 1000, 1),
+            "status": self.status,
+            **self.attributes,
+        }, default=str))
+
+
+def start_request(request_id: str = None) -> str:
+    request_id = request_id or uuid.uuid4().hex[:16]
+    _request_id.set(request_id)
+    return request_id
+
+
+def current_request_id():
+    return _request_id.get()
+
+
+def current_stage() -> str:
+    return _current_stage.get()
+
+
+@contextmanager
+def stage(name: str, **attributes):
+    """Times one stage of the pipeline (stt, translate_in, retrieve, tts, ...)."""
+    span = Span(name, **attributes)
+    token = _current_stage.set(name)
+    try:
+        yield span
+    except Exception as e:
+        if span.status == "ok":
+            span.fail(type(e).__name__)
+        raise
+    finally:
+        _current_stage.reset(token)
+        span.finish()
+        STAGE_SECONDS.labels(name, span.status).observe(span.duration)
+
+
+@contextmanager
+def provider_call(provider: str, operation: str, **attributes):
+    """
+    Times one outbound call, labelled with the stage it was made from. The call
+    first takes a slot from the provider's limiter and raises Overloaded if none
+    is available in time.
+    """
+    stage_name = current_stage()
+    limiter = get_limiter(provider)
+    # Waiting for a slot is bounded by what is left of the request's budget
+    waited = limiter.acquire(remaining())
+    span = Span(f"{provider}.{operation}", stage=stage_name, **attributes)
+    if waited >= 0.001:
+        span.attributes["queued_ms"] = round(waited * 1000, 1)
+    try:
+        yield span
+    except Exception as e:
+        if span.status == "ok":
+            span.fail(type(e).__name__)
+        raise
+    finally:
+        limiter.release()
+        span.finish()
+        PROVIDER_SECONDS.labels(stage_name, provider, operation, span.status).observe(span.duration)
+        if span.status == "error":
+            PROVIDER_ERRORS.labels(stage_name, provider, operation).inc()
+
+
+def observe_request(endpoint: str, status: int, seconds: float):
+    REQUEST_SECONDS.labels(endpoint, str(status)).observe(seconds)
+
+
+def record_translation_saved(direction: str):
+    TRANSLATIONS_SAVED.labels(direction).inc()
+
+
+def record_cache_lookup(cache: str, result: str):
+    CACHE_LOOKUPS.labels(cache, result).inc()
+
+
+def metrics_payload():
+    """Returns (body, content type) for a Prometheus scrape."""
+    return generate_latest(), CONTENT_TYPE_LATEST
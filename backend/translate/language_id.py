@@ -0,0 +1,100 @@
+# language_id.py
+# Fast local language identification for the languages the assistant supports
+# (English, Kinyarwanda, Swahili and French), used to avoid translation and STT
+# round trips that the selected language alone would trigger.
+
+import re
+
+SUPPORTED_LANGS = ["en", "rw", "sw", "fr"]
+
+# Frequent function words and domain words that are distinctive for each language
+LANGUAGE_WORDS = {
+    "en": """the a an is are was be to of and or in on for with my your i you we it this that
+        how what where when which who why do does did can could should would much many
+        apply get need want please hello hi thanks thank certificate permit fee cost pay
+        renew new lost national id card passport visa marriage birth license""",
+    "rw": """ni na mu ku kwa nde iki ibi uko nte ese ndashaka nshaka nakora nabona nasaba
+        gusaba kubona kwishyura kwiyandikisha icyemezo indangamuntu uruhushya urupapuro
+        pasiporo ubukwe ishyingirwa amavuko amafaranga angahe bingahe kangahe muraho mwiriwe
+        mwaramutse amakuru murakoze yego oya cyangwa ariko kandi nyuma mbere igihe iyo aho
+        bwa cya rya ya za by cy kugira kuko nshya ngomba ndifuza umwana""",
+    "sw": """ni na kwa ya wa za cha vya la katika kuna hii hiyo huo je nini gani vipi jinsi
+        ninataka nataka ninawezaje naweza kupata kulipa kuomba kusajili cheti kitambulisho
+        leseni pasipoti ndoa kuzaliwa kiasi gharama bei shilingi habari jambo asante
+        tafadhali ndiyo hapana lakini pia baada kabla muda mpya upya mtoto""",
+    "fr": """le la les de des du un une et ou est sont pour avec dans sur par pas que qui
+        je tu vous nous mon ma mes votre comment quel quelle quels combien où quand pourquoi
+        faire obtenir demander payer renouveler certificat permis passeport carte identité
+        mariage naissance coûte prix frais bonjour merci oui non""",
+}
+
+# Letter sequences that are common in one language and rare in the others
+LANGUAGE_PATTERNS = {
+    "en": [r"th", r"\w(ing|tion|ed)\b", r"\bwh", r"[b-df-hj-np-tv-z]\b"],
+    "rw": [r"cy", r"shy", r"\w(by|jy|ry|rw|bw|mw|nyw)", r"\b\w+'[aeiou]", r"\bu(mu|ru|bu)"],
+    "sw": [r"ch[aeiou]", r"\bki", r"\bvi", r"ng'", r"\bwa\w", r"\bku\w+a\b"],
+    "fr": [r"[éèêàçùâîôû]", r"\b(l|d|qu|j|n|s)'", r"eau", r"\w(ez|ent|ons)\b", r"ou"],
+}
+
+WORD_WEIGHT = 1.0
+PATTERN_WEIGHT = 0.25
+# Minimum share of the total score the best language needs to be trusted
+MIN_CONFIDENCE = 0.45
+# Detection only overrides the language the user selected with this much
+# confidence over at least this many words; short or code-mixed text such as
+# "Ndashaka passport" scores around 0.55 and keeps the selection
+OVERRIDE_MIN_CONFIDENCE = 0.8
+OVERRIDE_MIN_TOKENS = 3
+
+_word_sets = {lang: set(words.split()) for lang, words in LANGUAGE_WORDS.items()}
+_patterns = {lang: [re.compile(p) for p in patterns] for lang, patterns in LANGUAGE_PATTERNS.items()}
+_token_re = re.compile(r"[a-zà-ÿ']+")
+
+
+def language_scores(text: str) -> dict:
+    """Returns a non-negative score per supported language for the given text."""
+    lowered = text.lower()
+    tokens = [token.strip("'") for token in _token_re.findall(lowered)]
+    scores = {lang: 0.0 for lang in SUPPORTED_LANGS}
+    for token in tokens:
+        matches = [lang for lang in SUPPORTED_LANGS if token in _word_sets[lang]]
+        for lang in matches:
+            # Words shared between languages (e.g. "ni", "na") count for less
+            scores[lang] += WORD_WEIGHT / len(matches)
+    for lang in SUPPORTED_LANGS:
+        for pattern in _patterns[lang]:
+            scores[lang] += PATTERN_WEIGHT * len(pattern.findall(lowered))
+    return scores
+
+
+def detect_language_with_confidence(text: str):
+    """Returns (language, confidence), or (None, 0.0) when the text gives too little evidence."""
+    if not text or not text.strip():
+        return None, 0.0
+    scores = language_scores(text)
+    total = sum(scores.values())
+    if total == 0:
+        return None, 0.0
+    lang = max(scores, key=scores.get)
+    return lang, scores[lang] / total
+
+
+def detect_language(text: str, min_confidence: float = MIN_CONFIDENCE):
+    """Returns the detected language code (en/rw/sw/fr), or None if detection is not confident."""
+    lang, confidence = detect_language_with_confidence(text)
+    if lang is None or confidence < min_confidence:
+        return None
+    return lang
+
+
+def input_language(text: str, selected: str) -> str:
+    """
+    The language to read the user's text as: the selected language, unless the
+    text is long enough and confidently detected as another supported language.
+    """
+    if len(_token_re.findall(text.lower())) < OVERRIDE_MIN_TOKENS:
+        return selected
+    lang, confidence = detect_language_with_confidence(text)
+    if lang is None or confidence < OVERRIDE_MIN_CONFIDENCE:
+        return selected
+    return lang
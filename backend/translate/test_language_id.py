@@ -0,0 +1,51 @@
+import unittest
+from language_id import detect_language, detect_language_with_confidence, input_language
+
+
+class TestDetectLanguage(unittest.TestCase):
+
+    def test_english(self):
+        self.assertEqual(detect_language("How much is a marriage certificate?"), "en")
+        self.assertEqual(detect_language("I want to apply for a passport"), "en")
+
+    def test_french(self):
+        self.assertEqual(detect_language("Combien coûte un certificat de mariage ?"), "fr")
+        self.assertEqual(detect_language("Comment renouveler mon permis d'étudiant ?"), "fr")
+
+    def test_kinyarwanda(self):
+        self.assertEqual(detect_language("Icyemezo cy'ishyingirwa kigura angahe?"), "rw")
+        self.assertEqual(detect_language("Nasaba nte indangamuntu nshya?"), "rw")
+
+    def test_swahili(self):
+        self.assertEqual(detect_language("Cheti cha ndoa kinagharimu kiasi gani?"), "sw")
+        self.assertEqual(detect_language("Ninawezaje kulipa faini ya barabarani?"), "sw")
+
+    def test_greetings(self):
+        self.assertEqual(detect_language("hello"), "en")
+        self.assertEqual(detect_language("bonjour"), "fr")
+        self.assertEqual(detect_language("Muraho"), "rw")
+        self.assertEqual(detect_language("Habari"), "sw")
+
+    def test_no_evidence(self):
+        self.assertIsNone(detect_language(""))
+        self.assertEqual(detect_language_with_confidence("12345"), (None, 0.0))
+
+
+class TestInputLanguage(unittest.TestCase):
+
+    def test_code_mixed_text_keeps_the_selected_language(self):
+        self.assertEqual(input_language("Ndashaka passport", "rw"), "rw")
+        self.assertEqual(input_language("Nataka passport", "sw"), "sw")
+        self.assertEqual(input_language("Hello je veux", "fr"), "fr")
+        self.assertEqual(input_language("Ndashaka passport nshya", "fr"), "fr")
+
+    def test_short_text_keeps_the_selected_language(self):
+        self.assertEqual(input_language("hello", "rw"), "rw")
+
+    def test_confident_sentence_overrides_the_selection(self):
+        self.assertEqual(input_language("How much is a marriage certificate?", "rw"), "en")
+        self.assertEqual(input_language("Nasaba nte indangamuntu nshya?", "en"), "rw")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,13 @@
+import os
+import sys
 import unittest
 from unittest.mock import patch, MagicMock
+
+# translate.py imports shared modules (tracing) from the backend root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from google.api_core.exceptions import GoogleAPIError
-from translate import translate_text
+import translate
+from translate import translate_text, translate_texts
 
 
 class TestTranslateText(unittest.TestCase):
@@ -45,5 +51,36 @@ class TestTranslateText(unittest.TestCase):
         self.assertIsNone(result)
 
 
+class TestTranslateTexts(unittest.TestCase):
+
+    @patch('google.cloud.translate.TranslationServiceClient')
+    def test_google_batch_is_one_call(self, mock_client):
+        """A batch sent to Google is translated with a single request."""
+        mock_response = MagicMock()
+        mock_response.translations = [MagicMock(translated_text="Hello"), MagicMock(translated_text="Thanks")]
+        mock_client.return_value.translate_text.return_value = mock_response
+
+        result = translate_texts(["Muraho", "Murakoze"], "idl-s24", "rw", "en")
+        self.assertEqual(result, ["Hello", "Thanks"])
+        self.assertEqual(mock_client.return_value.translate_text.call_count, 1)
+
+    @patch('translate.amazon_translate')
+    def test_amazon_batch_translates_each_text(self, mock_translate):
+        """Each text is its own Amazon request, so line breaks survive and results stay aligned."""
+        mock_translate.side_effect = lambda text, *args: text.upper()
+
+        result = translate_texts(["Habari", "Asante\n- sana"], source_lang="sw", target_lang="en", service="amazon")
+        self.assertEqual(result, ["HABARI", "ASANTE\n- SANA"])
+        self.assertEqual(sorted(call.args[0] for call in mock_translate.call_args_list), ["Asante\n- sana", "Habari"])
+        mock_translate.assert_any_call("Habari", "sw", "en", translate.AWS_REGION)
+
+    @patch('translate.amazon_translate')
+    def test_amazon_batch_reports_failures_per_text(self, mock_translate):
+        """A text Amazon could not translate is None without affecting the others."""
+        mock_translate.side_effect = lambda text, *args: None if text == "deux" else text.upper()
+
+        result = translate_texts(["un", "deux", "trois"], source_lang="fr", target_lang="en", service="amazon")
+        self.assertEqual(result, ["UN", None, "TROIS"])
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,9 +1,13 @@
-import boto3
-from google.cloud import translate
-from google.api_core.exceptions import GoogleAPIError
 import os
-import time
+import math
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from tracing import provider_call
+from limits import Overloaded
+from deadline import DeadlineExceeded, call_timeout, retry_call
+from singleflight import coalesced, normalize_text
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.dirname(current_dir)
@@ -14,7 +18,56 @@ load_dotenv(dotenv_path=env_path)
 
 # get AWS_REGION from environment variable
 AWS_REGION = os.getenv("AWS_REGION")
+# Optional Google Translate REST endpoint override, e.g. a local stand-in
+GOOGLE_TRANSLATE_ENDPOINT = os.getenv("GOOGLE_TRANSLATE_ENDPOINT")
+# Longest a single translation request may take, in seconds
+TRANSLATE_TIMEOUT = float(os.getenv("TRANSLATE_TIMEOUT", "10"))
+# Amazon Translate requests made at once for a batch
+TRANSLATE_MAX_PARALLEL = int(os.getenv("TRANSLATE_MAX_PARALLEL", "4"))
 
+# SDK clients are created on first use and reused. boto3 and the Google client
+# are only imported then, since they dominate the app's import time.
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_google_client():
+    from google.cloud import translate
+    client_class = translate.TranslationServiceClient
+    with _clients_lock:
+        client = _clients.get(client_class)
+        if client is None:
+            if GOOGLE_TRANSLATE_ENDPOINT:
+                from google.auth.credentials import AnonymousCredentials
+                client = client_class(
+                    credentials=AnonymousCredentials(),
+                    transport="rest",
+                    client_options={"api_endpoint": GOOGLE_TRANSLATE_ENDPOINT},
+                )
+            else:
+                client = client_class()
+            _clients[client_class] = client
+        return client
+
+def get_aws_client(timeout: float):
+    """
+    Returns an Amazon Translate client whose read timeout is `timeout` rounded up
+    to a whole second; botocore only takes timeouts per client, so one client is
+    kept per timeout.
+    """
+    timeout = math.ceil(timeout)
+    with _clients_lock:
+        client = _clients.get(("aws", timeout))
+        if client is None:
+            import boto3
+            from botocore.config import Config
+            # Retries are made by retry_call, within the request's budget
+            config = Config(connect_timeout=min(5, timeout), read_timeout=timeout, retries={"max_attempts": 1})
+            client = _clients[("aws", timeout)] = boto3.client('translate', region_name=AWS_REGION, config=config)
+        return client
+
+# Identical translations requested at the same time are made once
+@coalesced("translate", key=lambda args: (normalize_text(args["text"]), args["project_id"],
+                                          args["source_lang"], args["target_lang"], args["service"]))
 def translate_text(text: str = "Kwa hivyo", 
                    project_id: str = "idl-s24", 
                    source_lang: str = "sw", 
@@ -33,43 +86,102 @@ def translate_text(text: str = "Kwa hivyo",
     else:
         raise ValueError("Unsupported service. Choose either 'google' or 'amazon'.")
 
+def translate_texts(texts: list,
+                    project_id: str = "idl-s24",
+                    source_lang: str = "sw",
+                    target_lang: str = "en",
+                    service: str = "google") -> list:
+    """
+    Translates a list of texts in one direction with as few provider calls as
+    possible. Returns the translations in order, None for any that failed.
+    """
+    if not texts:
+        return []
+    if (source_lang, target_lang) in (('rw', 'en'), ('en', 'rw')) or service == "google":
+        return google_translate_batch(texts, project_id, source_lang, target_lang)
+    elif service == "amazon":
+        return amazon_translate_batch(texts, source_lang, target_lang, region=AWS_REGION)
+    else:
+        raise ValueError("Unsupported service. Choose either 'google' or 'amazon'.")
+
 def google_translate(text: str, project_id: str, source_lang: str, target_lang: str) -> str:
     """Uses Google Cloud Translate to translate text."""
-    
-    client = translate.TranslationServiceClient()
+    from google.api_core.exceptions import GoogleAPIError
+    client = get_google_client()
     location = "global"
     parent = f"projects/{project_id}/locations/{location}"
 
     try:
-        response = client.translate_text(
-            request={
-                "parent": parent,
-                "contents": [text],
-                "mime_type": "text/plain",  # mime types: text/plain, text/html
-                "source_language_code": source_lang,
-                "target_language_code": target_lang,
-            }
-        )
+        with provider_call("google_translate", "translate", source=source_lang, target=target_lang):
+            response = client.translate_text(
+                request={
+                    "parent": parent,
+                    "contents": [text],
+                    "mime_type": "text/plain",  # mime types: text/plain, text/html
+                    "source_language_code": source_lang,
+                    "target_language_code": target_lang,
+                },
+                timeout=call_timeout(TRANSLATE_TIMEOUT)
+            )
         # Return the first translated text
         return response.translations[0].translated_text if response.translations else None
     except GoogleAPIError as e:
         print(f"Error translating text with Google: {e}")
         return None
 
+def google_translate_batch(texts: list, project_id: str, source_lang: str, target_lang: str) -> list:
+    """Uses Google Cloud Translate, which takes a list of texts, for a whole batch in one call."""
+    from google.api_core.exceptions import GoogleAPIError
+    client = get_google_client()
+    parent = f"projects/{project_id}/locations/global"
+
+    try:
+        with provider_call("google_translate", "translate", source=source_lang, target=target_lang, texts=len(texts)):
+            response = client.translate_text(
+                request={
+                    "parent": parent,
+                    "contents": list(texts),
+                    "mime_type": "text/plain",
+                    "source_language_code": source_lang,
+                    "target_language_code": target_lang,
+                },
+                timeout=call_timeout(TRANSLATE_TIMEOUT)
+            )
+        translations = [translation.translated_text for translation in response.translations]
+        if len(translations) == len(texts):
+            return translations
+        print(f"Google returned {len(translations)} translations for {len(texts)} texts")
+    except GoogleAPIError as e:
+        print(f"Error translating batch with Google: {e}")
+    return [None] * len(texts)
+
+def amazon_translate_batch(texts: list, source_lang: str, target_lang: str, region: str) -> list:
+    """
+    Uses Amazon Translate for a batch. It has no synchronous batch API, so each
+    text is its own request, TRANSLATE_MAX_PARALLEL at a time. Joining texts into
+    one request would lose their line breaks and could misalign the results.
+    """
+    with ThreadPoolExecutor(max_workers=TRANSLATE_MAX_PARALLEL) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, amazon_translate, text, source_lang, target_lang, region)
+                   for text in texts]
+        return [future.result() for future in futures]
+
 def amazon_translate(text: str, source_lang: str, target_lang: str, region: str) -> str:
     """Uses Amazon Translate to translate text."""
-    start_time = time.time()
-    
-    client = boto3.client('translate', region_name=AWS_REGION)
-    
+    def translate(timeout):
+        client = get_aws_client(timeout)
+        with provider_call("aws_translate", "translate", source=source_lang, target=target_lang):
+            return client.translate_text(
+                Text=text,
+                SourceLanguageCode=source_lang,
+                TargetLanguageCode=target_lang
+            )
+
     try:
-        response = client.translate_text(
-            Text=text,
-            SourceLanguageCode=source_lang,
-            TargetLanguageCode=target_lang
-        )
-        print(f"Amazon Translate took {time.time() - start_time} seconds.")
+        response = retry_call(translate, cap=TRANSLATE_TIMEOUT)
         return response['TranslatedText']
+    except (Overloaded, DeadlineExceeded):
+        raise
     except Exception as e:
         print(f"Error translating text with Amazon: {e}")
         return None
\ No newline at end of file
@@ -0,0 +1,64 @@
+# warmup.py
+# Optional warm-up for a new server process. SDKs and clients are loaded lazily
+# on first use; warming up does that work before the first request instead, so
+# it does not land on a user's latency. Each step is timed and failures are
+# logged rather than raised, since a missing credential should not stop startup.
+
+import time
+import logging
+
+
+def _warm_vector_store(data_file_path):
+    from rag.rag_with_openai import get_components, get_search_index
+    from rag.sharded_index import ShardedIndex
+    _llm, embeddings = get_components()
+    index = get_search_index(embeddings, data_file_path, "faiss")
+    if isinstance(index, ShardedIndex):
+        for position in range(len(index.shards)):
+            index.store(position)
+
+
+def _warm_faq_store():
+    from rag.faq_store import get_faq_store
+    get_faq_store()
+
+
+def _warm_llm_backends():
+    from rag.model_router import BACKENDS
+    for backend in BACKENDS.values():
+        if backend.available():
+            backend.client()
+
+
+def _warm_speech():
+    from speech.stt import setup_groq_client
+    from speech.tts import get_openai_client
+    setup_groq_client()
+    get_openai_client()
+
+
+def _warm_translation():
+    from translate.translate import get_google_client, get_aws_client, TRANSLATE_TIMEOUT
+    get_google_client()
+    get_aws_client(TRANSLATE_TIMEOUT)
+
+
+def warm_up(data_file_path: str) -> dict:
+    """Imports the heavy SDKs, creates the provider clients and loads the vector store and FAQ store. Returns seconds per step."""
+    steps = {
+        "vector_store": lambda: _warm_vector_store(data_file_path),
+        "faq_store": _warm_faq_store,
+        "llm_backends": _warm_llm_backends,
+        "speech": _warm_speech,
+        "translation": _warm_translation,
+    }
+    timings = {}
+    for name, step in steps.items():
+        start_time = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            logging.warning(f"Warm-up step {name} failed: {e}")
+        timings[name] = round(time.perf_counter() - start_time, 3)
+    logging.info(f"Warm-up finished: {timings}")
+    return timings